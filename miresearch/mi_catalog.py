@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Project level catalog of subjects - a single SQLite file under the data root 
+(in a hidden subdirectory: catalog writes and SQLite journal files do not change the data root 
+modified time - used to validate the subject number counter, see mi_subject.reserveNextSubjN).
+
+The catalog is optional: it is only used if the catalog file exists in the data root
+(create with SubjectList.updateCatalog or commandline -BuildCatalog).
+When present it is updated on every meta file write and used by SubjectList queries
+in place of opening every subject's meta json file. Each row holds the stamp of the meta file 
+its values were read from (MetaStamp) - rows are only used while the meta file is unchanged, so 
+meta files edited by other means are read directly.
+The catalog also holds a summary snapshot (one row per subject: encoded name, study date, 
+derived values and counts) so a project table can be loaded with one query.
+
+Note: SQLite file locking is not reliable on all network file systems.
+"""
+
+import os
+import sqlite3
+
+
+CATALOG_DIR_NAME = '.miresearch'
+CATALOG_FILE_NAME = 'miresearch_catalog.db'
+# Raised by catalog access (callers fall back to subject meta files)
+CatalogError = sqlite3.Error
+# Meta tags held in catalog (each is indexed). Columns have no type - values keep the type held in the meta file
+CATALOG_TAGS = ["StudyInstanceUID",
+                "PatientID",
+                "StudyDate",
+                "StudyID",
+                "NAME"]
+# Summary snapshot columns (name: SQLite type). 
+#   Meta columns are taken from the subject meta file only - written with each meta write. 
+#     NAME is encoded (mi_utils.encodeString with subject ID). 
+#     MetaStamp is the meta file stamp ("mtime_ns:size") the values were read from.
+#   Derived columns are computed from subject files - written when read and found out of date. 
+#     DerivedStamp is the subject file system stamp the values were computed from 
+#     (see AbstractSubject.getDerivedValuesStamp).
+SUMMARY_META_COLUMNS = {"NAME": "TEXT",
+                        "StudyDate": "TEXT",
+                        "StudyID": "TEXT",
+                        "Age": "REAL",
+                        "NumberOfSeries": "INTEGER",
+                        "MetaStamp": "TEXT"}
+SUMMARY_DERIVED_COLUMNS = {"LevelCompleted": "REAL",
+                           "NumberOfDicoms": "INTEGER",
+                           "DerivedStamp": "TEXT"}
+SUMMARY_COLUMNS = {**SUMMARY_META_COLUMNS, **SUMMARY_DERIVED_COLUMNS}
+
+
+class SubjectCatalog(object):
+    """Interface to project catalog file (SQLite) held in dataRoot/CATALOG_DIR_NAME
+    """
+    def __init__(self, dataRoot) -> None:
+        self.dataRoot = dataRoot
+
+    @property
+    def catalogFile(self):
+        return os.path.join(self.dataRoot, CATALOG_DIR_NAME, CATALOG_FILE_NAME)
+
+    def exists(self):
+        return os.path.isfile(self.catalogFile)
+
+    def _connect(self):
+        return sqlite3.connect(self.catalogFile, timeout=60)
+
+    @classmethod
+    def create(cls, dataRoot):
+        """Create catalog file (if not already existing) in dataRoot
+
+        Args:
+            dataRoot (str): path to root directory of subject filesystem database
+
+        Returns:
+            SubjectCatalog: catalog object
+        """
+        catalog = cls(dataRoot)
+        os.makedirs(os.path.dirname(catalog.catalogFile), exist_ok=True)
+        with catalog._connect() as conn:
+            _createSubjectsTable(conn)
+            _createSummaryTable(conn)
+        conn.close()
+        return catalog
+
+    def upsertSubject(self, subjID, metaDict, metaStamp=None):
+        """Insert or update catalog entry for subject
+
+        Args:
+            subjID (str): subject ID
+            metaDict (dict): subject meta dictionary (as from Tags.json)
+            metaStamp (str, optional): stamp of meta file metaDict was read from (see getFileStamp). 
+                Defaults to None (row not used until updated with a stamp).
+        """
+        values = [subjID] + [_toValue(metaDict.get(i, None)) for i in CATALOG_TAGS] + [metaStamp]
+        columns = ", ".join(["SubjectID"] + CATALOG_TAGS + ["MetaStamp"])
+        with self._connect() as conn:
+            conn.execute(f"INSERT OR REPLACE INTO subjects ({columns}) VALUES ({', '.join(['?']*len(values))})", values)
+        conn.close()
+
+    def upsertSummary(self, subjID, summaryDict):
+        """Insert or update summary snapshot row for subject. 
+        Only columns given are updated (other columns of an existing row are kept).
+
+        Args:
+            subjID (str): subject ID
+            summaryDict (dict): values for (some of) SUMMARY_COLUMNS
+        """
+        self.upsertSummaries({subjID: summaryDict})
+
+    def upsertSummaries(self, summaryDicts):
+        """Insert or update summary snapshot rows for many subjects (one transaction)
+
+        Args:
+            summaryDicts (dict): subjID: {column: value} for (some of) SUMMARY_COLUMNS
+        """
+        with self._connect() as conn:
+            _createSummaryTable(conn) # Catalogs created before summary snapshot
+            for subjID, summaryDict in summaryDicts.items():
+                columns = [i for i in SUMMARY_COLUMNS if i in summaryDict]
+                if len(columns) == 0:
+                    continue
+                values = [subjID] + [summaryDict[i] for i in columns]
+                updates = ", ".join([f"{i}=excluded.{i}" for i in columns])
+                conn.execute(f"INSERT INTO summary ({', '.join(['SubjectID'] + columns)}) VALUES ({', '.join(['?']*len(values))}) "
+                             f"ON CONFLICT(SubjectID) DO UPDATE SET {updates}", values)
+        conn.close()
+
+    def getSummary(self):
+        """Get summary snapshot of all subjects in catalog (single query)
+
+        Returns:
+            dict: subjID: {column: value} for SUMMARY_COLUMNS
+        """
+        columns = list(SUMMARY_COLUMNS)
+        with self._connect() as conn:
+            _createSummaryTable(conn)
+            rows = conn.execute(f"SELECT SubjectID, {', '.join(columns)} FROM summary").fetchall()
+        conn.close()
+        return {i[0]: dict(zip(columns, i[1:])) for i in rows}
+
+    def removeSubject(self, subjID):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM subjects WHERE SubjectID = ?", (subjID,))
+            _createSummaryTable(conn)
+            conn.execute("DELETE FROM summary WHERE SubjectID = ?", (subjID,))
+        conn.close()
+
+    def getTagValues(self, tagName):
+        """Get value of tag for all subjects in catalog, with the meta file stamp each value was read from. 
+        Compare stamp to getFileStamp of the subject meta file before use.
+
+        Args:
+            tagName (str): one of CATALOG_TAGS
+
+        Returns:
+            dict: subjID: (value, metaStamp) (value None if subject has no value for tag)
+        """
+        _checkTagName(tagName)
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT SubjectID, {tagName}, MetaStamp FROM subjects").fetchall()
+        conn.close()
+        return {i[0]: (i[1], i[2]) for i in rows}
+
+
+def getCatalog(dataRoot):
+    """Return SubjectCatalog for dataRoot if catalog file exists, else None
+    """
+    catalog = SubjectCatalog(dataRoot)
+    if catalog.exists():
+        return catalog
+    return None
+
+
+def getFileStamp(fileName):
+    """Stamp of file ("mtime_ns:size") as held in summary MetaStamp column, None if file not found
+    """
+    try:
+        st = os.stat(fileName)
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def _createSubjectsTable(conn):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS subjects (SubjectID TEXT PRIMARY KEY, {', '.join(CATALOG_TAGS)}, MetaStamp TEXT)")
+    for iTag in CATALOG_TAGS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{iTag} ON subjects ({iTag})")
+
+
+def _createSummaryTable(conn):
+    columns = ", ".join([f"{k} {v}" for k, v in SUMMARY_COLUMNS.items()])
+    conn.execute(f"CREATE TABLE IF NOT EXISTS summary (SubjectID TEXT PRIMARY KEY, {columns})")
+
+
+def _checkTagName(tagName):
+    if tagName not in CATALOG_TAGS:
+        raise ValueError(f"{tagName} not held in catalog. Catalog tags: {CATALOG_TAGS}")
+
+
+def _toValue(value):
+    """Value as stored in catalog: None, str, int and float kept (with type), others as text"""
+    if (value is None) or isinstance(value, (str, int, float)):
+        return value
+    return str(value)
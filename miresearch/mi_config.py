@@ -37,7 +37,13 @@ class _MIResearch_config():
         self._data_root_dir = self.config.get("app", "data_root_dir", fallback="")
         self._subject_prefix = self.config.get("app", "subject_prefix", fallback="")
         self.stable_directory_age_sec = self.config.getint("app", "stable_directory_age_sec", fallback=60)
+        self.stable_directory_size_check = self.config.getboolean("app", "stable_directory_size_check", fallback=False)
         self.default_pad_zeros = self.config.getint("app", "default_pad_zeros", fallback=6)
+        self.meta_cache_size = self.config.getint("app", "meta_cache_size", fallback=1000)
+        self.log_handler_pool_size = self.config.getint("app", "log_handler_pool_size", fallback=100)
+        self.log_buffer_size = self.config.getint("app", "log_buffer_size", fallback=0)
+        self.watchdog_workers = self.config.getint("app", "watchdog_workers", fallback=2)
+        self.watchdog_queue_size = self.config.getint("app", "watchdog_queue_size", fallback=100)
         self.directory_structure = json.loads(self.config.get("app", "directories"))
 
         ## All parameters: 
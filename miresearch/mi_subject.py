@@ -14,19 +14,29 @@ Adapted for general use from KMR project.
 
 import os
 import re
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
 from zipfile import ZipFile
 import numpy as np
 import datetime
 import pandas as pd
 import shutil
+import tempfile
 import logging
+import logging.handlers
+import multiprocessing
 from functools import wraps
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 ##
 from spydcmtk import spydcm
 from ngawari import fIO
 import inspect  
 
 from miresearch import mi_utils
+from miresearch import mi_catalog
 
 
 # ====================================================================================================
@@ -45,19 +55,200 @@ def ui_method(description: str = "",
     def decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
-            # Set flag that this was called via UI
-            wrapper._called_via_ui = True
-            result = f(*args, **kwargs)
-            wrapper._called_via_ui = False
-            return result
+            return f(*args, **kwargs)
         wrapper._is_ui_method = True
         wrapper._ui_description = description
         wrapper._ui_category = category
         wrapper._ui_order = order
-        wrapper._called_via_ui = False
         return wrapper
     return decorator
 
+# Per thread depth of calls made via runUIMethod (UI calls run concurrently on job runner threads)
+_UI_CALL_STATE = threading.local()
+
+def runUIMethod(method, *args, **kwargs):
+    """Call method as called from the UI: isCalledViaUI is True within the call (in this thread only)
+    """
+    _UI_CALL_STATE.depth = getattr(_UI_CALL_STATE, 'depth', 0) + 1
+    try:
+        return method(*args, **kwargs)
+    finally:
+        _UI_CALL_STATE.depth -= 1
+
+def isCalledViaUI():
+    """True if running within a call made with runUIMethod in this thread"""
+    return getattr(_UI_CALL_STATE, 'depth', 0) > 0
+
+# Process pools are started with 'spawn' - forking a multithreaded process (e.g. UI, watchdog) can leave 
+#   the child holding locks (meta cache, log handler pool, logging) held by other threads at fork
+_PROCESS_POOL_CONTEXT = multiprocessing.get_context('spawn')
+
+# ====================================================================================================
+#       META CACHE
+# ====================================================================================================
+class _MetaDictCache(object):
+    """Process wide LRU cache of parsed subject meta json files.
+    Entries are keyed on file path and validated against file mtime and size, so
+    edits made by other processes are picked up on the next read.
+    """
+    def __init__(self, maxSize) -> None:
+        self.maxSize = maxSize
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, fileName):
+        """Return parsed json for fileName (shared - do not modify) or None if file not found
+        """
+        try:
+            st = os.stat(fileName)
+        except FileNotFoundError:
+            self.invalidate(fileName)
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._cache.get(fileName)
+            if (entry is not None) and (entry[0] == stamp):
+                self._cache.move_to_end(fileName)
+                return entry[1]
+        dd = fIO.parseJsonToDictionary(fileName)
+        with self._lock:
+            self._cache[fileName] = (stamp, dd)
+            self._cache.move_to_end(fileName)
+            while len(self._cache) > max(self.maxSize, 0):
+                self._cache.popitem(last=False)
+        return dd
+
+    def invalidate(self, fileName):
+        with self._lock:
+            self._cache.pop(fileName, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+_META_CACHE = _MetaDictCache(mi_utils.MIResearch_config.meta_cache_size)
+
+
+def _writeJSONFile(fileName, dd):
+    """Write dictionary to json file (as held in meta cache). 
+    Written to temporary file then renamed - so concurrent readers never see a partial file.
+    """
+    tmpFile = f"{fileName}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        spydcm.dcmTools.writeDictionaryToJSON(tmpFile, dd)
+        os.replace(tmpFile, fileName)
+    finally:
+        if os.path.isfile(tmpFile):
+            os.remove(tmpFile)
+    _META_CACHE.invalidate(fileName)
+
+# ====================================================================================================
+#       SUBJECT LOG HANDLER POOL
+# ====================================================================================================
+LOG_FORMATTER = logging.Formatter('%(asctime)s | %(levelname)-7s | %(name)s | %(message)s', datefmt='%d-%b-%y %H:%M:%S')
+
+class _LogHandlerPool(object):
+    """Process wide LRU pool of subject loggers with attached handlers. 
+    At most maxSize subject loggers have handlers attached - the least recently used is flushed, 
+    closed and detached when a new subject logger is needed. 
+    File handlers open the log file on first record (so a subject that never logs holds no file). 
+    If bufferSize > 0 then records are held in memory and written in batches of bufferSize 
+    (and immediately for ERROR and above, on eviction and at exit).
+    """
+    def __init__(self, maxSize, bufferSize=0) -> None:
+        self.maxSize = maxSize
+        self.bufferSize = bufferSize
+        self._pool = OrderedDict() # loggerName: list of attached handlers
+        self._lock = threading.RLock()
+
+    def getLogger(self, loggerName, logfileName_func, QUIET=False):
+        """Return logger loggerName with handlers attached (attached only if not already in pool)
+
+        Args:
+            loggerName (str): logger name
+            logfileName_func (callable): returns log file name - called only if handlers need to be attached
+            QUIET (bool, optional): If False also log to stream. Defaults to False.
+
+        Returns:
+            logging.Logger
+        """
+        logger = logging.getLogger(loggerName)
+        with self._lock:
+            if loggerName in self._pool:
+                self._pool.move_to_end(loggerName)
+                return logger
+            self._detach(logger) # handlers left from e.g. a pool clear
+            fh = logging.FileHandler(logfileName_func(), mode='a', delay=True)
+            fh.setFormatter(LOG_FORMATTER)
+            if self.bufferSize > 0:
+                attached = [logging.handlers.MemoryHandler(self.bufferSize, flushLevel=logging.ERROR, target=fh)]
+            else:
+                attached = [fh]
+            if not QUIET:
+                attached.append(logging.StreamHandler())
+            for iHandler in attached:
+                iHandler._miresearchPooled = True
+                logger.addHandler(iHandler)
+            logger.setLevel(logging.INFO)
+            self._pool[loggerName] = attached + ([fh] if self.bufferSize > 0 else [])
+            while len(self._pool) > max(self.maxSize, 1):
+                self.release(next(iter(self._pool)))
+        return logger
+
+    def _detach(self, logger):
+        for iHandler in [i for i in logger.handlers if getattr(i, '_miresearchPooled', False)]:
+            logger.removeHandler(iHandler)
+            iHandler.close()
+
+    def release(self, loggerName):
+        """Flush, close and detach handlers of loggerName (if in pool)"""
+        with self._lock:
+            handlers = self._pool.pop(loggerName, None)
+            if handlers is None:
+                return
+            logger = logging.getLogger(loggerName)
+            for iHandler in handlers: # MemoryHandler first - flushes to file handler before that is closed
+                logger.removeHandler(iHandler)
+                iHandler.close()
+
+    def flush(self):
+        """Write any buffered records"""
+        with self._lock:
+            for handlers in self._pool.values():
+                for iHandler in handlers:
+                    iHandler.flush()
+
+    def clear(self):
+        with self._lock:
+            for loggerName in list(self._pool.keys()):
+                self.release(loggerName)
+
+_LOG_HANDLER_POOL = _LogHandlerPool(mi_utils.MIResearch_config.log_handler_pool_size, 
+                                    mi_utils.MIResearch_config.log_buffer_size)
+
+# ====================================================================================================
+#       PROCESS POOL
+# ====================================================================================================
+def _initWorkerProcess(configFiles):
+    """Process pool initializer - spawned workers import with default configuration only, 
+    so re-read the configuration files active in the parent (including any -config / project config file)
+    """
+    mi_utils.MIResearch_config.all_config_files = list(configFiles)
+    mi_utils.MIResearch_config.runconfigParser()
+    _META_CACHE.maxSize = mi_utils.MIResearch_config.meta_cache_size
+    _LOG_HANDLER_POOL.maxSize = mi_utils.MIResearch_config.log_handler_pool_size
+    _LOG_HANDLER_POOL.bufferSize = mi_utils.MIResearch_config.log_buffer_size
+
+def _getProcessPool(nWorkers):
+    """Return ProcessPoolExecutor of nWorkers spawned processes using this process's configuration"""
+    return ProcessPoolExecutor(max_workers=nWorkers, mp_context=_PROCESS_POOL_CONTEXT, 
+                               initializer=_initWorkerProcess, 
+                               initargs=(list(mi_utils.MIResearch_config.all_config_files),))
+
+# Default summary columns (from meta) - 'Age' and 'TotalDicoms' are derived
+SUMMARY_INFO_KEYS = ['SubjectID', 'SubjN', 'PatientBirthDate', 'PatientID', 'PatientName', 'PatientSex',
+                    'StudyDate', 'StudyDescription', 'StudyInstanceUID', 'StudyID']
+
 # ====================================================================================================
 #       ABSTRACT SUBJECT CLASS
 # ====================================================================================================
@@ -65,6 +256,10 @@ class AbstractSubject(object):
     """
     An abstract subject controlling most basic structure
     """
+    # Subfolders added to the config directory structure (see mi_utils.buildDirectoryStructureTree). 
+    #   Subclasses set this to share one cached tree across instances
+    EXTRA_SUBFOLDERS = ()
+
     def __init__(self, subjectNumber, 
                         dataRoot, 
                         subjectPrefix=None,
@@ -104,13 +299,14 @@ class AbstractSubject(object):
         else:
             padZeros = int(padZeros)
         self.padZeros = padZeros
-        self.DIRECTORY_STRUCTURE_TREE = mi_utils.buildDirectoryStructureTree()
+        self._directoryStructureTree = None # built on first use - see DIRECTORY_STRUCTURE_TREE
         self.BUILD_DIR_IF_NEED = True
         self.dicomMetaTagList = mi_utils.DEFAULT_DICOM_META_TAG_LIST
         self.QUIET = False
         #
-        self._logger = None
-        self._loggerFH = None
+        self._loggerName = None
+        self._dicomScan = None
+        self._metaStaged = None # {metasuffix: dict} of updates staged within a metaTransaction
 
 
     ### ----------------------------------------------------------------------------------------------------------------
@@ -165,21 +361,28 @@ class AbstractSubject(object):
     @property
     def subjN(self):
         return splitSubjID(self.subjID)[1]
+
+    @property
+    def DIRECTORY_STRUCTURE_TREE(self):
+        if self._directoryStructureTree is None:
+            self._directoryStructureTree = mi_utils.getDirectoryStructureTree(self.EXTRA_SUBFOLDERS)
+        return self._directoryStructureTree
+
+    @DIRECTORY_STRUCTURE_TREE.setter
+    def DIRECTORY_STRUCTURE_TREE(self, directoryStructureTree):
+        self._directoryStructureTree = directoryStructureTree
     ### ----------------------------------------------------------------------------------------------------------------
     ### Logging
     ### ----------------------------------------------------------------------------------------------------------------
     @property
     def logger(self):
-        if self._logger is None:
+        """Subject logger (writes to logfileName). Handlers are held in a bounded, process wide pool 
+        (config log_handler_pool_size, optional buffering log_buffer_size) - so safe to use across many subjects.
+        """
+        if self._loggerName is None:
             rr = os.path.split(self.dataRoot)[1]
-            self._logger = logging.getLogger(f"{rr}/{self.subjID}")
-            self._logger.setLevel(logging.INFO)
-            self._loggerFH = logging.FileHandler(self.logfileName)
-            self._loggerFH.setFormatter(logging.Formatter('%(asctime)s | %(levelname)-7s | %(name)s | %(message)s', datefmt='%d-%b-%y %H:%M:%S'))
-            self._logger.addHandler(self._loggerFH)
-            if not self.QUIET:
-                self._logger.addHandler(logging.StreamHandler())
-        return self._logger
+            self._loggerName = f"{rr}/{self.subjID}"
+        return _LOG_HANDLER_POOL.getLogger(self._loggerName, lambda: self.logfileName, QUIET=self.QUIET)
 
     @property
     def logfileName(self):
@@ -188,12 +391,9 @@ class AbstractSubject(object):
     def _renameLogger(self):
         """Rename the logger - is run from method renameSubjID
         """
-        self._loggerFH.close()
-        self.logger.removeHandler(self._loggerFH)
-        self._loggerFH = None
-        self._loggerFH = logging.FileHandler(self.logfileName, mode='a')
-        self._loggerFH.setFormatter(logging.Formatter('%(asctime)s | %(levelname)-7s | %(name)s | %(message)s', datefmt='%d-%b-%y %H:%M:%S'))
-        self._logger.addHandler(self._loggerFH)
+        if self._loggerName is not None:
+            _LOG_HANDLER_POOL.release(self._loggerName)
+        self._loggerName = None
 
     def setLoggerDebug(self):
         self.logger.setLevel(logging.DEBUG)
@@ -237,13 +437,22 @@ class AbstractSubject(object):
         self._finalLoadSteps(d0, dI, anonName=anonName)
     
     def _finalLoadSteps(self, initNumDicoms, numDicomsToLoad, anonName=None):
-        self.buildDicomMeta()
-        if anonName is not None:
-            self.anonymise(anonName=anonName)
-        finalNumDicoms = self.countNumberOfDicoms()
-        self.logger.info(f"Initial number of dicoms: {initNumDicoms}, number to load: {numDicomsToLoad}, final number dicoms: {finalNumDicoms}")
-        self.buildSeriesDataMetaCSV(FORCE=True)
-        self.runPostLoadPipeLine()
+        # One header scan of the DICOM directory is shared by all post load steps
+        #   and load meta updates are written once - committed before anonymise (own transaction), 
+        #   so a failed anonymise does not leave the loaded subject without meta
+        with self.dicomScanSession():
+            with self.metaTransaction():
+                self.buildDicomMeta()
+                self.buildSeriesDataMetaCSV(FORCE=True) # Series information not changed by anonymisation
+            if anonName is not None:
+                try:
+                    self.anonymise(anonName=anonName)
+                except Exception as e:
+                    self.logger.error(f"Anonymise after load failed ({type(e).__name__}: {e}) - loaded dicoms NOT anonymised")
+                    raise
+            finalNumDicoms = self.countNumberOfDicoms()
+            self.logger.info(f"Initial number of dicoms: {initNumDicoms}, number to load: {numDicomsToLoad}, final number dicoms: {finalNumDicoms}")
+            self.runPostLoadPipeLine()
 
 
     def runPostLoadPipeLine(self, *args, **kwargs):
@@ -303,10 +512,59 @@ class AbstractSubject(object):
         self.subjectPrefix = newSubjID
         self._subjN = None
         self._renameLogger()
+        self._updateCatalog(removeSubjID=oldID)
         self.logger.warning(f"New logger after subjID changed from {oldID} to {self.subjID}")
         self.logger.warning(" *** THIS WILL LIKELY HAVE BREAKING CONSEQUENCES ***")        
-        self.buildDicomMeta()
-        self.buildSeriesDataMetaCSV(FORCE=True)
+        with self.dicomScanSession(RESCAN=True):
+            self.buildDicomMeta()
+            self.buildSeriesDataMetaCSV(FORCE=True)
+
+    ### DICOM SCAN -----------------------------------------------------------------------------------------------------
+    def _scanDicoms(self):
+        """Read all dicom headers (no pixel data) under the DICOM directory.
+
+        Returns:
+            tuple: spydcm ListOfDicomStudies, list of series info dictionaries
+        """
+        dcmStudies = spydcm.dcmTK.ListOfDicomStudies.setFromDirectory(self.getDicomsDir(), OVERVIEW=True, HIDE_PROGRESSBAR=True)
+        seriesInfoList = []
+        for iDcmStudy in dcmStudies:
+            for iSeries in iDcmStudy:
+                serDict = iSeries.getSeriesInfoDict(["SeriesNumber", 
+                                                    "SeriesDescription", 
+                                                    "StudyDate", 
+                                                    "AcquisitionTime",
+                                                    "InPlanePhaseEncodingDirection", 
+                                                    "PixelBandwidth"])
+                serDict['DicomFileName'] = iSeries.getDicomFullFileName().replace(self.getTopDir(), "")
+                seriesInfoList.append(serDict)
+        return dcmStudies, seriesInfoList
+
+    @contextmanager
+    def dicomScanSession(self, RESCAN=False):
+        """Context in which one header scan of the DICOM directory is held and shared 
+        (by buildDicomMeta, buildSeriesDataMetaCSV, runPostLoadPipeLine etc). 
+        Sessions may be nested - the outermost session releases the scan.
+
+        Args:
+            RESCAN (bool, optional): Set True to (re)scan even if a scan is held 
+                - use after dicoms have been changed. Defaults to False.
+        """
+        OUTER = self._dicomScan is None
+        if OUTER or RESCAN:
+            self._dicomScan = self._scanDicoms()
+        try:
+            yield self._dicomScan[0]
+        finally:
+            if OUTER:
+                self._dicomScan = None
+
+    def getDicomStudiesScan(self):
+        """Get header only scan of DICOM directory as spydcm ListOfDicomStudies. 
+        Returns the held scan if within a dicomScanSession, else reads DICOM directory.
+        """
+        with self.dicomScanSession() as dcmStudies:
+            return dcmStudies
 
     ### META STUFF -----------------------------------------------------------------------------------------------------
     def getSeriesMetaCSV(self):
@@ -320,18 +578,8 @@ class AbstractSubject(object):
     def buildSeriesDataMetaCSV(self, FORCE=False):
         if os.path.isfile(self.getSeriesMetaCSV()) and (not FORCE):
             return 
-        seInfoList = []
-        dcmStudies = spydcm.dcmTK.ListOfDicomStudies.setFromDirectory(self.getDicomsDir(), HIDE_PROGRESSBAR=True)
-        for dcmStudy in dcmStudies:
-            for dcmSE in dcmStudy:
-                iSerDict = dcmSE.getSeriesInfoDict(["SeriesNumber", 
-                                                            "SeriesDescription", 
-                                                            "StudyDate", 
-                                                            "AcquisitionTime",
-                                                            "InPlanePhaseEncodingDirection", 
-                                                            "PixelBandwidth",
-                                                            ])
-                seInfoList.append(iSerDict)
+        with self.dicomScanSession():
+            seInfoList = [{k: v for k, v in iSerDict.items() if k != 'DicomFileName'} for iSerDict in self._dicomScan[1]]
         df = pd.DataFrame(data=seInfoList)
         df.to_csv(self.getSeriesMetaCSV())
         self.logger.info('buildSeriesDataMetaCSV')
@@ -453,12 +701,19 @@ class AbstractSubject(object):
             suffix (str, optional): Suffix of json file. Defaults to "".
 
         Returns:
-            dict: Meta json file 
+            dict: Meta json file
+        """
+        return copy.deepcopy(self._readMetaDict(suffix))
+
+    def _readMetaDict(self, suffix=""):
+        """Get meta json file as dictionary from the meta cache (with any updates staged in a metaTransaction).
+        The returned dictionary is shared - do not modify (use getMetaDict for a copy).
         """
-        ff = self.getMetaTagsFile(suffix)
-        dd = {}
-        if os.path.isfile(ff):
-            dd = fIO.parseJsonToDictionary(ff)
+        dd = _META_CACHE.get(self.getMetaTagsFile(suffix))
+        if dd is None:
+            dd = {}
+        if self._metaStaged and (suffix in self._metaStaged):
+            dd = {**dd, **self._metaStaged[suffix]}
         return dd
 
     def getMetaTagValue(self, tag, NOT_FOUND=None, metaSuffix=""):
@@ -476,7 +731,7 @@ class AbstractSubject(object):
             ANY: tag value from json file
         """
         try:
-            return self.getMetaDict(metaSuffix).get(tag, NOT_FOUND)
+            return copy.deepcopy(self._readMetaDict(metaSuffix).get(tag, NOT_FOUND))
         except OSError as e:
             if NOT_FOUND is not None:
                 return NOT_FOUND
@@ -484,16 +739,71 @@ class AbstractSubject(object):
                 raise e
 
     def updateMetaFile(self, metaDict, metasuffix=""):
-        """Update the meta json file
+        """Update the meta json file. 
+        If within a metaTransaction then the update is staged and written when the transaction ends.
 
         Args:
             metaDict (dict): dictionary with key value pairs to update
             metasuffix (str, optional): Suffix of json file. Defaults to "".
         """
+        if self._metaStaged is not None:
+            self._metaStaged.setdefault(metasuffix, {}).update(copy.deepcopy(metaDict))
+            return
+        self._writeMetaFile(metaDict, metasuffix)
+
+    @contextmanager
+    def metaTransaction(self):
+        """Context in which meta updates (updateMetaFile, setTagValue etc) are collected in memory 
+        and written with a single (atomic) write per meta file on exit. 
+        Reads within the context see staged updates. Updates are discarded if an exception is raised. 
+        Transactions may be nested - the outermost transaction writes.
+        """
+        OUTER = self._metaStaged is None
+        if OUTER:
+            self._metaStaged = {}
+        try:
+            yield self
+            if OUTER:
+                staged = self._metaStaged
+                self._metaStaged = None
+                for iSuffix, iMetaDict in staged.items():
+                    self._writeMetaFile(iMetaDict, iSuffix)
+        finally:
+            if OUTER:
+                self._metaStaged = None
+
+    def _writeMetaFile(self, metaDict, metasuffix="", LOG=True):
         dd = self.getMetaDict(metasuffix)
         dd.update(metaDict)
-        spydcm.dcmTools.writeDictionaryToJSON(self.getMetaTagsFile(metasuffix), dd)
-        self.logger.info('Updated meta-file')
+        _writeJSONFile(self.getMetaTagsFile(metasuffix), dd)
+        if len(metasuffix) == 0:
+            self._updateCatalog(dd, LOG=LOG)
+        if LOG:
+            self.logger.info('Updated meta-file')
+
+    def _updateCatalog(self, metaDict=None, removeSubjID=None, LOG=True):
+        """Update this subject in the project catalog (if catalog exists in dataRoot). 
+        Catalog tags and summary snapshot meta values are updated (derived values are updated when read - 
+        see SubjectList.getSummarySnapshotRows).
+
+        Args:
+            metaDict (dict, optional): meta dictionary to write to catalog. Defaults to None.
+            removeSubjID (str, optional): subject ID to remove from catalog (e.g. after rename). Defaults to None.
+            LOG (bool, optional): log failure to subject log - else raise. Defaults to True.
+        """
+        catalog = mi_catalog.getCatalog(self.dataRoot)
+        if catalog is None:
+            return
+        try:
+            if removeSubjID is not None:
+                catalog.removeSubject(removeSubjID)
+            if metaDict is not None:
+                catalog.upsertSubject(self.subjID, metaDict, mi_catalog.getFileStamp(self.getMetaTagsFile()))
+                catalog.upsertSummary(self.subjID, self.getSummaryMetaValues())
+        except mi_catalog.CatalogError as e:
+            if not LOG:
+                raise e
+            self.logger.warning(f"Failed to update project catalog: {e}")
 
     def buildDicomMeta(self):
         """Builds a JSON file comprised of DICOM tags and some derived values. 
@@ -508,31 +818,134 @@ class AbstractSubject(object):
         """
         # this uses pydicom - so tag names are different.
         ddFull = {'SubjectID': self.subjID, 'SubjN': self._subjN, 'Series': []}
-        dcmStudies = spydcm.dcmTK.ListOfDicomStudies.setFromDirectory(self.getDicomsDir(), HIDE_PROGRESSBAR=True)
-        try:
-            dcmDict = dcmStudies[0].getStudySummaryDict()
-            dcmDict.pop('Series') # Get more detailed series information
-            ddFull.update(dcmDict)
-            # 
-            for iDcmStudy in dcmStudies:
-                for iSeries in iDcmStudy:
-                    serDict = iSeries.getSeriesInfoDict(["SeriesNumber", 
-                                                                "SeriesDescription", 
-                                                                "StudyDate", 
-                                                                "AcquisitionTime",
-                                                                "InPlanePhaseEncodingDirection", 
-                                                                "PixelBandwidth"])
-                    serDict['DicomFileName'] = iSeries.getDicomFullFileName().replace(self.getTopDir(), "")
-                    ddFull['Series'].append(serDict)
-        except IndexError:
-            pass # Found no Dicoms
+        with self.dicomScanSession():
+            dcmStudies, seriesInfoList = self._dicomScan
+            try:
+                dcmDict = dcmStudies[0].getStudySummaryDict()
+                dcmDict.pop('Series') # Get more detailed series information
+                ddFull.update(dcmDict)
+                ddFull['Series'] = copy.deepcopy(seriesInfoList)
+            except IndexError:
+                pass # Found no Dicoms
+            self.buildSeriesIndex()
         self.updateMetaFile(ddFull)
 
+    ### SERIES INDEX ---------------------------------------------------------------------------------------------------
+    def getSeriesIndexFile(self):
+        return os.path.join(self.getMetaDir(), 'SeriesIndex.json')
+
+    def buildSeriesIndex(self):
+        """Build and write the series index (META/SeriesIndex.json). 
+        For each series: SeriesNumber, SeriesInstanceUID, SeriesDescription, Directory (relative to subject top directory), 
+        NumberOfFiles, FirstFile and LastFile. 
+        Directory modified times are stored so that the index can be cheaply validated. 
+        Uses the held scan if within a dicomScanSession, else a fast one file per directory scan.
+
+        Returns:
+            dict: the series index
+        """
+        if self._dicomScan is not None:
+            dcmStudies = self._dicomScan[0]
+        else:
+            dcmStudies = spydcm.dcmTK.ListOfDicomStudies.setFromDirectory(self.getDicomsDir(), OVERVIEW=True, 
+                                                                            ONE_FILE_PER_DIR=True, HIDE_PROGRESSBAR=True)
+        topDir, dicomDir = self.getTopDir(), self.getDicomsDir()
+        seriesList, dirMtimes = [], {}
+        for iDcmStudy in dcmStudies:
+            for iSeries in iDcmStudy:
+                seDir = iSeries.getRootDir()
+                fileNames = sorted([i.name for i in os.scandir(seDir) if i.is_file()])
+                try:
+                    seNum = int(iSeries.getTag('SeriesNumber'))
+                except (TypeError, ValueError): # No SE# (report of Sec Capture etc)
+                    seNum = None
+                seriesList.append({'SeriesNumber': seNum,
+                                   'SeriesInstanceUID': str(iSeries.getTag('SeriesInstanceUID')),
+                                   'SeriesDescription': str(iSeries.getTag('SeriesDescription')),
+                                   'Directory': os.path.relpath(seDir, topDir),
+                                   'NumberOfFiles': len(fileNames),
+                                   'FirstFile': fileNames[0] if len(fileNames) > 0 else None,
+                                   'LastFile': fileNames[-1] if len(fileNames) > 0 else None})
+                # Record modified time of series directory and parents up to DICOM directory
+                iDir = seDir
+                while iDir.startswith(dicomDir) and (iDir not in dirMtimes):
+                    dirMtimes[iDir] = os.stat(iDir).st_mtime_ns
+                    iDir = os.path.dirname(iDir)
+        dirMtimes[dicomDir] = os.stat(dicomDir).st_mtime_ns
+        seriesList = sorted(seriesList, key=lambda x: (x['SeriesNumber'] is None, x['SeriesNumber'] or 0))
+        seriesIndex = {'Series': seriesList, 
+                       'DirectoryMtimes': {os.path.relpath(k, topDir): v for k, v in dirMtimes.items()}}
+        _writeJSONFile(self.getSeriesIndexFile(), seriesIndex)
+        return seriesIndex
+
+    def _isSeriesIndexValid(self, seriesIndex):
+        topDir = self.getTopDir()
+        try:
+            for iDir, iMtime in seriesIndex['DirectoryMtimes'].items():
+                if os.stat(os.path.join(topDir, iDir)).st_mtime_ns != iMtime:
+                    return False
+        except (KeyError, OSError, AttributeError):
+            return False
+        return len(seriesIndex['DirectoryMtimes']) > 0
+
+    def getSeriesIndex(self):
+        """Get the series index (shared - do not modify). 
+        Validated against directory modified times and rebuilt if out of date.
+
+        Returns:
+            dict: series index - see buildSeriesIndex
+        """
+        seriesIndex = self._getValidSeriesIndex()
+        if seriesIndex is None:
+            seriesIndex = self.buildSeriesIndex()
+        return seriesIndex
+
+    def _getValidSeriesIndex(self):
+        """Return series index if exists and is valid, else None (does not rebuild)"""
+        seriesIndex = _META_CACHE.get(self.getSeriesIndexFile())
+        if (seriesIndex is None) or (not self._isSeriesIndexValid(seriesIndex)):
+            return None
+        return seriesIndex
+
 
     def countNumberOfDicoms(self):
+        """Number of dicom files. Taken from the series index (counts recorded at build) if it is valid, 
+        else counted from the DICOM directory.
+        """
+        if os.path.isdir(self.getTopDir()):
+            seriesIndex = self._getValidSeriesIndex()
+            if seriesIndex is not None:
+                return sum([i['NumberOfFiles'] for i in seriesIndex['Series']])
         return mi_utils.countFilesInDir(self.__getDicomsDir())
 
 
+    def getDerivedValuesStamp(self):
+        """Stamp of the subject files derived values (level completed, number of dicoms) are computed from: 
+        modified times of the subject directory, its subdirectories (except META - changed by every meta write), 
+        the series index file and the directories recorded in the series index. 
+        Subclasses computing level completed from other files (e.g. in META) should extend. 
+
+        Returns:
+            str: stamp (None if subject directory not found)
+        """
+        topDir = self.getTopDir()
+        try:
+            parts = [str(os.stat(topDir).st_mtime_ns)]
+            with os.scandir(topDir) as it:
+                parts += sorted([f"{i.name}:{i.stat().st_mtime_ns}" for i in it if i.is_dir() and (i.name != mi_utils.META)])
+        except OSError:
+            return None
+        seriesIndexFile = self.getSeriesIndexFile()
+        parts.append(str(mi_catalog.getFileStamp(seriesIndexFile)))
+        seriesIndex = _META_CACHE.get(seriesIndexFile) or {}
+        for iDir in seriesIndex.get('DirectoryMtimes', {}):
+            try:
+                parts.append(f"{iDir}:{os.stat(os.path.join(topDir, iDir)).st_mtime_ns}")
+            except OSError:
+                parts.append(f"{iDir}:")
+        return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
     def findDicomSeries(self, seriesDescription):
         if type(seriesDescription) != list:
             seriesDescription = [seriesDescription]
@@ -563,23 +976,17 @@ class AbstractSubject(object):
 
 
     def getDicomSeriesDir(self, seriesNum, seriesUID=None):
-        dcmStudies = spydcm.dcmTK.ListOfDicomStudies.setFromDirectory(self.getDicomsDir(), ONE_FILE_PER_DIR=True, HIDE_PROGRESSBAR=True)
+        seriesList = self.getSeriesIndex()['Series']
         if seriesUID is not None:
-            for dcmStudy in dcmStudies:
-                dcmSeries = dcmStudy.getSeriesByUID()
-                if dcmSeries is not None:
-                    break
+            dcmSeries = next((i for i in seriesList if i['SeriesInstanceUID'] == seriesUID), None)
             if dcmSeries is None:
                 raise ValueError(f"## ERROR: Series with UID: {seriesUID} NOT FOUND")
         else:
-            for dcmStudy in dcmStudies:
-                dcmSeries = dcmStudy.getSeriesByID(seriesNum)
-                if dcmSeries is not None:
-                    break
+            seriesNum = int(seriesNum)
+            dcmSeries = next((i for i in seriesList if i['SeriesNumber'] == seriesNum), None)
             if dcmSeries is None:
                 raise ValueError(f"## ERROR: Series with SE number: {seriesNum} NOT FOUND")
-        dirName = dcmSeries.getRootDir()
-        return dirName
+        return os.path.join(self.getTopDir(), dcmSeries['Directory'])
 
 
     def hasDicomSeries(self, seriesDescription):
@@ -601,37 +1008,17 @@ class AbstractSubject(object):
 
 
     def getDicomFoldersListStr(self, FULL=True, excludeSeNums=None):
-        dFolders = []
-        dcmStudies = spydcm.dcmTK.ListOfDicomStudies.setFromDirectory(self.getDicomsDir(), ONE_FILE_PER_DIR=True, HIDE_PROGRESSBAR=True)
-        for dcmStudy in dcmStudies:
-            for iSeries in dcmStudy:
-                dFolders.append(iSeries.getRootDir())
-        dS = sorted(dFolders, key=spydcm.dcmTools.instanceNumberSortKey)
+        seriesList = self.getSeriesIndex()['Series']
         if not FULL:
-            dS = [os.path.split(i)[1] for i in dS]
-            return dS
+            return [os.path.split(i['Directory'])[1] for i in seriesList]
         if excludeSeNums is None:
             excludeSeNums = []
-        seN = []
-        for i in dS:
-            try:
-                seN.append(int(i.split('_')[0][2:]))
-            except ValueError:
-                pass
-        dcmDirList = [self.getDicomSeriesDir(i) for i in seN if i not in excludeSeNums]
-        dcmDirList = sorted(dcmDirList, key=spydcm.dcmTools.instanceNumberSortKey)
-        return dcmDirList
+        return [os.path.join(self.getTopDir(), i['Directory']) for i in seriesList 
+                    if (i['SeriesNumber'] is not None) and (i['SeriesNumber'] not in excludeSeNums)]
 
 
     def getListOfSeNums(self):
-        se = []
-        for ff in self.getDicomFoldersListStr(FULL=False):
-            try:
-                sn = int(ff.split('_')[0].replace('SE',''))
-                se.append(sn)
-            except ValueError:
-                pass
-        return se
+        return [i['SeriesNumber'] for i in self.getSeriesIndex()['Series'] if i['SeriesNumber'] is not None]
 
 
     def getStudyID(self):
@@ -655,36 +1042,211 @@ class AbstractSubject(object):
         # Return values_list, info_keys:
         #   list of values for info keys (+ age). 
         #   header keys
-        infoKeys = ['SubjectID', 'SubjN', 'PatientBirthDate', 'PatientID', 'PatientName', 'PatientSex',
-                    'StudyDate', 'StudyDescription', 'StudyInstanceUID', 'StudyID'] + extraKeys
-        mm = self.getMetaDict()
-        aa = f"{self.getAge():5.2f}"
-        nDCM = f"{self.countNumberOfDicoms()}"
-        return [mm.get(i, "Unknown") for i in infoKeys]+[aa, nDCM], infoKeys + ['Age', 'TotalDicoms']
+        return self.getSummaryValues(SUMMARY_INFO_KEYS + extraKeys + ['Age', 'TotalDicoms'])
+
+    def getSummaryValues(self, columns, extra_series_tags=[]):
+        """Get summary values for requested columns only - so derived values are only computed if requested. 
+
+        Args:
+            columns (list): meta tag names, or derived values 'Age', 'TotalDicoms'
+            extra_series_tags (list, optional): series descriptions - meta of matching series appended. Defaults to [].
+
+        Returns:
+            tuple: list of values, list of header names
+        """
+        mm = self._readMetaDict()
+        values = []
+        for iColumn in columns:
+            if iColumn == 'Age':
+                values.append(f"{self.getAge():5.2f}")
+            elif iColumn == 'TotalDicoms':
+                values.append(f"{self.countNumberOfDicoms()}")
+            else:
+                values.append(mm.get(iColumn, "Unknown"))
+        valuesSe, headerSe = self._getSeriesSummaryValues(extra_series_tags)
+        return values + valuesSe, list(columns) + headerSe
+
+    def _getSeriesSummaryValues(self, extra_series_tags):
+        values, header = [], []
+        for iSeriesTag in extra_series_tags:
+            for seDict in self.getDicomSeriesMeta(seriesDescription=iSeriesTag):
+                kkS = sorted(seDict.keys())
+                header += [f"{iSeriesTag}_{kk}" for kk in kkS]
+                values += [seDict[i] for i in kkS]
+        return values, header
 
     # ------------------------------------------------------------------------------------------
     @ui_method(description="Anonymise subject", category="Anonymisation", order=1)
-    def anonymise(self, anonName=None, anonID="", QUIET=False):
+    def anonymise(self, anonName=None, anonID="", QUIET=False, FORCE=False):
         """
         Check if anonName is valid and return anonName and anonID
         If anonName = SOFT then set an encoded name in meta file and retain PatientID - anonymise DICOMS
         If anonName = HARD then set encoded name in meta file to "Unknown" - anonymise DICOMS
         If anonName is None then anonymise DICOMS
         Else anonymise DICOMS with anonName for Name and PatientID
+        Anonymisation is incremental: only DICOMS new or changed since the last anonymisation 
+        (with same name and ID - see anonymisation manifest) are rewritten. Set FORCE=True to rewrite all.
         """
         # Check if called via UI
-        called_via_ui = getattr(self.anonymise, '_called_via_ui', False)
-        if called_via_ui:
+        if isCalledViaUI():
             QUIET = True
-        name, firstNames = self.getName_FirstNames()
-        anonName, anonIDt = self._checkAnonName(anonName, name, firstNames)
-        if len(anonID) == 0:
-            anonID = anonIDt
-        self.logger.info(f'Begin anonymise in place. New name: "{anonName}"')
-        spydcm.anonymiseInPlace(self.getDicomsDir(), anonName=anonName, anonID=anonID, QUIET=QUIET)
-        self.logger.info('End anonymise')
-        self.setIsAnonymised()
-        self.buildDicomMeta()
+        with self.metaTransaction():
+            name, firstNames = self.getName_FirstNames()
+            anonName, anonIDt = self._checkAnonName(anonName, name, firstNames)
+            if len(anonID) == 0:
+                anonID = anonIDt
+            filesToAnon = None if FORCE else self._getDicomsToAnonymise(anonName, anonID)
+            if filesToAnon is None:
+                self.logger.info(f'Begin anonymise in place. New name: "{anonName}"')
+                spydcm.anonymiseInPlace(self.getDicomsDir(), anonName=anonName, anonID=anonID, QUIET=QUIET)
+            elif len(filesToAnon) > 0:
+                self.logger.info(f'Begin anonymise in place of {len(filesToAnon)} new dicoms. New name: "{anonName}"')
+                self._anonymiseDicomFiles(filesToAnon, anonName, anonID, QUIET)
+            else:
+                self.logger.info('No new dicoms to anonymise')
+            self.logger.info('End anonymise')
+            self.setIsAnonymised()
+            if (filesToAnon is None) or (len(filesToAnon) > 0):
+                with self.dicomScanSession(RESCAN=True): # dicoms rewritten - refresh any held scan
+                    self.buildDicomMeta()
+                self._writeAnonManifest(anonName, anonID)
+
+    ### SERIES OVERVIEW IMAGES ----------------------------------------------------------------------------------------
+    def getSeriesOverviewDir(self):
+        return self._getDir([mi_utils.META, 'Overview'])
+
+    def getSeriesOverviewImage(self, seriesNum, seriesUID=None, BUILD_IF_NEED=True):
+        """Overview image (PNG thumbnail of middle image of series) - cached in META/Overview. 
+        Cache keyed on SeriesInstanceUID and series directory modified time - so rebuilt if series changes.
+
+        Args:
+            seriesNum (int): series number
+            seriesUID (str, optional): SeriesInstanceUID (used in place of seriesNum if given). Defaults to None.
+            BUILD_IF_NEED (bool, optional): Build image if not cached (else return None). Defaults to True.
+
+        Returns:
+            str: path to PNG (or None if not cached and not BUILD_IF_NEED)
+        """
+        seriesList = self.getSeriesIndex()['Series']
+        if seriesUID is not None:
+            seIndex = next((i for i in seriesList if i['SeriesInstanceUID'] == seriesUID), None)
+        else:
+            seIndex = next((i for i in seriesList if i['SeriesNumber'] == int(seriesNum)), None)
+        if seIndex is None:
+            raise ValueError(f"## ERROR: Series {seriesNum} (UID: {seriesUID}) NOT FOUND")
+        seDir = os.path.join(self.getTopDir(), seIndex['Directory'])
+        fileKey = f"{seIndex['SeriesInstanceUID']}_"
+        overviewFile = os.path.join(self.getSeriesOverviewDir(), f"{fileKey}{os.stat(seDir).st_mtime_ns}.png")
+        if os.path.isfile(overviewFile) or (not BUILD_IF_NEED):
+            return overviewFile if os.path.isfile(overviewFile) else None
+        fileNames = sorted([i.name for i in os.scandir(seDir) if i.is_file()])
+        if len(fileNames) == 0:
+            return None
+        ds = spydcm.dicom.dcmread(os.path.join(seDir, fileNames[len(fileNames)//2]))
+        A = ds.pixel_array
+        if A.ndim == 4: # multi-frame colour: frames, rows, cols, samples
+            A = A[A.shape[0]//2, ..., 0]
+        elif (A.ndim == 3) and (ds.get('SamplesPerPixel', 1) == 1): # multi-frame
+            A = A[A.shape[0]//2]
+        elif A.ndim == 3: # colour
+            A = A[..., 0]
+        mi_utils.writeThumbnailPNG(A, overviewFile)
+        for iFile in os.listdir(self.getSeriesOverviewDir()): # Remove out of date images of this series
+            if iFile.startswith(fileKey) and (iFile != os.path.basename(overviewFile)):
+                try:
+                    os.remove(os.path.join(self.getSeriesOverviewDir(), iFile))
+                except OSError:
+                    pass
+        return overviewFile
+
+    def buildSeriesOverviewImages(self, nThreads=4):
+        """Build (if not cached) overview images for all series - concurrently
+
+        Returns:
+            list: paths to PNG (None for series where could not build), in series index order
+        """
+        def _build(seIndex):
+            try:
+                return self.getSeriesOverviewImage(None, seriesUID=seIndex['SeriesInstanceUID'])
+            except Exception as e:
+                self.logger.warning(f"Could not build overview image for series {seIndex['SeriesNumber']}: {e}")
+                return None
+        with ThreadPoolExecutor(max_workers=max(1, nThreads)) as executor:
+            return list(executor.map(_build, self.getSeriesIndex()['Series']))
+
+    ### ANONYMISATION MANIFEST -----------------------------------------------------------------------------------------
+    def getAnonManifestFile(self):
+        return os.path.join(self.getMetaDir(), 'AnonManifest.json')
+
+    def _getDicomFileStats(self):
+        """Return {relative path (to DICOM directory): [mtime_ns, size]} for all files in DICOM directory"""
+        dicomDir = self.getDicomsDir()
+        fileStats, dirsToScan = {}, [dicomDir]
+        while dirsToScan:
+            with os.scandir(dirsToScan.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirsToScan.append(entry.path)
+                    else:
+                        st = entry.stat()
+                        fileStats[os.path.relpath(entry.path, dicomDir)] = [st.st_mtime_ns, st.st_size]
+        return fileStats
+
+    def _writeAnonManifest(self, anonName, anonID):
+        """Record files in DICOM directory (modified time and size) as anonymised with anonName, anonID"""
+        _writeJSONFile(self.getAnonManifestFile(), {'AnonName': anonName, 'AnonID': anonID, 
+                                                    'Files': self._getDicomFileStats()})
+
+    def _getDicomsToAnonymise(self, anonName, anonID):
+        """Files in DICOM directory not in anonymisation manifest (or changed since)
+
+        Returns:
+            list: full paths of files to anonymise - or None if a full pass is needed 
+                (no manifest or manifest for different anonName / anonID)
+        """
+        manifest = _META_CACHE.get(self.getAnonManifestFile())
+        if (manifest is None) or (manifest.get('AnonName') != anonName) or (manifest.get('AnonID') != anonID):
+            return None
+        anonFiles, dicomDir = manifest.get('Files', {}), self.getDicomsDir()
+        return [os.path.join(dicomDir, k) for k, v in self._getDicomFileStats().items() if anonFiles.get(k) != v]
+
+    def _anonymiseDicomFiles(self, filesToAnon, anonName, anonID, QUIET=False):
+        """Anonymise given files (in DICOM directory) - rewritten to anonymised naming within DICOM directory. 
+        Files are anonymised in a (unique) working directory and only swapped into the DICOM directory 
+        once all have been written - on failure the DICOM directory is unchanged.
+        """
+        dicomDir = self.getDicomsDir()
+        workDir = tempfile.mkdtemp(prefix=".ANON.WORKING.", dir=os.path.dirname(dicomDir))
+        try:
+            inDir, outDir = os.path.join(workDir, "IN"), os.path.join(workDir, "OUT")
+            os.makedirs(inDir)
+            for k1, iFile in enumerate(filesToAnon):
+                iTmpFile = os.path.join(inDir, f"{k1}_{os.path.basename(iFile)}")
+                try:
+                    os.link(iFile, iTmpFile)
+                except OSError: # Hard links not supported
+                    shutil.copy2(iFile, iTmpFile)
+            spydcm.dcmTools.streamDicoms(inDir, outDir, anonName=anonName, anonID=anonID, HIDE_PROGRESSBAR=QUIET)
+            # Swap in: anonymised files to DICOM directory, then remove originals not replaced
+            newFiles = set()
+            for root, _, files in os.walk(outDir):
+                for iFile in files:
+                    iDest = os.path.join(dicomDir, os.path.relpath(os.path.join(root, iFile), outDir))
+                    os.makedirs(os.path.dirname(iDest), exist_ok=True)
+                    os.replace(os.path.join(root, iFile), iDest)
+                    newFiles.add(os.path.normpath(iDest))
+            for iFile in filesToAnon:
+                if os.path.normpath(iFile) not in newFiles:
+                    os.remove(iFile)
+        finally:
+            shutil.rmtree(workDir, ignore_errors=True)
+        # Remove any directories emptied (e.g. non-anonymised patient directory of newly loaded dicoms)
+        for root, _, _ in os.walk(dicomDir, topdown=False):
+            if root != dicomDir:
+                try:
+                    os.rmdir(root)
+                except OSError: # not empty
+                    pass
 
     def _checkAnonName(self, anonName, name="", firstNames=""):
         """
@@ -742,6 +1304,46 @@ class AbstractSubject(object):
 
 
     # ------------------------------------------------------------------------------------------
+    def getSummarySnapshotRow(self):
+        """Values held for this subject in the project summary snapshot (see mi_catalog.SUMMARY_COLUMNS). 
+
+        Returns:
+            dict: column: value
+        """
+        return {**self.getSummaryMetaValues(), **self.getSummaryDerivedValues()}
+
+    def getSummaryMetaValues(self):
+        """Summary snapshot values taken from the meta file only (mi_catalog.SUMMARY_META_COLUMNS). 
+        Name is held encoded (decode with mi_utils.decodeString and subject ID). 
+
+        Returns:
+            dict: column: value
+        """
+        metaStamp = mi_catalog.getFileStamp(self.getMetaTagsFile())
+        mm = self._readMetaDict()
+        if self.isAnonymised():
+            encName = mm.get("NAME", None)
+        else:
+            encName = mi_utils.encodeString(str(mm.get('PatientName', 'Name-Unknown')), self.subjID)
+        age = self.getAge()
+        return {"NAME": encName, 
+                "StudyDate": mm.get("StudyDate", None), 
+                "StudyID": self.getStudyID(), 
+                "Age": None if np.isnan(age) else float(age), 
+                "NumberOfSeries": len(mm.get("Series", [])), 
+                "MetaStamp": metaStamp}
+
+    def getSummaryDerivedValues(self):
+        """Summary snapshot values computed from subject files (mi_catalog.SUMMARY_DERIVED_COLUMNS)
+
+        Returns:
+            dict: column: value
+        """
+        derivedStamp = self.getDerivedValuesStamp() # Before values - so a change while computing is seen next time
+        return {"LevelCompleted": self.getLevelCompleted(), 
+                "NumberOfDicoms": self.countNumberOfDicoms(), 
+                "DerivedStamp": derivedStamp}
+
     def getSummary_list(self):
         hh = ["SubjectID","PatientID","Gender","StudyDate","NumberOfSeries","SERIES_DECRIPTIONS"]
         parts = [self.subjID, self.getMetaTagValue('PatientID'), 
@@ -756,7 +1358,7 @@ class AbstractSubject(object):
         This is intentional.
         :return: years - float
         """
-        dd = self.getMetaDict()
+        dd = self._readMetaDict()
         try:
             birth = dd["PatientBirthDate"]
             study = dd["StudyDate"]
@@ -796,7 +1398,7 @@ class AbstractSubject(object):
         return age
 
     def getGender(self):
-        return self.getMetaDict()['PatientSex']
+        return self._readMetaDict()['PatientSex']
     
     def isMale(self):
         sex = self.getGender()
@@ -840,6 +1442,104 @@ class AbstractSubject(object):
         dcmdir = self.getDicomSeriesDir(seNumber)
         return spydcm.dcmTK.DicomSeries.setFromDirectory(dcmdir)
 
+# ====================================================================================================
+#       LIGHTWEIGHT SUBJECT REFERENCE
+# ====================================================================================================
+class SubjectHandle(object):
+    """
+    Compact, read-only reference to a subject (subject number, prefix, padding, suffix and dataRoot only). 
+    For holding very large SubjectLists. 
+    Only the read methods in DELEGATED_METHODS (used by SubjectList) are available on a handle - each call 
+    builds a full subject for that call only. For anything else (or repeated access) use promote() 
+    once and work with the returned full subject object.
+    """
+    __slots__ = ('subjN', 'subjectPrefix', 'padZeros', 'suffix', 'dataRoot', 'SubjClass')
+    DELEGATED_METHODS = frozenset(['getTagValue', 'getMetaTagValue', 'getInfoStr', 'getSummaryValues', 
+                                   '_getSeriesSummaryValues', 'getSummaryMetaValues', 'getSummaryDerivedValues', 
+                                   'getDerivedValuesStamp', '_writeMetaFile'])
+
+    def __init__(self, subjN, dataRoot, subjectPrefix, padZeros=None, suffix="", SubjClass=None) -> None:
+        self.subjN = int(subjN)
+        self.dataRoot = dataRoot
+        self.subjectPrefix = subjectPrefix
+        self.padZeros = mi_utils.MIResearch_config.default_pad_zeros if padZeros is None else int(padZeros)
+        self.suffix = suffix
+        self.SubjClass = SubjClass
+
+    @classmethod
+    def setFromSubjID(cls, subjID, dataRoot, SubjClass=None):
+        """Build handle from subject ID string (must contain subject number)
+
+        Raises:
+            ValueError / IndexError: if subjID can not be split to prefix and number
+        """
+        prefix_N_suffix = splitSubjID(subjID)
+        suffix = prefix_N_suffix[2] if len(prefix_N_suffix) == 3 else ""
+        return cls(prefix_N_suffix[1], dataRoot, prefix_N_suffix[0], padZeros=findZeroPadding(subjID), 
+                   suffix=suffix, SubjClass=SubjClass)
+
+    def promote(self, SubjClass=None):
+        """Build full subject object
+
+        Args:
+            SubjClass (class, optional): Subject class. Defaults to None: class given at creation, 
+                else configured class_obj, else AbstractSubject.
+
+        Returns:
+            AbstractSubject (or SubjClass) instance
+        """
+        if SubjClass is None:
+            SubjClass = self.getSubjClass()
+        return SubjClass(self.subjN, self.dataRoot, subjectPrefix=self.subjectPrefix, padZeros=self.padZeros, suffix=self.suffix)
+
+    def getSubjClass(self):
+        """Subject class used by promote: class given at creation, else configured class_obj, else AbstractSubject"""
+        return self.SubjClass or mi_utils.MIResearch_config.class_obj or AbstractSubject
+
+    def __getattr__(self, name):
+        if name not in SubjectHandle.DELEGATED_METHODS:
+            raise AttributeError(f"'SubjectHandle' object has no attribute '{name}' - use promote() for the full subject")
+        return getattr(self.promote(), name)
+
+    def __hash__(self):
+        return hash((self.subjID, self.dataRoot))
+
+    def __eq__(self, other):
+        try:
+            return (self.subjID == other.subjID) & \
+                   (self.dataRoot == other.dataRoot)
+        except AttributeError:
+            return False
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __lt__(self, other):
+        return self.subjN < other.getPrefix_Number()[1]
+
+    def __str__(self):
+        return f"{self.subjID} at {self.dataRoot}"
+
+    @property
+    def subjID(self):
+        return buildSubjectID(self.subjN, self.subjectPrefix, padZeros=self.padZeros, suffix=self.suffix)
+
+    @property
+    def _subjN(self):
+        return self.subjN
+
+    def getPrefix_Number(self):
+        return splitSubjID(self.subjID)
+
+    def exists(self):
+        return os.path.isdir(self.getTopDir())
+
+    def getTopDir(self):
+        return os.path.join(self.dataRoot, self.subjID)
+
+    def getMetaTagsFile(self, suffix=""):
+        return os.path.join(self.getTopDir(), mi_utils.META, f"{self.subjID}Tags{suffix}.json")
+
 # ====================================================================================================
 #       LIST OF SUBJECTS CLASS
 # ====================================================================================================
@@ -852,10 +1552,24 @@ class SubjectList(list):
 
 
     @classmethod
-    def setByDirectory(cls, dataRoot, subjectPrefix=None, SubjClass=AbstractSubject):
-        listOfSubjects = getAllSubjects(dataRoot, subjectPrefix, SubjClass=SubjClass)
+    def setByDirectory(cls, dataRoot, subjectPrefix=None, SubjClass=AbstractSubject, HANDLES=False):
+        """Build list of all subjects in dataRoot
+
+        Args:
+            dataRoot (str): path to root directory of subject filesystem database
+            subjectPrefix (str, optional): Defaults to None: guessed from dataRoot.
+            SubjClass (class, optional): Subject class. Defaults to AbstractSubject.
+            HANDLES (bool, optional): Set True to hold compact SubjectHandle references (promoted to SubjClass) 
+                in place of full subject objects - for very large projects. Defaults to False.
+        """
+        listOfSubjects = _getAllSubjects(dataRoot, subjectPrefix, SubjClass=SubjClass, RETURN_HANDLES=HANDLES)
         return cls(listOfSubjects)
 
+    def promote(self, SubjClass=None):
+        """Return new SubjectList with any SubjectHandle promoted to full subject object (see SubjectHandle.promote)
+        """
+        return SubjectList(i.promote(SubjClass) if isinstance(i, SubjectHandle) else i for i in self)
+
     @property
     def subjIDs(self):
         return [i.subjID for i in self]
@@ -867,6 +1581,197 @@ class SubjectList(list):
     def __str__(self) -> str:
         return f"{len(self)} subjects of {self[0].subjectPrefix} at {self[0].dataRoot}"
 
+    def _getTagValues(self, tagName, ifNotFound='Unknown'):
+        """Get value of tag for each subject in list. 
+        Read from project catalog if present (and tag held there) and the subject meta file is unchanged 
+        since the catalog row was written (MetaStamp), else from each subject's meta file.
+
+        Returns:
+            list: tag values, in order of subjects in list
+        """
+        catalogValues = {}
+        if tagName in mi_catalog.CATALOG_TAGS:
+            for iDataRoot in set([i.dataRoot for i in self]):
+                catalog = mi_catalog.getCatalog(iDataRoot)
+                if catalog is not None:
+                    try:
+                        catalogValues[iDataRoot] = catalog.getTagValues(tagName)
+                    except mi_catalog.CatalogError:
+                        pass # Fall back to meta files
+        values = []
+        for iSubj in self:
+            iValue, iStamp = catalogValues.get(iSubj.dataRoot, {}).get(iSubj.subjID, (None, None))
+            if (iStamp is None) or (iStamp != mi_catalog.getFileStamp(iSubj.getMetaTagsFile())): 
+                iValue = iSubj.getTagValue(tagName, ifNotFound) # No catalog, subject not in catalog or meta changed since
+            elif iValue is None:
+                iValue = ifNotFound
+            values.append(iValue)
+        return values
+
+    def updateCatalog(self):
+        """Create (if needed) the project catalog and add / update all subjects in list 
+        (catalog tags and summary snapshot, including derived values)
+        """
+        for iDataRoot in set([i.dataRoot for i in self]):
+            mi_catalog.SubjectCatalog.create(iDataRoot)
+        for iSubj in self:
+            if iSubj.exists():
+                iSubj = iSubj.promote() if isinstance(iSubj, SubjectHandle) else iSubj
+                iSubj._updateCatalog(iSubj._readMetaDict())
+        self.getSummarySnapshotRows(FORCE_DERIVED=True)
+
+    def getSummarySnapshotRows(self, nThreads=8, knownRows=None, FORCE_DERIVED=False, VALIDATE=True):
+        """Summary snapshot (see mi_catalog.SUMMARY_COLUMNS) for subjects in list. 
+        Rows are read from the project catalog in one query per dataRoot. Meta values are rebuilt for subjects 
+        not in the catalog or whose meta file has changed since (MetaStamp), derived values (level completed, 
+        number of dicoms) for subjects whose files have changed since (DerivedStamp). 
+        Rebuilt rows are written back to the catalog. 
+
+        Args:
+            nThreads (int, optional): Number of threads for subjects not in / stale in catalog. Defaults to 8.
+            knownRows (dict, optional): rows from an earlier call (subjID: row) - used in place of catalog rows. Defaults to None.
+            FORCE_DERIVED (bool, optional): recompute derived values for all subjects. Defaults to False.
+            VALIDATE (bool, optional): check stored rows against subject files (MetaStamp, DerivedStamp). If False 
+                stored rows are returned as stored (no file system access) - only subjects without a row are built. 
+                Defaults to True.
+
+        Returns:
+            dict: subjID: row (SUMMARY_COLUMNS) for existing subjects (in list order)
+        """
+        snapshots, catalogs = {}, {}
+        for iDataRoot in set([i.dataRoot for i in self]):
+            catalogs[iDataRoot] = mi_catalog.getCatalog(iDataRoot)
+            if catalogs[iDataRoot] is not None:
+                try:
+                    snapshots[iDataRoot] = catalogs[iDataRoot].getSummary()
+                except mi_catalog.CatalogError:
+                    pass # Build from subjects
+        knownRows = knownRows or {}
+
+        def _getRow(iSubj):
+            row = knownRows.get(iSubj.subjID, snapshots.get(iSubj.dataRoot, {}).get(iSubj.subjID, None))
+            if (not VALIDATE) and (not FORCE_DERIVED) and (row is not None):
+                return iSubj.dataRoot, iSubj.subjID, dict(row), {}
+            row = dict(row or {})
+            updates = {}
+            if isinstance(iSubj, SubjectHandle): # Promote once for (possibly) several reads below
+                iSubj = iSubj.promote()
+            if row.get("MetaStamp", None) != mi_catalog.getFileStamp(iSubj.getMetaTagsFile()):
+                if not iSubj.exists():
+                    return None
+                updates.update(iSubj.getSummaryMetaValues())
+            if FORCE_DERIVED or (row.get("DerivedStamp", None) is None) or \
+                    (row["DerivedStamp"] != iSubj.getDerivedValuesStamp()):
+                if not iSubj.exists():
+                    return None
+                updates.update(iSubj.getSummaryDerivedValues())
+            row.update(updates)
+            return iSubj.dataRoot, iSubj.subjID, row, updates
+
+        with ThreadPoolExecutor(max_workers=max(1, nThreads)) as executor:
+            results = [i for i in executor.map(_getRow, self) if i is not None]
+        for iDataRoot, catalog in catalogs.items():
+            updates = {subjID: iUpdates for dataRoot, subjID, _, iUpdates in results if iUpdates and (dataRoot == iDataRoot)}
+            if (catalog is not None) and updates:
+                try:
+                    catalog.upsertSummaries(updates)
+                except mi_catalog.CatalogError:
+                    pass # Snapshot not updated - rebuilt again on next read
+        return {subjID: row for _, subjID, row, _ in results}
+
+    def getSummarySnapshot(self, nThreads=8):
+        """Summary snapshot for subjects in list as DataFrame (see getSummarySnapshotRows)
+
+        Returns:
+            pandas.DataFrame: one row per existing subject (in list order), columns SubjectID + SUMMARY_COLUMNS
+        """
+        rows = self.getSummarySnapshotRows(nThreads=nThreads)
+        return pd.DataFrame([{"SubjectID": k, **v} for k, v in rows.items()], 
+                            columns=["SubjectID"] + list(mi_catalog.SUMMARY_COLUMNS))
+
+    def setTagValues(self, updates, nThreads=8, metaSuffix=""):
+        """Set meta tag values for many subjects. Each subject's updates are written with one meta file write. 
+        Subjects are updated concurrently and without use of subject loggers. 
+
+        Args:
+            updates (dict or pandas.DataFrame): {subjID: {tag: value, ...}, ...} or DataFrame with one row per subject 
+                (subjID from 'SubjectID' column if present, else from index) and one column per tag (NaN values are skipped). 
+            nThreads (int, optional): Number of threads. Defaults to 8.
+            metaSuffix (str, optional): Suffix of meta json file. Defaults to "".
+
+        Returns:
+            pandas.DataFrame: report with one row per subject in updates - columns SubjectID, Status (updated / not found / failed), Error
+        """
+        if isinstance(updates, pd.DataFrame):
+            if 'SubjectID' in updates.columns:
+                updates = updates.set_index('SubjectID')
+            updates = {str(iSubjID): {iTag: iValue for iTag, iValue in iRow.items() 
+                                        if not (isinstance(iValue, float) and np.isnan(iValue))}
+                        for iSubjID, iRow in updates.to_dict(orient='index').items()}
+        subjByID = {i.subjID: i for i in self}
+
+        def _setTags(subjID_tagDict):
+            subjID, tagDict = subjID_tagDict
+            iSubj = subjByID.get(subjID, None)
+            if (iSubj is None) or (not iSubj.exists()):
+                return {"SubjectID": subjID, "Status": "not found", "Error": ""}
+            try:
+                iSubj._writeMetaFile(tagDict, metaSuffix, LOG=False)
+            except Exception as e:
+                return {"SubjectID": subjID, "Status": "failed", "Error": f"{type(e).__name__}: {e}"}
+            return {"SubjectID": subjID, "Status": "updated", "Error": ""}
+
+        with ThreadPoolExecutor(max_workers=max(1, nThreads)) as executor:
+            report = list(executor.map(_setTags, updates.items()))
+        return pd.DataFrame(report, columns=["SubjectID", "Status", "Error"])
+
+    def anonymise(self, anonName=None, nWorkers=1, progressFunc=None, QUIET=False, FORCE=False):
+        """Anonymise all subjects in list (see AbstractSubject.anonymise). 
+        Subjects are anonymised in a pool of nWorkers processes. A failure does not stop others but is reported. 
+
+        Args:
+            anonName (str, optional): see AbstractSubject.anonymise. Defaults to None.
+            nWorkers (int, optional): Number of worker processes. Defaults to 1 (sequential, in this process).
+            progressFunc (callable, optional): called as each subject completes with (nComplete, nTotal, reportRow). 
+                Defaults to None: print progress (if not QUIET).
+            QUIET (bool, optional): If true will supress output. Defaults to False.
+            FORCE (bool, optional): If true rewrite all dicoms (not only those new since last anonymisation). Defaults to False.
+
+        Returns:
+            pandas.DataFrame: report with one row per subject in list - columns SubjectID, Status (anonymised / not found / failed), Error
+        """
+        jobs = []
+        for iSubj in self:
+            SubjClass = iSubj.getSubjClass() if isinstance(iSubj, SubjectHandle) else type(iSubj)
+            jobs.append((SubjClass, iSubj.subjID, iSubj.dataRoot, anonName, FORCE))
+        reportRows = {}
+        def _complete(iRow):
+            reportRows[(iRow["SubjectID"], iRow["DataRoot"])] = iRow
+            if progressFunc is not None:
+                progressFunc(len(reportRows), len(jobs), iRow)
+            elif not QUIET:
+                print(f"Anonymise {iRow['SubjectID']}: {iRow['Status']} ({len(reportRows)} of {len(jobs)})")
+        if nWorkers > 1:
+            with _getProcessPool(nWorkers) as executor:
+                futures = {executor.submit(_anonymiseSubject_Worker, *iJob): iJob for iJob in jobs}
+                for iFuture in as_completed(futures):
+                    try:
+                        iRow = iFuture.result()
+                    except Exception as e: # e.g. worker process terminated
+                        iRow = {"SubjectID": futures[iFuture][1], "DataRoot": futures[iFuture][2], 
+                                "Status": "failed", "Error": f"{type(e).__name__}: {e}"}
+                    _complete(iRow)
+        else:
+            for iJob in jobs:
+                _complete(_anonymiseSubject_Worker(*iJob))
+        report = pd.DataFrame([reportRows[(i[1], i[2])] for i in jobs], columns=["SubjectID", "DataRoot", "Status", "Error"])
+        failed = report[report["Status"] == "failed"]
+        if (len(failed) > 0) and (not QUIET):
+            print(f"WARNING: {len(failed)} of {len(report)} subjects failed to anonymise:")
+            for _, iRow in failed.iterrows():
+                print(f"    {iRow['SubjectID']}: {iRow['Error']}")
+        return report.drop(columns="DataRoot")
+
     def reduceToExist(self):
         toRemove = []
         for i in self:
@@ -892,8 +1797,7 @@ class SubjectList(list):
         :return:
         """
         filteredMatchList = []
-        for iSubj in self:
-            iDOS = iSubj.getTagValue('StudyDate')
+        for iSubj, iDOS in zip(self, self._getTagValues('StudyDate')):
             try:
                 if dateEnd_YYYYMMDD is None:
                     if iDOS == dateOfScan_YYYYMMDD:
@@ -923,21 +1827,18 @@ class SubjectList(list):
         :param studyID (or examID): int
         :return: mi_subject
         """
-        for iSubj in self:
+        for iSubj, iStudyID in zip(self, self._getTagValues("StudyID")):
             try:
-                if int(iSubj.getTagValue("StudyID")) == studyID:
+                if int(iStudyID) == studyID:
                     return iSubj
             except ValueError:
                 pass
         return None
     
     def findSubjMatchingStudyUID(self, studyUID):
-        for iSubj in self:
-            try:
-                if iSubj.getTagValue("StudyInstanceUID") == studyUID:
-                    return iSubj
-            except TypeError:
-                pass
+        for iSubj, iStudyUID in zip(self, self._getTagValues("StudyInstanceUID")):
+            if iStudyUID == studyUID:
+                return iSubj
         return None
 
     def filterSubjectListByDOS_closest(self, dateOfScan_YYYY_MM_DD, A_less_than_B=False):
@@ -949,7 +1850,7 @@ class SubjectList(list):
         A_less_than_B = check to force subjDateOfScan <= dateOfScan query
         Return: subjList length one
         """
-        dateDiffs = [_getDateDiff_days(iSubj.getTagValue('StudyDate'), dateOfScan_YYYY_MM_DD) for iSubj in self]
+        dateDiffs = [_getDateDiff_days(iDOS, dateOfScan_YYYY_MM_DD) for iDOS in self._getTagValues('StudyDate')]
         if A_less_than_B: 
             minDiff = min(dateDiffs)
             dateDiffs = [i if i <=0 else (minDiff-999) for i in dateDiffs]
@@ -965,12 +1866,9 @@ class SubjectList(list):
         """
         patientID = str(patientID)
         matchList = SubjectList()
-        for iSubj in self:
-            try:
-                if iSubj.getTagValue("PatientID") == patientID:
-                    matchList.append(iSubj)
-            except ValueError:
-                pass
+        for iSubj, iPatientID in zip(self, self._getTagValues("PatientID")):
+            if iPatientID == patientID:
+                matchList.append(iSubj)
         if (len(matchList)>1) & (dateOfScan_YYYYMMDD is not None):
             dataEnd = None
             if tolerance_days > 0:
@@ -987,8 +1885,7 @@ class SubjectList(list):
         """
         nameStr_l = nameStr.lower()
         matchList = SubjectList()
-        for iSubj in self:
-            iName = iSubj.getTagValue("NAME", mi_utils.UNKNOWN)
+        for iSubj, iName in zip(self, self._getTagValues("NAME", mi_utils.UNKNOWN)):
             if decodePassword is not None:
                 iName = mi_utils.decodeString(iName, decodePassword).lower()
             try:
@@ -1001,46 +1898,97 @@ class SubjectList(list):
         return matchList
 
     def writeSummaryCSV(self, outputFileName_csv, extra_series_tags=[]):
-        data, header = [], []
-        for k0, isubj in enumerate(self):
-            ss, hh = isubj.getInfoStr()
-            if k0 == 0:
-                header = hh
-            for k1, iSeriesTag in enumerate(extra_series_tags):
-                seList = isubj.getDicomSeriesMeta(seriesDescription=iSeriesTag)
-                for seDict in seList:
-                    if k1 == 0:
-                        kkS = sorted(seDict.keys())
-                    hh2 = [f"{iSeriesTag}_{kk}" for kk in kkS]
-                    if k0 == 0:
-                        header += hh2
-                    ss += [seDict[i] for i in kkS]
-            data.append(ss)
-        mi_utils.writeCSVFile(data, header, outputFileName_csv)
+        return self.writeSummary(outputFileName_csv, extra_series_tags=extra_series_tags)
+
+    def writeSummary(self, outputFileName, columns=None, extra_series_tags=[], nThreads=8):
+        """Write summary (one row per subject) to csv, or parquet if outputFileName ends '.parquet' (requires pyarrow). 
+        Subjects are read concurrently and rows are written as they are ready (in list order). 
+        Header is taken from the first subject. 
+
+        Args:
+            outputFileName (str): output file name (.csv or .parquet)
+            columns (list, optional): columns to write - meta tag names or 'Age', 'TotalDicoms'. 
+                Defaults to None: columns of subject getInfoStr.
+            extra_series_tags (list, optional): series descriptions - meta of matching series appended. Defaults to [].
+            nThreads (int, optional): Number of threads. Defaults to 8.
+
+        Returns:
+            str: outputFileName
+        """
+        def _getRow(iSubj):
+            if isinstance(iSubj, SubjectHandle):
+                iSubj = iSubj.promote()
+            if columns is None:
+                values, header = iSubj.getInfoStr()
+                valuesSe, headerSe = iSubj._getSeriesSummaryValues(extra_series_tags)
+                return values + valuesSe, header + headerSe
+            return iSubj.getSummaryValues(columns, extra_series_tags)
+
+        with ThreadPoolExecutor(max_workers=max(1, nThreads)) as executor:
+            rows = executor.map(_getRow, self)
+            if outputFileName.lower().endswith('.parquet'):
+                mi_utils.writeParquetFileStreamed(rows, outputFileName)
+            else:
+                mi_utils.writeCSVFileStreamed(rows, outputFileName)
+        return outputFileName
 
 ### ====================================================================================================================
 ###  Helper functions for subject list
 ### ====================================================================================================================
-def _getAllSubjects(dataRootDir, subjectPrefix=None, SubjClass=AbstractSubject, RETURN_N=False):
+def _listSubdirectoryNames(dataRootDir):
+    """Names of all directories in dataRootDir (single scandir pass)"""
+    with os.scandir(dataRootDir) as it:
+        return [i.name for i in it if i.is_dir()]
+
+def _anonymiseSubject_Worker(SubjClass, subjID, dataRoot, anonName, FORCE=False):
+    """Process pool worker - anonymise one subject. Failure recorded in returned report row, not raised.
+    """
+    iRow = {"SubjectID": subjID, "DataRoot": dataRoot, "Status": "failed", "Error": ""}
+    try:
+        iSubj = SubjClass(subjID, dataRoot=dataRoot)
+        if not iSubj.exists():
+            iRow["Status"] = "not found"
+            return iRow
+        iSubj.QUIET = True
+        iSubj.anonymise(anonName, QUIET=True, FORCE=FORCE)
+        iRow["Status"] = "anonymised"
+    except Exception as e:
+        iRow["Error"] = f"{type(e).__name__}: {e}"
+    return iRow
+
+def _getAllSubjects(dataRootDir, subjectPrefix=None, SubjClass=AbstractSubject, RETURN_N=False, RETURN_HANDLES=False):
+    """Discover subjects in dataRootDir from a single directory listing. 
+    Subject prefix is guessed (if not given) from the same listing and passed to each subject. 
+    Subject number is taken from the directory name once and used as the sort key - 
+    so no further file system access per subject. 
+
+    Returns:
+        list: subject objects (or subject numbers if RETURN_N, or SubjectHandle if RETURN_HANDLES), sorted by subject number
+    """
+    allDir = _listSubdirectoryNames(dataRootDir)
     if subjectPrefix is None:
-        subjectPrefix = guessSubjectPrefix(dataRootDir)
-    allDir = os.listdir(dataRootDir)
-    allDir = [i for i in allDir if i.startswith(subjectPrefix)]
-    allDir = [i for i in allDir if os.path.isdir(os.path.join(dataRootDir, i))]
-    subjObjList = []
+        subjectPrefix = _guessSubjectPrefixFromNames(allDir, dataRootDir, QUIET=False)
+    sortKey_Name = []
     for i in allDir:
+        if not i.startswith(subjectPrefix):
+            continue
         try:
-            iSubjObj = SubjClass(i, dataRoot=dataRootDir, subjectPrefix=subjectPrefix)
-        except ValueError:
-            print(f"WARNING: {i} at {dataRootDir} not valid subject")
-        if iSubjObj.exists():
-            if RETURN_N:
-                subjObjList.append(iSubjObj.subjN)
+            sortKey_Name.append((splitSubjID(i)[1], i))
+        except (ValueError, IndexError):
+            sortKey_Name.append((np.inf, i)) # subject ID without number - after numbered subjects
+    sortKey_Name.sort()
+    if RETURN_N:
+        return [iN for iN, _ in sortKey_Name if iN != np.inf]
+    subjObjList = []
+    for iN, i in sortKey_Name:
+        try:
+            if RETURN_HANDLES and (iN != np.inf): # Subject IDs without number held as full subject
+                subjObjList.append(SubjectHandle.setFromSubjID(i, dataRootDir, SubjClass=SubjClass))
             else:
-                subjObjList.append(iSubjObj)
-        else:
+                subjObjList.append(SubjClass(i, dataRoot=dataRootDir, subjectPrefix=subjectPrefix))
+        except ValueError:
             print(f"WARNING: {i} at {dataRootDir} not valid subject")
-    return sorted(subjObjList)
+    return subjObjList
 
 def getAllSubjects(dataRootDir, subjectPrefix=None, SubjClass=AbstractSubject):
     return _getAllSubjects(dataRootDir, subjectPrefix, SubjClass)
@@ -1080,7 +2028,40 @@ def doDatesMatch(dateA, dateB, tolerance_days=1):
     return abs(dateDiff_days) < tolerance_days
 
 ### ====================================================================================================================
-def findSubjMatchingDicomStudyUID(dicomDir_OrData, dataRoot, subjPrefix=None, SubjClass=AbstractSubject):
+class StudyUIDIndex(dict):
+    """
+    Lookup of StudyInstanceUID: subjID for all subjects in a dataRoot. 
+    Built once per load session (from project catalog if present, else subject meta files) 
+    and updated as subjects are created or added to. 
+    """
+    def __init__(self, dataRoot, subjPrefix=None, SubjClass=AbstractSubject):
+        super().__init__()
+        self.dataRoot = dataRoot
+        self.subjPrefix = subjPrefix
+        self.SubjClass = SubjClass
+
+    @classmethod
+    def setByDirectory(cls, dataRoot, subjPrefix=None, SubjClass=AbstractSubject):
+        studyUIDIndex = cls(dataRoot, subjPrefix=subjPrefix, SubjClass=SubjClass)
+        subjList = SubjectList.setByDirectory(dataRoot, subjectPrefix=subjPrefix, SubjClass=SubjClass)
+        for iSubj, iStudyUID in zip(subjList, subjList._getTagValues("StudyInstanceUID", None)):
+            if iStudyUID is not None:
+                studyUIDIndex.setdefault(iStudyUID, iSubj.subjID)
+        return studyUIDIndex
+
+    def addSubject(self, subj):
+        studyUID = subj.getTagValue("StudyInstanceUID", None)
+        if studyUID is not None:
+            self.setdefault(studyUID, subj.subjID)
+
+    def findSubjMatchingStudyUID(self, studyUID):
+        subjID = self.get(studyUID, None)
+        if subjID is None:
+            return None
+        return self.SubjClass(subjID, dataRoot=self.dataRoot, subjectPrefix=self.subjPrefix)
+
+
+def findSubjMatchingDicomStudyUID(dicomDir_OrData, dataRoot, subjPrefix=None, SubjClass=AbstractSubject, studyUIDIndex=None):
     try:
         ds = spydcm.returnFirstDicomFound(dicomDir_OrData)
         queryUID = ds.get('StudyInstanceUID', None)
@@ -1088,8 +2069,9 @@ def findSubjMatchingDicomStudyUID(dicomDir_OrData, dataRoot, subjPrefix=None, Su
         queryUID = dicomDir_OrData.getTag('StudyInstanceUID', ifNotFound=None)
     if queryUID is None: 
         return None
-    SubjList = SubjectList.setByDirectory(dataRoot=dataRoot, subjectPrefix=subjPrefix, SubjClass=SubjClass)
-    return SubjList.findSubjMatchingStudyUID(queryUID)
+    if studyUIDIndex is None:
+        studyUIDIndex = StudyUIDIndex.setByDirectory(dataRoot, subjPrefix=subjPrefix, SubjClass=SubjClass)
+    return studyUIDIndex.findSubjMatchingStudyUID(queryUID)
 
 
 ### ====================================================================================================================
@@ -1132,7 +2114,9 @@ def guessSubjectPrefix(dataRootDir, QUIET=False):
     Exception:
         mi_utils.SubjPrefixError: is ambiguous
     """
-    allDir = [i for i in os.listdir(dataRootDir) if os.path.isdir(os.path.join(dataRootDir, i))]
+    return _guessSubjectPrefixFromNames(_listSubdirectoryNames(dataRootDir), dataRootDir, QUIET=QUIET)
+
+def _guessSubjectPrefixFromNames(allDir, dataRootDir, QUIET=True):
     allDir_subj = {}
     for i in allDir:
         try:
@@ -1173,6 +2157,70 @@ def getNextSubjN(dataRootDir, subjectPrefix=None):
     except ValueError:
         return 1
 
+SUBJN_LOCK_FILE = '.miresearch_subjN.lock'
+
+def _getSubjNCounterFile(dataRootDir, subjectPrefix):
+    return os.path.join(dataRootDir, f'.miresearch_subjN_{subjectPrefix}')
+
+def _readSubjNCounter(dataRootDir, subjectPrefix):
+    """Return cached max subjN for prefix - None if no cache or if dataRoot changed since it was written
+    """
+    try:
+        with open(_getSubjNCounterFile(dataRootDir, subjectPrefix), 'r') as fid:
+            subjN, dataRootMtime = [int(i) for i in fid.read().split()]
+        if dataRootMtime == os.stat(dataRootDir).st_mtime_ns:
+            return subjN
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _writeSubjNCounter(dataRootDir, subjectPrefix, subjN):
+    counterFile = _getSubjNCounterFile(dataRootDir, subjectPrefix)
+    open(counterFile, 'a').close() # create first - so is included in dataRoot modified time
+    dataRootMtime = os.stat(dataRootDir).st_mtime_ns
+    # Written in place (not temp file + replace) so dataRoot modified time is unchanged
+    with open(counterFile, 'r+') as fid:
+        fid.truncate()
+        fid.write(f"{subjN} {dataRootMtime}")
+
+def reserveNextSubjN(dataRootDir, subjectPrefix=None, padZeros=None, suffix=""):
+    """Allocate the next subject number and reserve it by creating the (empty) subject directory. 
+    Safe for concurrent loaders (threads or processes) on the same dataRoot: allocation is under 
+    a lock file in dataRootDir and the reservation is an atomic directory create. 
+    The current max is cached in a counter file (refreshed from a listing if dataRoot changed by other means).
+
+    Args:
+        dataRootDir (str): path to root directory of subject filesystem database
+        subjectPrefix (str, optional): subject prefix. Guessed from dataRootDir if not given. Defaults to None.
+        padZeros (int, optional): zero padding of subject ID. Defaults to None (config default).
+        suffix (str, optional): subject ID suffix. Defaults to "".
+
+    Returns:
+        int: reserved subject number
+    """
+    if subjectPrefix is None:
+        subjectPrefix = guessSubjectPrefix(dataRootDir)
+    with mi_utils.FileLock(os.path.join(dataRootDir, SUBJN_LOCK_FILE)):
+        subjN = _readSubjNCounter(dataRootDir, subjectPrefix)
+        if subjN is None:
+            subjN = getNextSubjN(dataRootDir, subjectPrefix) - 1
+        while True:
+            subjN += 1
+            try:
+                os.mkdir(os.path.join(dataRootDir, buildSubjectID(subjN, subjectPrefix, padZeros=padZeros, suffix=suffix)))
+                break
+            except FileExistsError:
+                continue
+        _writeSubjNCounter(dataRootDir, subjectPrefix, subjN)
+    return subjN
+
+def _releaseSubjDir(subjTopDir):
+    """Remove reserved subject directory if still empty (e.g. load failed)"""
+    try:
+        os.rmdir(subjTopDir)
+    except OSError:
+        pass
+
 def doesSubjectExist(subjN, dataRootDir, subjectPrefix=None, padZeros=None, suffix=""):
     if subjectPrefix is None:
         subjectPrefix = guessSubjectPrefix(dataRootDir)
@@ -1185,12 +2233,12 @@ def getNextSubjID(dataRootDir, subjectPrefix=None):
         subjectPrefix = guessSubjectPrefix(dataRootDir)
     return buildSubjectID(getNextSubjN(dataRootDir, subjectPrefix), subjectPrefix)
 
-def _createSubjectHelper(dicomDir_orData, SubjClass, subjNumber, dataRoot, subjPrefix, anonName, QUIET, FORCE_NEW_SUBJ=False):
+def _createSubjectHelper(dicomDir_orData, SubjClass, subjNumber, dataRoot, subjPrefix, anonName, QUIET, FORCE_NEW_SUBJ=False, studyUIDIndex=None):
     if FORCE_NEW_SUBJ:
         newSubj = None
     else:
         # Check if a subject already exists with dicom data matching input
-        newSubj = findSubjMatchingDicomStudyUID(dicomDir_orData, dataRoot, subjPrefix, SubjClass)
+        newSubj = findSubjMatchingDicomStudyUID(dicomDir_orData, dataRoot, subjPrefix, SubjClass, studyUIDIndex=studyUIDIndex)
     if newSubj is not None:
         # Subject exists - so check nothing conflicting from inputs
         if subjNumber is not None:
@@ -1198,22 +2246,31 @@ def _createSubjectHelper(dicomDir_orData, SubjClass, subjNumber, dataRoot, subjP
                 raise ValueError(f"You supplied subject number {subjNumber} but a different subject matching your input dicom study exists at {newSubj.subjN}")
         print(f"Found existing subject {newSubj.subjID} at {dataRoot} - adding to")
     
-    # If no subject exists matching the inputs - define a new subject (increment subjN from current in root directory)
+    # If no subject exists matching the inputs - define a new subject (next free subjN in root directory - reserved)
+    RESERVED = False
     if newSubj is None: 
+        RESERVED = subjNumber is None
         subjNumber = _subjNumberHelper(dataRoot=dataRoot, subjNumber=subjNumber, subjPrefix=subjPrefix)
         newSubj = SubjClass(subjNumber, dataRoot, subjectPrefix=subjPrefix)
     newSubj.QUIET = QUIET
 
     # Now have a subject - either newly created or existing and matching dicom data - load dicoms to subject:
-    if os.path.isdir(dicomDir_orData):
-        newSubj.loadDicomsToSubject(dicomDir_orData, anonName=anonName, HIDE_PROGRESSBAR=QUIET)
-    else:
-        newSubj.loadSpydcmStudyToSubject(dicomDir_orData, anonName=anonName)
+    try:
+        if os.path.isdir(dicomDir_orData):
+            newSubj.loadDicomsToSubject(dicomDir_orData, anonName=anonName, HIDE_PROGRESSBAR=QUIET)
+        else:
+            newSubj.loadSpydcmStudyToSubject(dicomDir_orData, anonName=anonName)
+    except Exception:
+        if RESERVED:
+            _releaseSubjDir(newSubj.getTopDir())
+        raise
+    if studyUIDIndex is not None:
+        studyUIDIndex.addSubject(newSubj)
     #
     return newSubj
 
 def _createNewSubject_Compressed(compressedFile, dataRoot, SubjClass=AbstractSubject, 
-                                subjNumber=None, subjPrefix=None, anonName=None, QUIET=False):
+                                subjNumber=None, subjPrefix=None, anonName=None, QUIET=False, studyUIDIndex=None):
     if compressedFile.endswith('zip'):
         listOfSubjects = spydcm.dcmTK.ListOfDicomStudies.setFromZip(compressedFile, HIDE_PROGRESSBAR=QUIET)
     elif compressedFile.endswith('tar') or compressedFile.endswith('tar.gz'):
@@ -1224,9 +2281,12 @@ def _createNewSubject_Compressed(compressedFile, dataRoot, SubjClass=AbstractSub
         if subjNumber is not None:
             raise ValueError(f"More than one study in {compressedFile} - can not supply subjNumber")
     newSubjList = []
+    if (studyUIDIndex is None) and (len(listOfSubjects) > 1):
+        studyUIDIndex = StudyUIDIndex.setByDirectory(dataRoot, subjPrefix=subjPrefix, SubjClass=SubjClass)
     for i in listOfSubjects:
         newSubj = _createSubjectHelper(i, SubjClass, subjNumber=subjNumber, dataRoot=dataRoot, 
-                                        subjPrefix=subjPrefix, anonName=anonName, QUIET=QUIET)
+                                        subjPrefix=subjPrefix, anonName=anonName, QUIET=QUIET, 
+                                        studyUIDIndex=studyUIDIndex)
         newSubjList.append(newSubj)
     if len(newSubjList) == 1:
         return newSubjList[0]
@@ -1234,18 +2294,18 @@ def _createNewSubject_Compressed(compressedFile, dataRoot, SubjClass=AbstractSub
 
 def _subjNumberHelper(dataRoot, subjNumber, subjPrefix):
     if subjNumber is None:
-        subjNumber = getNextSubjN(dataRoot, subjPrefix)
+        subjNumber = reserveNextSubjN(dataRoot, subjPrefix)
     else:
         if doesSubjectExist(subjNumber, dataRoot, subjPrefix):
             raise ValueError("Subject already exists - use loadDicomsToSubject method to add data to existing subject.")
     return subjNumber
 
 def _createNew_OrAddTo_Subject(dicomDirToLoad, dataRoot, SubjClass=AbstractSubject, 
-                     subjNumber=None, subjPrefix=None, anonName=None, QUIET=False, IGNORE_UIDS=False):
+                     subjNumber=None, subjPrefix=None, anonName=None, QUIET=False, IGNORE_UIDS=False, studyUIDIndex=None):
     if not os.path.isdir(dicomDirToLoad):
         if os.path.isfile(dicomDirToLoad):
             newSubj = _createNewSubject_Compressed(dicomDirToLoad, dataRoot, SubjClass=SubjClass, subjNumber=subjNumber, 
-                                        subjPrefix=subjPrefix, anonName=anonName, QUIET=QUIET)
+                                        subjPrefix=subjPrefix, anonName=anonName, QUIET=QUIET, studyUIDIndex=studyUIDIndex)
             return newSubj
         raise IOError(" Load dir does not exist")
     if spydcm.returnFirstDicomFound(dicomDirToLoad) is None:
@@ -1254,14 +2314,15 @@ def _createNew_OrAddTo_Subject(dicomDirToLoad, dataRoot, SubjClass=AbstractSubje
         raise IOError(f" Destination does not exist: {dataRoot}")
     newSubj = _createSubjectHelper(dicomDirToLoad, SubjClass, subjNumber=subjNumber, dataRoot=dataRoot, 
                                     subjPrefix=subjPrefix, anonName=anonName, QUIET=QUIET, 
-                                    FORCE_NEW_SUBJ=IGNORE_UIDS)
+                                    FORCE_NEW_SUBJ=IGNORE_UIDS, studyUIDIndex=studyUIDIndex)
     #
     return newSubj
 
 def _createNew_OrAddTo_Subjects_Multi(multiDicomDirToLoad, dataRoot, 
                                        SubjClass=AbstractSubject, subjPrefix=None, 
                                        anonName=None, 
-                                       IGNORE_UIDS=False, QUIET=False):
+                                       IGNORE_UIDS=False, QUIET=False, 
+                                       nWorkers=1, loadReportFile=None):
     if anonName not in [None, "SOFT", "HARD"]:
         raise ValueError(f"anonName must be one of [None, 'SOFT', 'HARD'] for multi-load")
     if not os.path.isdir(multiDicomDirToLoad):
@@ -1276,6 +2337,20 @@ def _createNew_OrAddTo_Subjects_Multi(multiDicomDirToLoad, dataRoot,
             dirsToLoad_checked.append(iDir)
     if len(dirsToLoad_checked) == 0:
         raise IOError(f"Can not find valid dicoms under {multiDicomDirToLoad}")
+    if (nWorkers is not None) and (nWorkers > 1):
+        return _createNew_OrAddTo_Subjects_Parallel(dirsToLoad_checked, 
+                                                    dataRoot=dataRoot,
+                                                    SubjClass=SubjClass,
+                                                    subjPrefix=subjPrefix,
+                                                    anonName=anonName,
+                                                    IGNORE_UIDS=IGNORE_UIDS,
+                                                    QUIET=QUIET,
+                                                    nWorkers=nWorkers,
+                                                    loadReportFile=loadReportFile)
+    # Existing studies are found once for the whole load - then updated as subjects are loaded
+    studyUIDIndex = None
+    if not IGNORE_UIDS:
+        studyUIDIndex = StudyUIDIndex.setByDirectory(dataRoot, subjPrefix=subjPrefix, SubjClass=SubjClass)
     newSubjsList = []
     for iDir in dirsToLoad_checked:
         newSubjsList.append(_createNew_OrAddTo_Subject(iDir, 
@@ -1284,13 +2359,108 @@ def _createNew_OrAddTo_Subjects_Multi(multiDicomDirToLoad, dataRoot,
                                              subjPrefix=subjPrefix,
                                              anonName=anonName,
                                              QUIET=QUIET,
-                                             IGNORE_UIDS=IGNORE_UIDS))
+                                             IGNORE_UIDS=IGNORE_UIDS,
+                                             studyUIDIndex=studyUIDIndex))
     return newSubjsList
 
+def _planMultiLoad(dirsToLoad, dataRoot, SubjClass, subjPrefix, IGNORE_UIDS):
+    """Group directories by StudyInstanceUID and resolve subject number for each group 
+    (existing subject matching StudyUID, else next free numbers). Done in the parent process
+    so that workers never allocate subject numbers or write to the same subject. New subject numbers are reserved.
+    Subject IDs are built here (not from subjN in the worker) so that workers can not derive a different ID.
+
+    Returns:
+        list: [(subjID, [dir, ...], IS_NEW), ...] in load order
+    """
+    studyUIDIndex = None
+    if not IGNORE_UIDS:
+        studyUIDIndex = StudyUIDIndex.setByDirectory(dataRoot, subjPrefix=subjPrefix, SubjClass=SubjClass)
+    groups = OrderedDict()
+    try:
+        for iDir in dirsToLoad:
+            studyUID = None
+            if not IGNORE_UIDS:
+                studyUID = spydcm.returnFirstDicomFound(iDir).get('StudyInstanceUID', None)
+            groupKey = iDir if studyUID is None else studyUID
+            if groupKey not in groups:
+                existingSubj = None
+                if studyUID is not None:
+                    existingSubj = studyUIDIndex.findSubjMatchingStudyUID(studyUID)
+                if existingSubj is not None:
+                    groups[groupKey] = (existingSubj.subjID, [], False)
+                else:
+                    groups[groupKey] = (buildSubjectID(reserveNextSubjN(dataRoot, subjPrefix), subjPrefix), [], True)
+            groups[groupKey][1].append(iDir)
+    except:
+        for iSubjID, _, IS_NEW in groups.values(): # Release reservations made so far
+            if IS_NEW:
+                _releaseSubjDir(os.path.join(dataRoot, iSubjID))
+        raise
+    return list(groups.values())
+
+def _loadDirsToSubject_Worker(dirsToLoad, subjID, IS_NEW, dataRoot, SubjClass, anonName, QUIET):
+    """Process pool worker - load each directory (in order) to subject subjID. 
+    Failures are recorded in the returned report rows (one per directory), not raised.
+    """
+    reportRows = []
+    iSubj = None
+    for iDir in dirsToLoad:
+        iRow = {"LoadDirectory": iDir, "SubjectID": None, "Status": "failed", "Error": ""}
+        try:
+            iSubj = SubjClass(subjID, dataRoot)
+            iSubj.QUIET = QUIET
+            iRow["SubjectID"] = iSubj.subjID
+            iSubj.loadDicomsToSubject(iDir, anonName=anonName, HIDE_PROGRESSBAR=True)
+            iRow["Status"] = "created" if IS_NEW else "added"
+            IS_NEW = False
+        except Exception as e:
+            iRow["Error"] = f"{type(e).__name__}: {e}"
+        reportRows.append(iRow)
+    return reportRows
+
+def _createNew_OrAddTo_Subjects_Parallel(dirsToLoad, dataRoot, SubjClass=AbstractSubject, subjPrefix=None, 
+                                          anonName=None, IGNORE_UIDS=False, QUIET=False, 
+                                          nWorkers=2, loadReportFile=None):
+    if subjPrefix is None:
+        subjPrefix = guessSubjectPrefix(dataRoot, QUIET=QUIET)
+    loadPlan = _planMultiLoad(dirsToLoad, dataRoot, SubjClass, subjPrefix, IGNORE_UIDS)
+    reportRows = {}
+    try:
+        with _getProcessPool(nWorkers) as executor:
+            futures = {executor.submit(_loadDirsToSubject_Worker, iDirs, iSubjID, IS_NEW, dataRoot, 
+                                       SubjClass, anonName, QUIET): iDirs for iSubjID, iDirs, IS_NEW in loadPlan}
+            for iFuture in as_completed(futures):
+                try:
+                    iRows = iFuture.result()
+                except Exception as e: # e.g. worker process terminated
+                    iRows = [{"LoadDirectory": i, "SubjectID": None, "Status": "failed", 
+                              "Error": f"{type(e).__name__}: {e}"} for i in futures[iFuture]]
+                for iRow in iRows:
+                    reportRows[iRow["LoadDirectory"]] = iRow
+                if not QUIET:
+                    print(f"Load completed {len(reportRows)} of {len(dirsToLoad)} directories")
+    finally:
+        # Remove reserved subjects that nothing was loaded to (failed, worker died or load interrupted) - 
+        #   so not found as subjects by later discovery
+        for iSubjID, iDirs, IS_NEW in loadPlan:
+            if IS_NEW and all([reportRows.get(i, {}).get("Status", "failed") == "failed" for i in iDirs]):
+                shutil.rmtree(os.path.join(dataRoot, iSubjID), ignore_errors=True)
+    loadReport = pd.DataFrame([reportRows[i] for i in dirsToLoad], columns=["LoadDirectory", "SubjectID", "Status", "Error"])
+    if loadReportFile is not None:
+        loadReport.to_csv(loadReportFile, index=False)
+    failed = loadReport[loadReport["Status"] == "failed"]
+    if len(failed) > 0:
+        print(f"WARNING: {len(failed)} of {len(loadReport)} directories failed to load:")
+        for _, iRow in failed.iterrows():
+            print(f"    {iRow['LoadDirectory']} ({iRow['SubjectID']}): {iRow['Error']}")
+    return [SubjClass(i, dataRoot=dataRoot, subjectPrefix=subjPrefix) 
+                for i in loadReport.loc[loadReport["Status"] != "failed", "SubjectID"]]
+
 ### ====================================================================================================================
 def createNew_OrAddTo_Subject(loadDirectory, dataRoot, SubjClass=AbstractSubject, 
                            subjNumber=None, subjPrefix=None, anonName=None, 
-                           LOAD_MULTI=False, IGNORE_UIDS=False, QUIET=False):
+                           LOAD_MULTI=False, IGNORE_UIDS=False, QUIET=False, 
+                           nWorkers=1, loadReportFile=None):
     """Used to create a new subject (or add data to already existing subject) from an input directory (or compressed file).
     Current compressed file tpyes supported: zip, tar, tar.gz
 
@@ -1304,6 +2474,10 @@ def createNew_OrAddTo_Subject(loadDirectory, dataRoot, SubjClass=AbstractSubject
         LOAD_MULTI (bool, optional): If true then each sub-directory in "loadDirectory" will be used to load a new subject. Defaults to False.
         IGNORE_UIDS (bool, optional): If true then ignore dicom UIDs and each sub-directory in "loadDirectory" will DEFINITLY be a new subject. Defaults to False.
         QUIET (bool, optional): If true will supress output. Defaults to False.
+        nWorkers (int, optional): Combine with LOAD_MULTI: number of worker processes to load sub-directories in parallel. 
+                                    Failures do not stop the load but are reported. Defaults to 1 (sequential).
+        loadReportFile (str, optional): Combine with LOAD_MULTI and nWorkers>1: path to write per-directory 
+                                    load report (csv). Defaults to None.
 
     Raises:
         ValueError: If incompatible arguments given (can not give subjNumber if LOAD_MULTI is given)
@@ -1320,7 +2494,9 @@ def createNew_OrAddTo_Subject(loadDirectory, dataRoot, SubjClass=AbstractSubject
                                        subjPrefix=subjPrefix, 
                                        IGNORE_UIDS=IGNORE_UIDS,
                                        anonName=anonName,
-                                       QUIET=QUIET)) 
+                                       QUIET=QUIET,
+                                       nWorkers=nWorkers,
+                                       loadReportFile=loadReportFile)) 
     else:
         return SubjectList([_createNew_OrAddTo_Subject(loadDirectory, 
                                 dataRoot=dataRoot,
@@ -2,6 +2,14 @@ import os
 import base64
 import csv
 import datetime
+import functools
+import threading
+import numpy as np
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
 
 from miresearch.mi_config import MIResearch_config
 
@@ -36,9 +44,11 @@ DICOM = "DICOM"
 
 #==================================================================
 class DirectoryStructure():
-    def __init__(self, name, childrenList=[]) -> None:
+    __slots__ = ('name', 'childrenList')
+
+    def __init__(self, name, childrenList=None) -> None:
         self.name = name
-        self.childrenList = childrenList
+        self.childrenList = [] if childrenList is None else childrenList
     
     def __str__(self) -> str:
         return f"{self.name} with children: {self.childrenList}"
@@ -47,6 +57,14 @@ class DirectoryStructureTree(list):
     def __init__(self) -> None:
         super().__init__()
 
+    def freeze(self):
+        """Return an immutable copy of this tree (children held as tuples) - safe to share
+
+        Returns:
+            FrozenDirectoryStructureTree
+        """
+        return FrozenDirectoryStructureTree(DirectoryStructure(i.name, tuple(i.childrenList)) for i in self)
+
     def __str__(self) -> str:
         ss = ''
         for i in self:
@@ -86,6 +104,21 @@ class DirectoryStructureTree(list):
         return False
 
 
+class FrozenDirectoryStructureTree(tuple):
+    """Immutable DirectoryStructureTree - as shared between subject instances. 
+    Use buildDirectoryStructureTree for a tree that may be modified.
+    """
+    __slots__ = ()
+    __str__ = DirectoryStructureTree.__str__
+    isTopLevelName = DirectoryStructureTree.isTopLevelName
+    isSecondLevelName = DirectoryStructureTree.isSecondLevelName
+
+    def addNewStructure(self, name_or_list):
+        raise TypeError("DIRECTORY_STRUCTURE_TREE is shared between subjects and can not be modified: "
+                        "set EXTRA_SUBFOLDERS on the subject class (e.g. EXTRA_SUBFOLDERS = [['RAW', 'NIFTI'], 'DATA']) "
+                        "or assign a tree from mi_utils.buildDirectoryStructureTree to DIRECTORY_STRUCTURE_TREE")
+
+
 def _getDefautDirectoryStructureTree():
     """This builds a Directory tree structure from the config file input
 
@@ -118,16 +151,47 @@ def buildDirectoryStructureTree(listOfExtraSubfolders=[]):
     return DirectoryTree
 
 
+def _toTuple(name_or_list):
+    if isinstance(name_or_list, (list, tuple)):
+        return tuple(_toTuple(i) for i in name_or_list)
+    return name_or_list
+
+@functools.lru_cache(maxsize=None)
+def _getFrozenDirectoryStructureTree(directoryStructure, extraSubfolders):
+    DirectoryTree = DirectoryStructureTree()
+    for i in directoryStructure + extraSubfolders:
+        DirectoryTree.addNewStructure(list(i) if isinstance(i, tuple) else i)
+    return DirectoryTree.freeze()
+
+def getDirectoryStructureTree(listOfExtraSubfolders=()):
+    """As buildDirectoryStructureTree but returns an immutable tree, built once 
+        per config directory structure and list of extra subfolders and then shared
+
+    Args:
+        listOfExtraSubfolders (list): see buildDirectoryStructureTree
+
+    Returns:
+        FrozenDirectoryStructureTree
+    """
+    return _getFrozenDirectoryStructureTree(_toTuple(MIResearch_config.directory_structure), 
+                                            _toTuple(listOfExtraSubfolders))
+
+
 def getDataRootDir():
     return MIResearch_config.data_root_dir
 #==================================================================
 #==================================================================
 def countFilesInDir(dirName):
-    files = []
-    if os.path.isdir(dirName):
-        for _, _, filenames in os.walk(dirName):  # @UnusedVariable
-            files.extend(filenames)
-    return len(files)
+    nFiles = 0
+    dirsToScan = [dirName] if os.path.isdir(dirName) else []
+    while dirsToScan:
+        with os.scandir(dirsToScan.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    dirsToScan.append(entry.path)
+                else:
+                    nFiles += 1
+    return nFiles
 
 def datetimeToStrTime(dateTimeVal, strFormat=DEFAULT_DICOM_TIME_FORMAT):
     return dateTimeVal.strftime(strFormat)
@@ -189,6 +253,130 @@ def writeCSVFile(data, header, csvFile, FIX_NAN=False):
     return csvFile
 
 
+def writeCSVFileStreamed(rowsIterator, csvFile):
+    """Write csv file from iterator of (row values, header) - header is taken from first row. 
+    Rows are written as they are produced. 
+    """
+    with open(csvFile, 'w') as fout:
+        csvWriter = csv.writer(fout, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        for k0, (iRow, iHeader) in enumerate(rowsIterator):
+            if k0 == 0:
+                csvWriter.writerow(iHeader)
+            csvWriter.writerow(iRow)
+    return csvFile
+
+
+def writeParquetFileStreamed(rowsIterator, parquetFile, rowGroupSize=1000):
+    """Write parquet file from iterator of (row values, header) - header is taken from first row. 
+    All values are written as strings. Rows are written in groups of rowGroupSize. Requires pyarrow.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("pyarrow is required for parquet output: pip install pyarrow") from e
+    writer, header, rows = None, None, []
+    def _writeRows():
+        columns = list(zip(*rows)) if rows else [[] for _ in header]
+        writer.write_table(pa.table({iName: pa.array(iCol, type=pa.string()) for iName, iCol in zip(header, columns)}))
+    try:
+        for iRow, iHeader in rowsIterator:
+            if writer is None:
+                header = list(iHeader)
+                writer = pq.ParquetWriter(parquetFile, pa.schema([(i, pa.string()) for i in header]))
+            if len(iRow) > len(header):
+                raise ValueError(f"Row has more values ({len(iRow)}) than header ({len(header)}) - can not write to parquet")
+            rows.append([None if i is None else str(i) for i in iRow] + [None]*(len(header)-len(iRow)))
+            if len(rows) >= rowGroupSize:
+                _writeRows()
+                rows = []
+        if (writer is not None) and rows:
+            _writeRows()
+    finally:
+        if writer is not None:
+            writer.close()
+    return parquetFile
+
+
+def writeThumbnailPNG(imageArray, pngFile, maxSize=256):
+    """Write 2D image as grayscale PNG (window: 1st - 99th percentile). 
+    Downsampled (integer stride) so that largest dimension is not more than maxSize. 
+    Written to temporary file then renamed - so readers never see a partial file.
+    """
+    from matplotlib import image as mpl_image # Only needed here - not imported with mi_utils
+    A = np.asarray(imageArray, dtype=float)
+    stride = max(1, int(np.ceil(max(A.shape) / maxSize)))
+    A = A[::stride, ::stride]
+    vmin, vmax = np.percentile(A, [1, 99]) if A.size > 0 else (0.0, 1.0)
+    if vmax <= vmin:
+        vmax = vmin + 1.0
+    tmpFile = f"{pngFile}.{os.getpid()}.{threading.get_ident()}.tmp.png"
+    mpl_image.imsave(tmpFile, np.clip(A, vmin, vmax), cmap='gray', vmin=vmin, vmax=vmax)
+    os.replace(tmpFile, pngFile)
+    return pngFile
+
+
+def readFileLinesBackward(fileName, nLines, endOffset=None, blockSize=65536):
+    """Read last nLines complete lines before byte endOffset - seeking backwards from endOffset in blocks 
+    (so cost is independent of file size). Use returned startOffset as endOffset to page backwards. 
+
+    Args:
+        fileName (str): text file
+        nLines (int): max number of lines to return
+        endOffset (int, optional): byte offset (line start, e.g. previous startOffset) to read back from. 
+            Defaults to None: end of file (a last line not yet terminated by newline is not returned).
+        blockSize (int, optional): bytes read per seek. Defaults to 65536.
+
+    Returns:
+        tuple: list of (byte offset, line) in file order, startOffset (of first line returned), endOffset (after last line returned)
+    """
+    with open(fileName, 'rb') as fid:
+        fileSize = fid.seek(0, os.SEEK_END)
+        end = fileSize if endOffset is None else min(endOffset, fileSize)
+        pos, data = end, b''
+        while (pos > 0) and (data.count(b'\n') <= nLines):
+            readSize = min(blockSize, pos)
+            pos -= readSize
+            fid.seek(pos)
+            data = fid.read(readSize) + data
+    if (endOffset is None) and (not data.endswith(b'\n')): # partial last line - still being written
+        iLast = data.rfind(b'\n') + 1
+        end -= len(data) - iLast
+        data = data[:iLast]
+    lines = data.split(b'\n')[:-1] if data.endswith(b'\n') else data.split(b'\n')
+    offset = pos
+    if (pos > 0) and lines: # first line may be partial
+        offset += len(lines.pop(0)) + 1
+    rows = []
+    for iLine in lines:
+        rows.append((offset, iLine.decode('utf-8', errors='replace').rstrip('\r')))
+        offset += len(iLine) + 1
+    rows = rows[-nLines:] if nLines > 0 else []
+    startOffset = rows[0][0] if rows else end
+    return rows, startOffset, end
+
+
+def readFileLinesFrom(fileName, offset, maxBytes=1048576):
+    """Read complete lines starting at byte offset (e.g. to follow a growing log file). 
+    If file is now shorter than offset (truncated / replaced) then read from start. 
+
+    Returns:
+        tuple: list of (byte offset, line), offset after last complete line returned (pass to next call)
+    """
+    with open(fileName, 'rb') as fid:
+        fileSize = fid.seek(0, os.SEEK_END)
+        if fileSize < offset:
+            offset = 0
+        fid.seek(offset)
+        data = fid.read(min(maxBytes, fileSize-offset))
+    data = data[:data.rfind(b'\n') + 1] # complete lines only
+    rows = []
+    for iLine in data.split(b'\n')[:-1]:
+        rows.append((offset, iLine.decode('utf-8', errors='replace').rstrip('\r')))
+        offset += len(iLine) + 1
+    return rows, offset
+
+
 def timeToDatetime(timeStr):
     try:
         iDatetime = datetime.datetime.strptime(timeStr, '%H%M%S.%f')
@@ -196,6 +384,41 @@ def timeToDatetime(timeStr):
         iDatetime = datetime.datetime.strptime(timeStr, '%H%M%S')
     return iDatetime
 #==================================================================
+class FileLock(object):
+    """Exclusive (inter-process and inter-thread) lock held on a lock file. Use as context manager.
+    The lock file is created if needed and left in place.
+    """
+    def __init__(self, lockFile) -> None:
+        self.lockFile = lockFile
+        self._fid = None
+
+    def __enter__(self):
+        self._fid = open(self.lockFile, 'a+')
+        if fcntl is not None:
+            fcntl.flock(self._fid.fileno(), fcntl.LOCK_EX)
+        else:
+            self._fid.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._fid.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError: # LK_LOCK gives up after 10 s - keep waiting
+                    continue
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fid.fileno(), fcntl.LOCK_UN)
+            else:
+                self._fid.seek(0)
+                msvcrt.locking(self._fid.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._fid.close()
+            self._fid = None
+        return False
+#==================================================================
+#==================================================================
 class SubjPrefixError(Exception):
     ''' SubjPrefixError
             If errors to do with the subject prefix '''
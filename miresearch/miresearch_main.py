@@ -53,6 +53,9 @@ groupS.add_argument('-sSuffix', dest='subjSuffix',
 groupS.add_argument('-anonName', dest='anonName', 
                     help='Set to anonymise newly loaded subject. Set to true to use for WatchDirectory. [default None]', 
                     type=str, default=None)
+groupS.add_argument('-ANON_FORCE', dest='AnonForce', 
+                    help='Combine with "anonName": Rewrite all dicoms (default only those new since last anonymisation)', 
+                    action='store_true')
     
 ## === ACTIONS ===
 groupA = ParentAP.add_argument_group('Actions')
@@ -66,6 +69,12 @@ groupA.add_argument('-LOAD_MULTI', dest='LoadMulti',
 groupA.add_argument('-LOAD_MULTI_FORCE', dest='LoadMultiForce', 
                     help='Combine with "Load": Force to ignore studyUIDs and load new ID per subdirectory', 
                     action='store_true')
+groupA.add_argument('-nWorkers', dest='nWorkers', 
+                    help='Combine with "LOAD_MULTI" or "anonName": Number of worker processes to load subdirectories / anonymise subjects in parallel', 
+                    type=int, default=1)
+groupA.add_argument('-LoadReport', dest='LoadReport', 
+                    help='Combine with "LOAD_MULTI" and "nWorkers": Write per-directory load report to this csv file', 
+                    type=str, default=None)
 
 # SUBJECT LEVEL
 groupA.add_argument('-RunPost', dest='subjRunPost', 
@@ -82,8 +91,14 @@ groupA.add_argument('-SubjInfoFull', dest='subjInfoFull',
 groupA.add_argument('-SummaryCSV', dest='SummaryCSV', 
                     help='Write summary CSV file (give output file name)', 
                     type=str, nargs="*", default=None)
+groupA.add_argument('-SummaryColumns', dest='SummaryColumns', 
+                    help='Combine with "SummaryCSV": columns to write (meta tags, Age, TotalDicoms). Output file ending .parquet written as parquet (requires pyarrow)', 
+                    type=str, nargs="*", default=None)
 groupA.add_argument('-Summary', dest='Summary', 
-                    help='Print summary of provided subjects to commandline (best with -sA option)', 
+                    help='Print summary of provided subjects to commandline (best with -sA option). Read from project catalog summary snapshot if present (see -BuildCatalog)', 
+                    action='store_true')
+groupA.add_argument('-BuildCatalog', dest='BuildCatalog', 
+                    help='Create / update project catalog (SQLite file under dataRoot) for provided subjects (best with -sA option)', 
                     action='store_true')
 
 # WATCH DIRECTORY
@@ -174,7 +189,9 @@ def runActions(args, extra_runActions=None):
                                              LOAD_MULTI=args.LoadMulti,
                                              SubjClass=args.MISubjClass,
                                              IGNORE_UIDS=args.LoadMultiForce,
-                                             QUIET=args.QUIET)
+                                             QUIET=args.QUIET,
+                                             nWorkers=args.nWorkers,
+                                             loadReportFile=args.LoadReport)
     # SUBJECT LEVEL actions
     elif len(args.subjNList) > 0:
         if args.DEBUG:
@@ -224,11 +241,7 @@ def runActions(args, extra_runActions=None):
         # --- ANONYMISE ---
         elif args.RUN_ANON:
             if args.anonName is not None:
-                for iSubj in subjList:
-                    if iSubj.exists():
-                        if not args.QUIET:
-                            print(f"Anonymise: {iSubj.subjID}...")
-                        iSubj.anonymise(args.anonName)
+                subjList.anonymise(args.anonName, nWorkers=args.nWorkers, QUIET=args.QUIET, FORCE=args.AnonForce)
 
         # --- POST LOAD PIPELINE ---
         elif args.subjRunPost:
@@ -263,13 +276,21 @@ def runActions(args, extra_runActions=None):
                 print(f"Info: writting summary for {len(args.subjNList)} subjects at {args.dataRoot} to {args.SummaryCSV[0]}")
                 if len(args.SummaryCSV) > 1:
                     print(f"  With tags: {args.SummaryCSV[1:]}")
-            subjList.writeSummaryCSV(args.SummaryCSV[0], extra_series_tags=args.SummaryCSV[1:])
+            subjList.writeSummary(args.SummaryCSV[0], columns=args.SummaryColumns, extra_series_tags=args.SummaryCSV[1:])
         
         # --- Summary ---
         elif args.Summary:
             if not args.QUIET:
                 print(f"Info: summary for {len(args.subjNList)} subjects at {args.dataRoot}")
             print(subjList)
+            # Read from project summary snapshot (catalog) where available
+            print(subjList.getSummarySnapshot().drop(columns=['NAME', 'MetaStamp', 'DerivedStamp']).to_string(index=False))
+
+        # --- BuildCatalog ---
+        elif args.BuildCatalog:
+            if not args.QUIET:
+                print(f"Info: updating project catalog for {len(args.subjNList)} subjects at {args.dataRoot}")
+            subjList.updateCatalog()
 
     ## WATCH DIRECTORY ##
     elif args.WatchDirectory is not None:
@@ -1,11 +1,17 @@
 
 import os
+import re
 import time
 import shutil
 import uuid
 import logging
+import queue
+import threading
+import sqlite3
+from contextlib import contextmanager
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+from spydcmtk import spydcm
 #
 from miresearch import mi_subject
 from miresearch.mi_config import MIResearch_config
@@ -27,6 +33,78 @@ def getLogger(id, logfileName, DEBUG=False):
     return logger
 
 # ====================================================================================================
+# ====================================================================================================
+JOB_STORE_FILE_NAME = 'mi_watcher_jobs.db'
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz')
+
+class IngestionJobStore(object):
+    """Persisted ingestion job queue - SQLite file in processDir. 
+    Job states: queued -> stable -> loading -> complete | failed
+    """
+    STATES = ["queued", "stable", "loading", "complete", "failed"]
+    ACTIVE_STATES = ["queued", "stable", "loading"]
+
+    def __init__(self, processDir) -> None:
+        self.jobStoreFile = os.path.join(processDir, JOB_STORE_FILE_NAME)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS jobs (JobID INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         "SourcePath TEXT, ProcessPath TEXT, State TEXT, Error TEXT, Created REAL, Updated REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_State ON jobs (State)")
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.jobStoreFile, timeout=60)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def addJob(self, sourcePath, state="queued", processPath=None):
+        """Add job (returns existing job if sourcePath already queued / stable)
+
+        Returns:
+            int: JobID
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT JobID FROM jobs WHERE SourcePath = ? AND State IN ('queued', 'stable') AND ProcessPath IS NULL", 
+                               (sourcePath,)).fetchone()
+            if row is not None:
+                jobID = row["JobID"]
+            else:
+                now = time.time()
+                jobID = conn.execute("INSERT INTO jobs (SourcePath, ProcessPath, State, Error, Created, Updated) VALUES (?, ?, ?, '', ?, ?)", 
+                                     (sourcePath, processPath, state, now, now)).lastrowid
+        conn.close()
+        return jobID
+
+    def setState(self, jobID, state, processPath=None, error=None):
+        if state not in self.STATES:
+            raise ValueError(f"Job state must be one of {self.STATES}")
+        sets, values = ["State = ?", "Updated = ?"], [state, time.time()]
+        if processPath is not None:
+            sets.append("ProcessPath = ?")
+            values.append(processPath)
+        if error is not None:
+            sets.append("Error = ?")
+            values.append(error)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {', '.join(sets)} WHERE JobID = ?", values+[jobID])
+        conn.close()
+
+    def getJob(self, jobID):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE JobID = ?", (jobID,)).fetchone()
+        conn.close()
+        return None if row is None else dict(row)
+
+    def getJobs(self, states=None):
+        """Get jobs (as list of dict) - optionally only those in states"""
+        if states is None:
+            states = self.STATES
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT * FROM jobs WHERE State IN ({', '.join(['?']*len(states))}) ORDER BY JobID", 
+                                list(states)).fetchall()
+        conn.close()
+        return [dict(i) for i in rows]
+
 # ====================================================================================================
 class MIResearch_WatchDog(object):
     """A watchdog for MI Research built off watchdog
@@ -37,13 +115,14 @@ class MIResearch_WatchDog(object):
                  subjectPrefix,
                  SubjClass=mi_subject.AbstractSubject,
                  TO_ANONYMISE=False,
-                 DEBUG=False) -> None:
+                 DEBUG=False,
+                 nWorkers=None) -> None:
         self.directoryToWatch = directoryToWatch
         self.dataStorageRoot = dataStorageRoot
         self.subjectPrefix = subjectPrefix
         self.SubjClass = SubjClass
         self.TO_ANONYMISE = TO_ANONYMISE
-        self.recursive = False
+        self.recursive = False # top level only - each arriving directory is watched (recursively) while awaiting stability
         self.DEBUG = DEBUG
         #
         self.processDir = os.path.join(self.directoryToWatch, 'MIResearch-PROCESSING')
@@ -63,7 +142,8 @@ class MIResearch_WatchDog(object):
                                                             self.logger,
                                                             self.SubjClass,
                                                             self.TO_ANONYMISE,
-                                                            self.DEBUG)
+                                                            self.DEBUG,
+                                                            nWorkers=nWorkers)
         self.event_handler.processDir = self.processDir
         self.event_handler.completeDir = self.completeDir
 
@@ -71,43 +151,63 @@ class MIResearch_WatchDog(object):
     def run(self):    
         observer = Observer()
         observer.schedule(self.event_handler, path=self.directoryToWatch, recursive=self.recursive)
+        self.event_handler.observer = observer
         self.logger.info(f"Starting MIResearch_WatchDog")
         self.logger.info(f" watching: {self.directoryToWatch}")
         self.logger.info(f" storage destination: {self.dataStorageRoot}")
         self.logger.info(f" subject prefix: {self.subjectPrefix}")
         self.logger.info(f" anonymise: {self.TO_ANONYMISE}")
         self.logger.info(f" SubjectClass: {self.SubjClass}")
+        self.logger.info(f" ingestion workers: {self.event_handler.nWorkers}")
         self.logger.debug(f" RUNNING IN DEBUG MODE")
         observer.start()
         self.logger.info(f" -------------- OBSERVER STARTED --------------")
+        self.event_handler.start() # includes reconcile with job store (after observer started so no arrival is missed)
         try:
             while True:
                 time.sleep(1)
+                self.event_handler.releaseArrivalWatches()
         except KeyboardInterrupt:
             self.logger.info(f"MIResearch_WatchDog watching {self.directoryToWatch} killed by keyboard interrupt.")
             self.logger.info("Closing cleanly. ")
             observer.stop()
+        self.event_handler.stop() # before join - event dispatch may be blocked on a full work queue
         observer.join()
 
 
-def get_directory_modified_time(directory_path):
-    modified_time = os.path.getmtime(directory_path)
-    # Walk through the directory and its subdirectories
-    for foldername, _, filenames in os.walk(directory_path):
-        for filename in filenames:
-            file_path = os.path.join(foldername, filename)
-            file_modified_time = os.path.getmtime(file_path)
-            modified_time = max(modified_time, file_modified_time)
-    return modified_time
+def get_directory_count_size(directory_path):
+    """Return (number of files, total size in bytes) under directory_path (or of a single file)"""
+    if os.path.isfile(directory_path):
+        return 1, os.path.getsize(directory_path)
+    nFiles, totalSize = 0, 0
+    dirsToScan = [directory_path]
+    while dirsToScan:
+        try:
+            with os.scandir(dirsToScan.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirsToScan.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        nFiles += 1
+                        totalSize += entry.stat(follow_symlinks=False).st_size
+        except FileNotFoundError:
+            continue
+    return nFiles, totalSize
 
 class MIResearch_SubdirectoryHandler(FileSystemEventHandler):
+    """Watchdog event handler - events only queue new arrivals. 
+    Stability checks and loading are run by a pool of ingestion worker threads (start / stop). 
+    The queue is bounded: when full, event handling blocks until a worker takes the next arrival. 
+    Each arrival is a job persisted in an IngestionJobStore (in processDir), so that work is resumed on restart.
+    """
     def __init__(self, directoryToWatch, 
                  dataStorageRoot,
                  subjectPrefix,
                  logger,
                  SubjClass=mi_subject.AbstractSubject,
                  TO_ANONYMISE=False,
-                 DEBUG=False) -> None:
+                 DEBUG=False,
+                 nWorkers=None) -> None:
         super(MIResearch_SubdirectoryHandler, self).__init__()
         self.directoryToWatch = directoryToWatch
         self.dataStorageRoot = dataStorageRoot
@@ -122,41 +222,238 @@ class MIResearch_SubdirectoryHandler(FileSystemEventHandler):
         self.pollDelay = 5 # seconds
         self.pollStable = max([MIResearch_config.stable_directory_age_sec, self.pollDelay+1])
         self.pollTimeOut = 10*self.pollStable
+        self.CONFIRM_COUNT_SIZE = MIResearch_config.stable_directory_size_check
+        self._lastEventTime = {} # top level path in directoryToWatch: time of last file system event within
+        # Ingestion workers
+        if nWorkers is None:
+            nWorkers = MIResearch_config.watchdog_workers
+        self.nWorkers = max(1, nWorkers)
+        self.workQueue = queue.Queue(maxsize=MIResearch_config.watchdog_queue_size)
+        self._workers = []
+        self._stopEvent = threading.Event() # set by stop - workers take no further work
+        self._lock = threading.Lock()
+        self._inFlight = set() # paths queued or checking stability
+        self._activeProcessDirs = set() # directories (in processDir) being loaded by a worker
+        self._studyLocks = {} # studyKey: [lock, nUsers]
+        self._jobStore = None
+        # Arriving directories watched (recursively) while awaiting stability - so the watch root 
+        #   (and processing / complete directories within it) need not be watched recursively
+        self.observer = None # set by MIResearch_WatchDog.run
+        self._arrivalWatches = {} # path: ObservedWatch
+        self._finishedArrivals = set() # paths whose watch is to be removed (see releaseArrivalWatches)
+
+    @property
+    def jobStore(self):
+        if self._jobStore is None:
+            self._jobStore = IngestionJobStore(self.processDir)
+        return self._jobStore
+
+    def _setJobState(self, jobID, state, processPath=None, error=None):
+        if jobID is not None:
+            self.jobStore.setState(jobID, state, processPath=processPath, error=error)
+
+    def start(self):
+        """Start ingestion worker threads and reconcile job store (resume interrupted work)"""
+        self._stopEvent.clear()
+        for k1 in range(self.nWorkers):
+            iWorker = threading.Thread(target=self._worker, name=f"MIResearch-ingest-{k1}", daemon=True)
+            iWorker.start()
+            self._workers.append(iWorker)
+        self.reconcile()
+
+    def reconcile(self):
+        """Reconcile job store against watch and processing directories and queue work to resume: 
+            - jobs in progress (processing directory exists) - resume at load
+            - jobs not yet moved to processing (source exists) - resume at stability check
+            - directories in processDir with no job (e.g. from earlier versions) - resume at load
+            - arrivals in watch directory with no job (arrived while not running) - queue
+        Jobs that can not be found are marked failed. 
+        """
+        knownPaths = set()
+        for iJob in self.jobStore.getJobs(IngestionJobStore.ACTIVE_STATES):
+            processPath, sourcePath = iJob["ProcessPath"], iJob["SourcePath"]
+            if processPath and os.path.exists(processPath):
+                self.jobStore.setState(iJob["JobID"], "loading")
+                self._enqueueJob(iJob["JobID"], processPath)
+                knownPaths.add(processPath)
+            elif processPath and os.path.exists(os.path.join(self.completeDir, os.path.split(processPath)[1])):
+                self.jobStore.setState(iJob["JobID"], "complete")
+            elif os.path.exists(sourcePath):
+                self.jobStore.setState(iJob["JobID"], "queued")
+                self._enqueueJob(iJob["JobID"], sourcePath)
+                knownPaths.add(sourcePath)
+            else:
+                self.jobStore.setState(iJob["JobID"], "failed", error="Not found on restart")
+                self.logger.warning(f"Job {iJob['JobID']} ({sourcePath}) not found on restart - marked failed")
+        for iName in sorted(os.listdir(self.processDir)):
+            iPath = os.path.join(self.processDir, iName)
+            if re.match(r"^[0-9a-f]{32}_", iName) and (iPath not in knownPaths):
+                self.logger.info(f"Found processing directory with no job: {iPath} - will resume")
+                jobID = self.jobStore.addJob(os.path.join(self.directoryToWatch, iName[33:]), 
+                                             state="loading", processPath=iPath)
+                self._enqueueJob(jobID, iPath)
+        for iName in sorted(os.listdir(self.directoryToWatch)):
+            iPath = os.path.join(self.directoryToWatch, iName)
+            if (iPath not in knownPaths) and (os.path.isdir(iPath) or iPath.endswith(ARCHIVE_EXTENSIONS)):
+                self.enqueue(iPath)
+
+    def stop(self):
+        """Stop ingestion worker threads. Queued work is not started and arrivals awaiting stability are 
+        abandoned - their jobs are left in the job store to be resumed on restart (see reconcile). 
+        Loads already in progress are completed.
+        """
+        self._stopEvent.set()
+        while True: # Remove work not yet started
+            try:
+                item = self.workQueue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                with self._lock:
+                    self._inFlight.discard(item[1])
+            self.workQueue.task_done()
+        for _ in self._workers:
+            self.workQueue.put(None)
+        for iWorker in self._workers:
+            iWorker.join()
+        self._workers = []
+
+    def enqueue(self, new_subdirectory_full):
+        """Queue new arrival for a worker. Blocks if queue is full. 
+
+        Args:
+            new_subdirectory_full (str): path to new directory (or archive)
+        """
+        subdirectory = os.path.split(new_subdirectory_full)[1]
+        if self.ignore_pattern and self.matches_ignore_pattern(subdirectory):
+            self.logger.info(f"Ignoring subdirectory: {new_subdirectory_full}")
+            return
+        with self._lock:
+            if new_subdirectory_full in self._inFlight:
+                self.logger.debug(f"Already queued: {new_subdirectory_full}")
+                return
+        jobID = self.jobStore.addJob(new_subdirectory_full)
+        self._enqueueJob(jobID, new_subdirectory_full)
+
+    def _enqueueJob(self, jobID, path):
+        with self._lock:
+            if path in self._inFlight:
+                return
+            self._inFlight.add(path)
+        self._watchArrival(path)
+        self.workQueue.put((jobID, path))
+        self.logger.info(f"Queued: {path} (job {jobID}, {self.workQueue.qsize()} waiting)")
+
+    def _worker(self):
+        while True:
+            item = self.workQueue.get()
+            if item is None:
+                self.workQueue.task_done()
+                break
+            jobID, path = item
+            if self._stopEvent.is_set(): # Stopping - left in job store for restart
+                with self._lock:
+                    self._inFlight.discard(path)
+                self.workQueue.task_done()
+                continue
+            try:
+                if self.jobStore.getJob(jobID)["State"] == "loading":
+                    self.logger.info(f"Resuming load of {path} (job {jobID})")
+                    self._loadProcessingDirectory(path, jobID)
+                else:
+                    self._action(path, jobID)
+            except Exception as e:
+                self._setJobState(jobID, "failed", error=str(e))
+                if self.DEBUG:
+                    self.logger.exception(f"    _action processing interrupted : {e}")
+                else:
+                    self.logger.error(f"    _action processing interrupted : {e}")
+            finally:
+                self._finishArrivalWatch(path)
+                with self._lock:
+                    self._inFlight.discard(path)
+                    self._lastEventTime.pop(path, None)
+                self.workQueue.task_done()
+
+    def _watchArrival(self, path):
+        """Watch arriving directory (recursively) for stability tracking (if running with an observer)"""
+        if (self.observer is None) or (not self._isDirectChild(path)) or (not os.path.isdir(path)):
+            return
+        with self._lock:
+            if path in self._arrivalWatches:
+                return
+        try:
+            watch = self.observer.schedule(self, path=path, recursive=True)
+        except OSError as e: # e.g. removed since arrival
+            self.logger.warning(f"Unable to watch {path}: {e}")
+            return
+        with self._lock:
+            self._arrivalWatches[path] = watch
+            self._finishedArrivals.discard(path)
+
+    def _finishArrivalWatch(self, path):
+        # Watch is removed by releaseArrivalWatches - not here: a worker must not wait on the observer 
+        #   (event dispatch may be holding it while blocked on a full work queue)
+        with self._lock:
+            if path in self._arrivalWatches:
+                self._finishedArrivals.add(path)
+
+    def releaseArrivalWatches(self):
+        """Remove watches of arriving directories no longer awaiting stability (called from watchdog run loop)"""
+        with self._lock:
+            toRelease = [self._arrivalWatches.pop(i) for i in self._finishedArrivals if i in self._arrivalWatches]
+            self._finishedArrivals.clear()
+        for iWatch in toRelease:
+            try:
+                self.observer.unschedule(iWatch)
+            except KeyError: # already removed
+                pass
+
+    def _getTopLevelPath(self, path):
+        """Return the direct child of directoryToWatch that path is in (None if not in directoryToWatch)"""
+        relPath = os.path.relpath(path, self.directoryToWatch)
+        if relPath.startswith(os.pardir) or (relPath == os.curdir):
+            return None
+        return os.path.join(self.directoryToWatch, relPath.split(os.sep)[0])
+
+    def _isDirectChild(self, path):
+        return os.path.dirname(os.path.normpath(path)) == os.path.normpath(self.directoryToWatch)
+
+    def on_any_event(self, event):
+        # Record time of latest event within each arriving directory (used by is_stable)
+        if event.event_type in ['deleted', 'closed_no_write', 'opened']:
+            return
+        path = getattr(event, 'dest_path', '') or event.src_path
+        topLevelPath = self._getTopLevelPath(path)
+        if (topLevelPath is None) or self.matches_ignore_pattern(os.path.split(topLevelPath)[1]):
+            return
+        self._lastEventTime[topLevelPath] = time.time()
 
     def on_moved(self, event):
+        if not self._isDirectChild(event.dest_path):
+            return
         if event.is_directory:
             self.logger.info(f"Directory moved/renamed: {event.dest_path}")
-            try:
-                self._action(event.dest_path)
-            except Exception as e:
-                self.logger.error(f"    _action processing interrupted : {e}")
+            self.enqueue(event.dest_path)
 
     def on_created(self, event):
+        if not self._isDirectChild(event.src_path):
+            return
         if event.is_directory:
             self.logger.info(f"Directory created: {event.src_path}")
-            try:
-                self._action(event.src_path)
-            except Exception as e:
-                self.logger.error(f"    _action processing interrupted : {e}")
+            self.enqueue(event.src_path)
 
-        elif event.src_path.endswith('.zip') or \
-                event.src_path.endswith('.tar') or \
-                event.src_path.endswith('.tar.gz'):
+        elif event.src_path.endswith(ARCHIVE_EXTENSIONS):
             self.logger.info(f"Archive created: {event.src_path}")
-            try:
-                self._action(event.src_path)
-            except Exception as e:
-                if self.DEBUG:
-                    raise e
-                self.logger.error(f"    _action processing interrupted : {e}")
+            self.enqueue(event.src_path)
 
     def on_deleted(self, event):
-        self.logger.info(f"deleted: {event.src_path}")
-        pass
+        if self._isDirectChild(event.src_path):
+            self.logger.info(f"deleted: {event.src_path}")
     # def on_modified(self, event):
     #     pass
 
-    def _action(self, new_subdirectory_full):
+    def _action(self, new_subdirectory_full, jobID=None):
         self.logger.info(f"New subdirectory detected: {new_subdirectory_full}")
         subdirectory = os.path.split(new_subdirectory_full)[1]
 
@@ -164,10 +461,18 @@ class MIResearch_SubdirectoryHandler(FileSystemEventHandler):
             self.logger.info(f"Ignoring subdirectory: {new_subdirectory_full}")
             return
 
-        if self.is_stable(new_subdirectory_full):
+        if not self.is_stable(new_subdirectory_full):
+            if self._stopEvent.is_set():
+                self.logger.info(f"Stopping - {new_subdirectory_full} left queued for restart")
+                return
+            self.logger.warning(f"NOT STABLE within {self.pollTimeOut} seconds: {new_subdirectory_full}")
+            self._setJobState(jobID, "failed", error="Not stable within timeout")
+        else:
             self.logger.info(f"STABLE: {new_subdirectory_full}")
+            self._setJobState(jobID, "stable")
             # Want to process a directory - but if already being processed then need to deal with that first. 
-            matchingProcessing = self.findMatchingProcessingDirs(subdirectory)
+            matchingProcessing = [i for i in self.findMatchingProcessingDirs(subdirectory) 
+                                    if (i not in self._activeProcessDirs) and (i not in self._inFlight)]
             if len(matchingProcessing) > 0:
                 for already_exec_directory in matchingProcessing:
                     self.logger.warning(f"Found already executing directory: {already_exec_directory}")
@@ -179,7 +484,7 @@ class MIResearch_SubdirectoryHandler(FileSystemEventHandler):
                     except Exception as e:
                         self.logger.error(f"An error occurred: {e}")
             ## 
-            self.execute_loadDirectory(new_subdirectory_full)
+            self.execute_loadDirectory(new_subdirectory_full, jobID)
 
 
     def findMatchingProcessingDirs(self, src_path):
@@ -191,34 +496,63 @@ class MIResearch_SubdirectoryHandler(FileSystemEventHandler):
         return matchingProcessing
 
     def is_stable(self, directory_path):
-        """Check if this new directory is stable (no change in modified time)
+        """Check if this new directory is stable (no file system events within it for pollStable seconds)
+        Events are recorded by on_any_event - so each poll is a lookup only. 
+        If CONFIRM_COUNT_SIZE then, once quiet, the file count and total size are checked 
+        to be unchanged over one poll (for file systems where events may be missed, e.g. network shares).
 
         Args:
             directory_path (str): the directory to check for stability
 
         Returns:
-            bool: True if stable AND not already being processed. 
+            bool: True if stable AND not already being processed. False if not stable within timeout or if stopping.
         """
         start_time = time.time()
-        stable_start_time = None
+        countSize = None
 
-        while True:
+        while not self._stopEvent.is_set():
             current_time = time.time()
             # Check if the timeout has been reached
             if (current_time - start_time) > (self.pollTimeOut): 
                 break
-            if stable_start_time is None:
-                # Initialize stable_start_time on the first iteration
-                stable_start_time = current_time
-            modified_time = get_directory_modified_time(directory_path)
-            if modified_time > stable_start_time: 
-                stable_start_time = modified_time
+            stable_start_time = max(start_time, self._lastEventTime.get(directory_path, start_time))
             if current_time - stable_start_time >= self.pollStable:
-                self.logger.debug(f"Directory has remained stable for {self.pollStable} seconds.")
-                return True
-            time.sleep(self.pollDelay)
+                if not self.CONFIRM_COUNT_SIZE:
+                    self.logger.debug(f"Directory has remained stable for {self.pollStable} seconds.")
+                    return True
+                countSize_now = get_directory_count_size(directory_path)
+                if countSize_now == countSize:
+                    self.logger.debug(f"Directory has remained stable for {self.pollStable} seconds (count, size = {countSize}).")
+                    return True
+                if countSize is not None: # changed without events seen - restart stable period
+                    self._lastEventTime[directory_path] = current_time
+                countSize = countSize_now
+            self._stopEvent.wait(self.pollDelay)
         return False
 
+    @contextmanager
+    def _studyLock(self, studyKey):
+        """Serialise loads of the same study (so concurrent arrivals of one study go to one subject)"""
+        with self._lock:
+            studyLock = self._studyLocks.setdefault(studyKey, [threading.Lock(), 0])
+            studyLock[1] += 1
+        try:
+            with studyLock[0]:
+                yield
+        finally:
+            with self._lock:
+                studyLock[1] -= 1
+                if studyLock[1] == 0:
+                    self._studyLocks.pop(studyKey, None)
+
+    def _getStudyKey(self, directoryToLoad):
+        # Archives (and directories without StudyInstanceUID) share one key - so are loaded one at a time
+        if os.path.isdir(directoryToLoad):
+            ds = spydcm.returnFirstDicomFound(directoryToLoad)
+            if ds is not None:
+                return ds.get('StudyInstanceUID', None)
+        return None
+
     def matches_ignore_pattern(self, subdirectory):
         # Check if the subdirectory matches the ignore pattern
         for i in self.ignore_pattern:
@@ -226,10 +560,48 @@ class MIResearch_SubdirectoryHandler(FileSystemEventHandler):
                 return True
         return False
 
-    def execute_loadDirectory(self, directoryToLoad):
+    def execute_loadDirectory(self, directoryToLoad, jobID=None):
+        directoryToLoad_process = self._moveToProcessing(directoryToLoad, jobID)
+        self._loadProcessingDirectory(directoryToLoad_process, jobID)
+
+    def _moveToProcessing(self, directoryToLoad, jobID=None):
         uid = uuid.uuid4().hex
         src_path = os.path.split(directoryToLoad)[1]
-        directoryToLoad_process = shutil.move(directoryToLoad, os.path.join(self.processDir, uid+"_"+src_path))
+        directoryToLoad_process = os.path.join(self.processDir, uid+"_"+src_path)
+        # Record destination before move - so can be found if interrupted
+        self._setJobState(jobID, "stable", processPath=directoryToLoad_process)
+        self._finishArrivalWatch(directoryToLoad) # Stable - no longer needs watching
+        with self._lock:
+            self._activeProcessDirs.add(directoryToLoad_process)
+        shutil.move(directoryToLoad, directoryToLoad_process)
+        self._setJobState(jobID, "loading")
+        with self._lock:
+            self._inFlight.discard(directoryToLoad) # a new arrival at same path may now be queued
+        return directoryToLoad_process
+
+    def _loadProcessingDirectory(self, directoryToLoad_process, jobID=None):
+        with self._lock:
+            self._activeProcessDirs.add(directoryToLoad_process)
+        try:
+            with self._studyLock(self._getStudyKey(directoryToLoad_process)):
+                errors = self._loadAndAnonymise(directoryToLoad_process)
+        finally:
+            with self._lock:
+                self._activeProcessDirs.discard(directoryToLoad_process)
+        finalCompleteDir = os.path.join(self.completeDir, os.path.split(directoryToLoad_process)[1])
+        if os.path.isdir(finalCompleteDir):
+            self.logger.warning(f"{finalCompleteDir} exists - will delete before moving {directoryToLoad_process}")
+            shutil.rmtree(finalCompleteDir)
+        shutil.move(directoryToLoad_process, self.completeDir)
+        if len(errors) > 0:
+            self._setJobState(jobID, "failed", error=" | ".join(errors))
+        else:
+            self._setJobState(jobID, "complete")
+        self.logger.info(f"=== FINISHED PROCESSING {directoryToLoad_process} ===")
+
+    def _loadAndAnonymise(self, directoryToLoad_process):
+        """Returns list of error messages (empty if all successful)"""
+        newSubjList, errors = [], []
         try:
             self.logger.info(f"*** BEGIN PROCESSING {directoryToLoad_process} ***")
             newSubjList = mi_subject.createNew_OrAddTo_Subject(directoryToLoad_process,
@@ -240,6 +612,7 @@ class MIResearch_SubdirectoryHandler(FileSystemEventHandler):
             if self.DEBUG:
                 raise e
             self.logger.error(f"An error occurred while loading subject: {str(e)} ")
+            errors.append(f"load: {e}")
         if self.TO_ANONYMISE:
                 for iNewSubj in newSubjList:
                     try:
@@ -248,12 +621,8 @@ class MIResearch_SubdirectoryHandler(FileSystemEventHandler):
                         if self.DEBUG:
                             raise e
                         self.logger.error(f"An error occurred while anonymising {iNewSubj}: {str(e)} ")
-        finalCompleteDir = os.path.join(self.completeDir, os.path.split(directoryToLoad_process)[1])
-        if os.path.isdir(finalCompleteDir):
-            self.logger.warning(f"{finalCompleteDir} exists - will delete before moving {directoryToLoad_process}")
-            shutil.rmtree(finalCompleteDir)
-        shutil.move(directoryToLoad_process, self.completeDir)
-        self.logger.info(f"=== FINISHED PROCESSING {directoryToLoad_process} ===")
+                        errors.append(f"anonymise {iNewSubj}: {e}")
+        return errors
 
 
 ### ====================================================================================================================
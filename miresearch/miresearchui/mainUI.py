@@ -2,7 +2,6 @@
 
 import os
 from datetime import datetime
-from urllib.parse import quote
 from nicegui import ui
 from ngawari import fIO
 from local_directory_picker import local_file_picker
@@ -13,6 +12,7 @@ from miresearch.miresearchui import miui_helpers
 import asyncio  # Add this import at the top
 
 DEBUG = True
+TABLE_PAGE_SIZE = 100
 
 # TODO best here that I set from a config file - i.e. give dict - name - then 
 # hardcoded_presets = {"ProjA": {"data_root_dir": "/home/fraser/WORK/MI_DATA/tmpTestSubjs2",
@@ -39,30 +39,28 @@ class miresearch_ui():
         self.subjectList = []
         self.SubjClass = mi_subject.AbstractSubject # This is default - updated if read from config
         self.tableRows = []
+        self.tableIndex = None # miui_helpers.SubjectTableIndex - rows served one page at a time
+        self.revalidateTask = None # background check of table rows against subject files
+        self.tablePage = 1
+        self.sortModel = []
+        self.filterModel = {}
         self.presetDict = {}
         self.setPresets(hardcoded_presets)
 
+        # Sort / filter set in the grid header are applied to the whole subject list by the table index 
+        #   (see showTablePage) - the grid does not sort / filter the page it holds
         self.tableCols = [
-            {'field': 'subjID', 'sortable': True, 'checkboxSelection': True, 'filter': 'agTextColumnFilter', 'filterParams': {'filterOptions': ['contains', 'notContains']}},
-            {'field': 'name', 'editable': True, 'filter': 'agTextColumnFilter', 'sortable': True, 'filterParams': {'filterOptions': ['contains', 'notContains', 'startsWith']}},
-            {'field': 'DOS', 'sortable': True, 'filter': 'agDateColumnFilter', 'filterParams': {
-                'comparator': 'function(filterLocalDateAtMidnight, cellValue) { '
-                              'if (!cellValue) return false; '
-                              'var dateParts = cellValue.split(""); '
-                              'var cellDate = new Date(dateParts[0] + dateParts[1] + dateParts[2] + dateParts[3], '
-                              'dateParts[4] + dateParts[5] - 1, '
-                              'dateParts[6] + dateParts[7]); '
-                              'return cellDate <= filterLocalDateAtMidnight; '
-                              '}',
-                'browserDatePicker': True,
-            }},
-            {'field': 'StudyID', 'sortable': True, 'filter': 'agNumberColumnFilter', 'filterParams': {'filterOptions': ['equals', 'notEqual', 'lessThan', 'lessThanOrEqual', 'greaterThan', 'greaterThanOrEqual', 'inRange']}},
-            {'field': 'age', 'sortable': True, 'filter': 'agNumberColumnFilter', 'filterParams': {'filterOptions': ['inRange', 'lessThan', 'greaterThan',]}},
-            {'field': 'levelCompleted', 'sortable': True, 'filter': 'agNumberColumnFilter', 'filterParams': {'filterOptions': ['lessThan', 'greaterThan',]}},
+            {'field': 'subjID', 'sortable': True, 'checkboxSelection': True, 'filter': 'agTextColumnFilter', 'filterParams': miui_helpers.serverSideFilterParams(['contains', 'notContains'])},
+            {'field': 'name', 'editable': True, 'filter': 'agTextColumnFilter', 'sortable': True, 'filterParams': miui_helpers.serverSideFilterParams(['contains', 'notContains', 'startsWith'])},
+            {'field': 'DOS', 'sortable': True, 'filter': 'agDateColumnFilter', 'filterParams': miui_helpers.serverSideFilterParams(['equals', 'lessThan', 'greaterThan', 'inRange'], browserDatePicker=True)},
+            {'field': 'StudyID', 'sortable': True, 'filter': 'agNumberColumnFilter', 'filterParams': miui_helpers.serverSideFilterParams(['equals', 'notEqual', 'lessThan', 'lessThanOrEqual', 'greaterThan', 'greaterThanOrEqual', 'inRange'])},
+            {'field': 'age', 'sortable': True, 'filter': 'agNumberColumnFilter', 'filterParams': miui_helpers.serverSideFilterParams(['inRange', 'lessThan', 'greaterThan',])},
+            {'field': 'levelCompleted', 'sortable': True, 'filter': 'agNumberColumnFilter', 'filterParams': miui_helpers.serverSideFilterParams(['lessThan', 'greaterThan',])},
             
             {'field': 'open'} # 
         ]
         self.aggrid = None
+        self.pagination = None
         self.page = None  # Add this to store the page reference
 
 
@@ -126,7 +124,7 @@ class miresearch_ui():
                 return
             else:   
                 self._saveMIUI_ConfigFile(configFile)
-                self.setSubjectListFromConfigFile(configFile)
+                await self.setSubjectListFromConfigFile(configFile)
         except Exception as e:
             print(f"Error in directory picker: {e}")
             ui.notify(f"Error selecting directory: {str(e)}", type='error')
@@ -141,7 +139,8 @@ class miresearch_ui():
                 print(f"Setting up button for {iProjName}")
                 ui.button(iProjName, on_click=lambda proj=iProjName: self.setSubjectListFromConfigFile(proj))
             ui.space()
-            ui.button('', on_click=self.updateTable, icon='refresh').classes('ml-auto')
+            ui.button('', on_click=lambda: self.updateTable(FORCE_DERIVED=True), icon='refresh').classes('ml-auto')
+            ui.button('', on_click=self.show_jobs, icon='work_history').classes('ml-auto')
             ui.button('', on_click=self.settings_page, icon='settings').classes('ml-auto')
 
         myhtml_column = miui_helpers.get_index_of_field_open(self.tableCols)
@@ -151,14 +150,19 @@ class miresearch_ui():
                         'rowData': self.tableRows,
                         'rowSelection': 'multiple',
                         'stopEditingWhenCellsLoseFocus': True,
-                        "pagination" : "true",
                         'domLayout': 'autoHeight',
+                        ':postSortRows': 'params => params.nodes.sort((a, b) => a.sourceRowIndex - b.sourceRowIndex)', # keep order served
                             }, 
                             html_columns=[myhtml_column]).classes('w-full h-full')
+            # Sorting / filtering applied to whole subject list by the table index (not only the page shown)
+            self.aggrid.on('sortChanged', self.onTableSortChanged)
+            self.aggrid.on('filterChanged', self.onTableFilterChanged)
+        with ui.row():
+            self.pagination = ui.pagination(1, 1, direction_links=True, on_change=self.onTablePageChanged)
         with ui.row():
             ui.button('Load subject', on_click=self.load_subject, icon='upload')
             ui.button('Anonymise', on_click=self.anonymise_subject, icon='person_off')
-        ui.run()
+        ui.run(reload=False)
 
     # ========================================================================================
     # SUBJECT LEVEL ACTIONS
@@ -173,30 +177,10 @@ class miresearch_ui():
             
             choosenDir = result[0]
             
-            # Create loading notification
-            loading_notification = ui.notification(
-                message='Loading subject...',
-                type='ongoing',
-                position='top',
-                timeout=None  # Keep showing until we close it
-            )
-            
-
-            # Run the long operation in background
-            async def background_load():
-                try:
-                    await asyncio.to_thread(mi_subject.createNew_OrAddTo_Subject, choosenDir, self.dataRoot, self.SubjClass)
-                    loading_notification.dismiss()
-                    ui.notify(f"Loaded subject {self.SubjClass.subjID}", type='positive')
-                    
-                except Exception as e:
-                    loading_notification.dismiss()
-                    ui.notify(f"Error loading subject: {str(e)}", type='error')
-                    if self.DEBUG:
-                        print(f"Error loading subject: {e}")
-            
-            # Start background task
-            ui.timer(0, lambda: background_load(), once=True)
+            # Run the long operation in background job runner
+            jobID = miui_helpers.JOB_RUNNER.submit(f"Load {os.path.basename(choosenDir)}", 
+                                                   mi_subject.createNew_OrAddTo_Subject, choosenDir, self.dataRoot, self.SubjClass)
+            miui_helpers.trackJobInUI(jobID, on_complete=lambda job: self.updateTable())
             
         except Exception as e:
             if self.DEBUG:
@@ -207,20 +191,48 @@ class miresearch_ui():
 
     async def anonymise_subject(self) -> None:
         selectedSubjects = await self.aggrid.get_selected_rows()
+        subjList = mi_subject.SubjectList()
         for iSubj in selectedSubjects:
             defDict = miui_helpers.rowToSubjID_dataRoot_classPath(iSubj)
-            thisSubj = miui_helpers.subjID_dataRoot_classPathTo_SubjObj(defDict['subjID'], defDict['dataRoot'], defDict['classPath'])
-            try:
-                thisSubj.anonymise()
-                ui.notify(f"Anonymised subject {thisSubj.subjID}", type='positive')
-            except Exception as e:
-                ui.notify(f"Error anonymising subject {thisSubj.subjID}: {str(e)}", type='error')
+            subjList.append(miui_helpers.subjID_dataRoot_classPathTo_SubjObj(defDict['subjID'], defDict['dataRoot'], defDict['classPath']))
+        if len(subjList) == 0:
+            return True
+        async def _onComplete(jobs):
+            failed = [i['Description'] for i in jobs if i['Status'] == 'failed']
+            for iJob in jobs:
+                if iJob['Status'] == 'complete':
+                    report = iJob['Result']
+                    failed += list(report.loc[report['Status'] == 'failed', 'SubjectID'])
+            if len(failed) > 0:
+                ui.notify(f"Anonymise failed for: {', '.join(failed)}", type='error')
+            await self.updateTable()
+        # One background job per subject - serialised with other jobs on the same subject (e.g. from subject page)
+        jobIDs = [miui_helpers.JOB_RUNNER.submit(f"Anonymise {iSubj.subjID}", mi_subject.SubjectList([iSubj]).anonymise, 
+                                                 QUIET=True, serialKey=iSubj.getTopDir()) for iSubj in subjList]
+        miui_helpers.trackJobsInUI(jobIDs, f"Anonymise {len(subjList)} subjects", on_complete=_onComplete)
         return True
 
+    def show_jobs(self) -> None:
+        """Dialog with status of background jobs (all sessions)"""
+        columns = [{'name': i, 'label': i, 'field': i, 'align': 'left'} for i in ['Description', 'Status', 'Progress', 'Error']]
+        def _rows():
+            return [{'JobID': i['JobID'], 'Description': i['Description'], 'Status': i['Status'], 
+                     'Progress': '' if i['Progress'] is None else f"{i['Progress'][0]} / {i['Progress'][1]}", 
+                     'Error': i['Error']} for i in miui_helpers.JOB_RUNNER.getJobs()]
+        with ui.dialog() as dialog, ui.card().classes('w-full'):
+            ui.label('Background jobs').classes('text-h6')
+            jobs_table = ui.table(columns=columns, rows=_rows(), row_key='JobID').classes('w-full')
+            def _refresh():
+                jobs_table.rows = _rows()
+            refresh_timer = ui.timer(1.0, _refresh)
+            ui.button('Close', on_click=dialog.close)
+        dialog.on('hide', lambda: (refresh_timer.cancel(), dialog.delete()))
+        dialog.open()
+
     # ========================================================================================
     # SET SUBJECT LIST 
     # ========================================================================================    
-    def setSubjectListFromConfigFile(self, projectName):
+    async def setSubjectListFromConfigFile(self, projectName):
         """
         Set the subject list from a config file (either selected or remembered)
         """
@@ -232,49 +244,89 @@ class miresearch_ui():
             projectName = iName
         if projectName not in self.presetDict.keys():
             return
-        self.setSubjectListFromLocalDirectory(localDirectory=self.presetDict[projectName].get("data_root_dir", "None"), 
+        await self.setSubjectListFromLocalDirectory(localDirectory=self.presetDict[projectName].get("data_root_dir", "None"), 
                                               subject_prefix=self.presetDict[projectName].get("subject_prefix", None),  
                                               SubjClass=self.presetDict[projectName].get("class_obj", mi_subject.AbstractSubject), )
         
 
 
-    def setSubjectListFromLocalDirectory(self, localDirectory, subject_prefix=None, SubjClass=mi_subject.AbstractSubject):
+    async def setSubjectListFromLocalDirectory(self, localDirectory, subject_prefix=None, SubjClass=mi_subject.AbstractSubject):
         if SubjClass is None:
             SubjClass = mi_subject.AbstractSubject
         self.SubjClass = SubjClass
         if os.path.isdir(localDirectory):
             self.dataRoot = localDirectory
-            self.subjectList = mi_subject.SubjectList.setByDirectory(self.dataRoot, 
+            self.subjectList = await asyncio.to_thread(mi_subject.SubjectList.setByDirectory, self.dataRoot, 
                                                                      subjectPrefix=subject_prefix,
-                                                                     SubjClass=self.SubjClass)
+                                                                     SubjClass=self.SubjClass, 
+                                                                     HANDLES=True)
             if self.DEBUG:
-                print(f"Have {len(self.subjectList)} subjects (should be {len(os.listdir(self.dataRoot))})")
-            self.updateTable()
+                print(f"Have {len(self.subjectList)} subjects")
+            self.tableIndex = miui_helpers.SubjectTableIndex(self.subjectList, self.dataRoot, self.SubjClass)
+            self.tablePage = 1
+            await self.updateTable()
 
     # ========================================================================================
     # UPDATE TABLE
     # ========================================================================================  
-    def updateTable(self):
-        self.clearTable()
+    async def updateTable(self, FORCE_DERIVED=False):
+        """Refresh table index (rows rebuilt only for new / changed subjects - off the event loop) and show current page. 
+        Stored snapshot rows are shown first, then checked against subject files in the background (see revalidateTable). 
+        FORCE_DERIVED: recompute derived values (level completed) for all subjects (refresh button)."""
+        if self.tableIndex is None:
+            return
         if self.DEBUG:
-            print(self.aggrid.options['rowData'])
             print(f"Have {len(self.subjectList)} subjects - building table")
-        c0 = 0
-        for isubj in self.subjectList:
-            c0 += 1
-            classPath = self.SubjClass.__module__ + '.' + self.SubjClass.__name__
-            addr = f"subject_page/{isubj.subjID}?dataRoot={quote(self.dataRoot)}&classPath={quote(classPath)}"
-            self.tableRows.append({'subjID': isubj.subjID, 
-                            'name': isubj.getName(), 
-                            'DOS': isubj.getStudyDate(),  
-                            'StudyID': isubj.getStudyID(),
-                            'age': isubj.getAge(), 
-                            'levelCompleted': isubj.getLevelCompleted(),
-                            'open': f"<a href={addr}>View {isubj.subjID}</a>"})
+        await asyncio.to_thread(self.tableIndex.refresh, FORCE_DERIVED=FORCE_DERIVED, VALIDATE=FORCE_DERIVED)
+        await self.showTablePage()
+        if not FORCE_DERIVED:
+            if (self.revalidateTask is None) or self.revalidateTask.done():
+                self.revalidateTask = asyncio.create_task(self.revalidateTable(self.tableIndex))
+
+    async def revalidateTable(self, tableIndex):
+        """Check shown rows against subject files (off the event loop) and show page again if any rows changed"""
+        changed = await asyncio.to_thread(tableIndex.revalidate)
+        if self.DEBUG:
+            print(f"Table revalidated - {len(changed)} rows changed")
+        if changed and (tableIndex is self.tableIndex):
+            await self.showTablePage()
+
+    async def showTablePage(self):
+        rows, nRows = await asyncio.to_thread(self.tableIndex.query, self.sortModel, self.filterModel, 
+                                              self.tablePage, TABLE_PAGE_SIZE)
+        self.tableRows[:] = rows
         self.aggrid.options['rowData'] = self.tableRows
-        self.aggrid.update()
+        # Rows set on the grid (update() would rebuild the grid - losing the sort / filter shown in the header)
+        self.aggrid.run_grid_method('setGridOption', 'rowData', self.tableRows)
+        nPages = max(1, -(-nRows // TABLE_PAGE_SIZE))
+        self.pagination.max = nPages
+        if self.tablePage > nPages:
+            self.tablePage = nPages
+            self.pagination.value = nPages
         if self.DEBUG:
-            print(f'Done - {len(self.tableRows)}')
+            print(f'Done - showing {len(self.tableRows)} of {nRows}')
+
+    async def onTablePageChanged(self, e) -> None:
+        if (self.tableIndex is None) or (e.value is None) or (e.value == self.tablePage):
+            return
+        self.tablePage = e.value
+        await self.showTablePage()
+
+    async def onTableSortChanged(self) -> None:
+        if self.tableIndex is None:
+            return
+        columnState = await self.aggrid.run_grid_method('getColumnState')
+        sortedColumns = sorted([i for i in columnState if i.get('sort')], key=lambda x: x.get('sortIndex') or 0)
+        self.sortModel = [{'colId': i['colId'], 'sort': i['sort']} for i in sortedColumns]
+        await self.showTablePage()
+
+    async def onTableFilterChanged(self) -> None:
+        if self.tableIndex is None:
+            return
+        self.filterModel = await self.aggrid.run_grid_method('getFilterModel')
+        self.tablePage = 1
+        self.pagination.value = 1
+        await self.showTablePage()
 
 
     def clearTable(self):
@@ -303,7 +355,8 @@ def runMIUI():
     miui = miresearch_ui()
     miui.setUpAndRun()
 
-if __name__ in {"__main__", "__mp_main__"}:
+# Not run as "__mp_main__" - so spawned worker processes (e.g. anonymise) do not build the UI
+if __name__ == "__main__":
     # app.on_shutdown(miui_helpers.cleanup)
     runMIUI()
 
@@ -1,9 +1,18 @@
 #!/usr/bin/env python3
 
-from urllib.parse import urlparse, parse_qs
+import math
+import re
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+from urllib.parse import urlparse, parse_qs, quote
+from concurrent.futures import ThreadPoolExecutor
 import importlib
 import asyncio
+from nicegui import ui
 from miresearch import mi_subject
+from miresearch import mi_utils
 from miresearch.mi_config import MIResearch_config
 DEBUG = True
 
@@ -52,4 +61,332 @@ def subjID_dataRoot_classPathTo_SubjObj(subjID, dataRoot, classPath):
     if classPath:
         module_name, class_name = classPath.rsplit('.', 1)
         SubjClass = getattr(importlib.import_module(module_name), class_name)
-    return SubjClass(subjID, dataRoot=dataRoot)
\ No newline at end of file
+    return SubjClass(subjID, dataRoot=dataRoot)
+
+# ==========================================================================================
+# SUBJECT TABLE INDEX  
+# ==========================================================================================
+def _subjectPageLink(subjID, dataRoot, classPath):
+    addr = f"subject_page/{subjID}?dataRoot={quote(dataRoot)}&classPath={quote(classPath)}"
+    return f"<a href={addr}>View {subjID}</a>"
+
+def subjectToTableRow(subj, dataRoot, classPath):
+    """One subject table row (as shown in main page table)"""
+    return {'subjID': subj.subjID, 
+            'name': subj.getName(), 
+            'DOS': subj.getStudyDate(),  
+            'StudyID': subj.getStudyID(),
+            'age': subj.getAge(), 
+            'levelCompleted': subj.getLevelCompleted(),
+            'open': _subjectPageLink(subj.subjID, dataRoot, classPath)}
+
+def summarySnapshotToTableRow(subjID, snapshotRow, dataRoot, classPath):
+    """One subject table row from project summary snapshot row (see mi_catalog.getSummary)"""
+    try:
+        name = mi_utils.decodeString(snapshotRow['NAME'], subjID)
+    except Exception: # No / invalid encoded name
+        name = 'Name-Unknown'
+    return {'subjID': subjID, 
+            'name': name, 
+            'DOS': snapshotRow['StudyDate'],  
+            'StudyID': snapshotRow['StudyID'],
+            'age': snapshotRow['Age'], 
+            'levelCompleted': snapshotRow['LevelCompleted'],
+            'open': _subjectPageLink(subjID, dataRoot, classPath)}
+
+
+class SubjectTableIndex(object):
+    """Precomputed subject table rows - one per subject, built from the project summary snapshot 
+    (see SubjectList.getSummarySnapshotRows): meta values are rebuilt only if the subject meta file changes, 
+    derived values (level completed) only if the subject files change (or on forced refresh). 
+    If the project catalog exists the snapshot is read from it in one query. 
+    Stored snapshot rows may be served without checking subject files (refresh with VALIDATE=False) and 
+    checked later (revalidate) - so the table is shown without file system access per subject. 
+    Sorting, filtering (AG Grid sort / filter models) and paging are served from this index. 
+    Methods read the file system - run off the event loop (e.g. asyncio.to_thread).
+    """
+    def __init__(self, subjectList, dataRoot, SubjClass, nThreads=8) -> None:
+        self.subjectList = subjectList
+        self.dataRoot = dataRoot
+        self.classPath = SubjClass.__module__ + '.' + SubjClass.__name__
+        self.nThreads = nThreads
+        self._snapshot = {} # subjID: summary snapshot row
+        self._rows = {} # subjID: table row
+        self._lock = threading.Lock()
+
+    def refresh(self, FORCE_DERIVED=False, VALIDATE=True):
+        """Build rows for new subjects and rebuild rows of subjects whose meta or files have changed (concurrently)
+
+        Args:
+            FORCE_DERIVED (bool, optional): recompute derived values (level completed) for all subjects. Defaults to False.
+            VALIDATE (bool, optional): check stored rows against subject files. If False stored rows are used as 
+                stored - follow with revalidate. Defaults to True.
+
+        Returns:
+            list: all rows, in subject list order
+        """
+        return list(self._refresh(FORCE_DERIVED=FORCE_DERIVED, VALIDATE=VALIDATE)[0].values())
+
+    def revalidate(self):
+        """Check all rows against subject files and rebuild rows that have changed (e.g. after refresh with VALIDATE=False)
+
+        Returns:
+            list: subject IDs of rows added, changed or removed
+        """
+        return self._refresh()[1]
+
+    def _refresh(self, FORCE_DERIVED=False, VALIDATE=True):
+        snapshot = self.subjectList.getSummarySnapshotRows(nThreads=self.nThreads, knownRows=self._snapshot, 
+                                                           FORCE_DERIVED=FORCE_DERIVED, VALIDATE=VALIDATE)
+        rows, changed = {}, []
+        for subjID, iRow in snapshot.items():
+            if (subjID in self._rows) and (self._snapshot.get(subjID) == iRow): # Unchanged
+                rows[subjID] = self._rows[subjID]
+            else:
+                rows[subjID] = summarySnapshotToTableRow(subjID, iRow, self.dataRoot, self.classPath)
+                changed.append(subjID)
+        with self._lock: # Subjects no longer in list dropped
+            changed += [i for i in self._rows if i not in rows]
+            self._snapshot, self._rows = snapshot, rows
+        return rows, changed
+
+    def query(self, sortModel=None, filterModel=None, page=1, pageSize=100):
+        """Return one page of rows
+
+        Args:
+            sortModel (list, optional): [{'colId': field, 'sort': 'asc'|'desc'}, ...] (AG Grid column state with sort). 
+            filterModel (dict, optional): AG Grid filter model {field: {'filterType':..., 'type':..., ...}}.
+            page (int, optional): page number (from 1). Defaults to 1.
+            pageSize (int, optional): Defaults to 100.
+
+        Returns:
+            tuple: list of rows for page, total number of rows (after filtering)
+        """
+        with self._lock:
+            rows = [self._rows[i.subjID] for i in self.subjectList if i.subjID in self._rows]
+        for iField, iModel in (filterModel or {}).items():
+            rows = [i for i in rows if _rowPassesFilter(i.get(iField, None), iModel)]
+        for iSort in reversed(sortModel or []):
+            field = iSort['colId']
+            # None / NaN values always last (in either sort direction) - stable, so earlier sorts are kept
+            missing = [i for i in rows if _isMissing(i.get(field))]
+            present = [i for i in rows if not _isMissing(i.get(field))]
+            rows = sorted(present, key=lambda x: _sortValue(x.get(field)), 
+                          reverse=(iSort['sort'] == 'desc')) + missing
+        i0 = (max(page, 1) - 1) * pageSize
+        return rows[i0:i0+pageSize], len(rows)
+
+
+def serverSideFilterParams(filterOptions, **kwargs):
+    """AG Grid filterParams for a column filtered by SubjectTableIndex.query. The grid's filter menu 
+    sets the filter model (sent to query) but does not itself filter the page of rows the grid holds.
+
+    Args:
+        filterOptions (list): filter types offered (as handled by query - e.g. 'contains', 'lessThan', 'inRange')
+        kwargs: other filterParams
+
+    Returns:
+        dict: filterParams
+    """
+    return {'filterOptions': [{'displayKey': i, 
+                               'displayName': re.sub('([A-Z])', r' \1', i).capitalize(), 
+                               'numberOfInputs': 2 if i == 'inRange' else 1, 
+                               ':predicate': '() => true'} for i in filterOptions], 
+            **kwargs}
+
+def _isMissing(value):
+    return (value is None) or (isinstance(value, float) and math.isnan(value))
+
+def _sortValue(value):
+    if isinstance(value, (int, float)):
+        return (0, value, '')
+    return (1, 0, str(value).lower())
+
+def _rowPassesFilter(value, filterModel):
+    if 'conditions' in filterModel: # combined filter
+        results = [_rowPassesFilter(value, i) for i in filterModel['conditions']]
+        return all(results) if filterModel.get('operator', 'AND') == 'AND' else any(results)
+    fType, filterType = filterModel.get('type'), filterModel.get('filterType')
+    if filterType == 'text':
+        valueStr, query = ('' if value is None else str(value)).lower(), str(filterModel.get('filter', '')).lower()
+        return {'contains': query in valueStr, 
+                'notContains': query not in valueStr, 
+                'equals': valueStr == query, 
+                'notEqual': valueStr != query, 
+                'startsWith': valueStr.startswith(query), 
+                'endsWith': valueStr.endswith(query)}.get(fType, True)
+    if filterType == 'date': # dates held as YYYYMMDD strings
+        q0 = (filterModel.get('dateFrom') or '')[:10].replace('-', '')
+        q1 = (filterModel.get('dateTo') or '')[:10].replace('-', '')
+    else:
+        q0, q1 = filterModel.get('filter'), filterModel.get('filterTo')
+    try:
+        if filterType != 'date':
+            value = float(value)
+        comparisons = {'equals': lambda: value == q0, 
+                       'notEqual': lambda: value != q0, 
+                       'lessThan': lambda: value < q0, 
+                       'lessThanOrEqual': lambda: value <= q0, 
+                       'greaterThan': lambda: value > q0, 
+                       'greaterThanOrEqual': lambda: value >= q0, 
+                       'inRange': lambda: q0 <= value <= q1}
+        return comparisons[fType]() if fType in comparisons else True
+    except (TypeError, ValueError): # no value (or not a number)
+        return False
+
+
+# ==========================================================================================
+# BACKGROUND JOB RUNNER  
+# ==========================================================================================
+class UIJobRunner(object):
+    """Runs UI actions (ui_method calls, batch actions) in a worker thread pool - off the event loop. 
+    Shared by all UI sessions. Jobs are identified by job ID and their status (queued / running / complete / failed) 
+    and progress are polled (see trackJobInUI). Only the most recent maxJobs jobs are kept. 
+    Jobs given the same serialKey (e.g. a subject's directory) run one at a time, in order of submission.
+    """
+    def __init__(self, nWorkers=4, maxJobs=200) -> None:
+        self.maxJobs = maxJobs
+        self._executor = ThreadPoolExecutor(max_workers=nWorkers, thread_name_prefix='miui_job')
+        self._jobs = OrderedDict() # jobID: job dict
+        self._serialQueues = {} # serialKey: deque of waiting jobs - key present while a job with that key is running
+        self._lock = threading.Lock()
+
+    def submit(self, description, func, *args, WITH_PROGRESS=False, serialKey=None, **kwargs):
+        """Submit func(*args, **kwargs) to run in background
+
+        Args:
+            description (str): shown in UI
+            func (callable): function to run
+            WITH_PROGRESS (bool, optional): If True func is passed progressFunc(nComplete, nTotal, ...) 
+                keyword argument to report progress. Defaults to False.
+            serialKey (str, optional): jobs with same key do not run concurrently (queued until the 
+                previous job with that key finishes). Defaults to None.
+
+        Returns:
+            str: job ID
+        """
+        jobID = uuid.uuid4().hex[:12]
+        job = {'JobID': jobID, 'Description': description, 'Status': 'queued', 
+               'Progress': None, 'Result': None, 'Error': '', 'Submitted': time.time()}
+        if WITH_PROGRESS:
+            kwargs['progressFunc'] = lambda nComplete, nTotal, *a: self._update(jobID, Progress=(nComplete, nTotal))
+        task = (jobID, func, args, kwargs, serialKey)
+        with self._lock:
+            self._jobs[jobID] = job
+            while len(self._jobs) > max(self.maxJobs, 1):
+                self._jobs.popitem(last=False)
+            if serialKey is not None:
+                if serialKey in self._serialQueues: # Job with same key running - run when it finishes
+                    self._serialQueues[serialKey].append(task)
+                    return jobID
+                self._serialQueues[serialKey] = deque()
+        self._executor.submit(self._run, *task)
+        return jobID
+
+    def _update(self, jobID, **kwargs):
+        with self._lock:
+            if jobID in self._jobs:
+                self._jobs[jobID].update(kwargs)
+
+    def _run(self, jobID, func, args, kwargs, serialKey=None):
+        self._update(jobID, Status='running')
+        try:
+            result = func(*args, **kwargs)
+            self._update(jobID, Status='complete', Result=result)
+        except Exception as e:
+            self._update(jobID, Status='failed', Error=f"{type(e).__name__}: {e}")
+            if DEBUG:
+                print(f"Job {jobID} failed: {e}")
+        finally:
+            if serialKey is not None:
+                self._runNextSerial(serialKey)
+
+    def _runNextSerial(self, serialKey):
+        with self._lock:
+            waiting = self._serialQueues[serialKey]
+            if len(waiting) == 0:
+                self._serialQueues.pop(serialKey)
+                return
+            task = waiting.popleft()
+        self._executor.submit(self._run, *task)
+
+    def getJob(self, jobID):
+        """Return copy of job dict (None if not found)"""
+        with self._lock:
+            job = self._jobs.get(jobID)
+            return None if job is None else dict(job)
+
+    def getJobs(self):
+        """Return copies of all job dicts, most recent first"""
+        with self._lock:
+            return [dict(i) for i in reversed(self._jobs.values())]
+
+JOB_RUNNER = UIJobRunner()
+
+
+def trackJobInUI(jobID, on_complete=None, pollInterval=0.5):
+    """Show status of background job in (the calling client's) UI: ongoing notification with progress, 
+    then success / error notification. Does not block the event loop. 
+
+    Args:
+        jobID (str): job ID from JOB_RUNNER.submit
+        on_complete (callable, optional): called (or awaited if coroutine function) with the job dict when the job finishes. Defaults to None.
+    """
+    job = JOB_RUNNER.getJob(jobID)
+    notification = ui.notification(message=f"{job['Description']}: queued", type='ongoing', 
+                                   position='top', timeout=None)
+    async def _poll():
+        job = JOB_RUNNER.getJob(jobID)
+        if job is None:
+            timer.cancel()
+            notification.dismiss()
+            return
+        if job['Status'] in ('queued', 'running'):
+            progress = '' if job['Progress'] is None else f" ({job['Progress'][0]} of {job['Progress'][1]})"
+            notification.message = f"{job['Description']}: {job['Status']}{progress}"
+            return
+        timer.cancel()
+        notification.dismiss()
+        if job['Status'] == 'complete':
+            ui.notify(f"{job['Description']}: complete", type='positive')
+        else:
+            ui.notify(f"{job['Description']}: failed - {job['Error']}", type='negative')
+        if on_complete is not None:
+            result = on_complete(job)
+            if asyncio.iscoroutine(result):
+                await result
+    timer = ui.timer(pollInterval, _poll)
+    return timer
+
+
+def trackJobsInUI(jobIDs, description, on_complete=None, pollInterval=0.5):
+    """As trackJobInUI for a group of background jobs (e.g. one job per subject): one ongoing notification 
+    with number of jobs finished, then a summary notification. 
+
+    Args:
+        jobIDs (list): job IDs from JOB_RUNNER.submit
+        description (str): shown in UI
+        on_complete (callable, optional): called (or awaited if coroutine function) with the list of job dicts 
+            when all jobs have finished. Defaults to None.
+    """
+    notification = ui.notification(message=f"{description}: queued", type='ongoing', 
+                                   position='top', timeout=None)
+    async def _poll():
+        jobs = [i for i in [JOB_RUNNER.getJob(j) for j in jobIDs] if i is not None]
+        nFinished = len([i for i in jobs if i['Status'] not in ('queued', 'running')])
+        if nFinished < len(jobs):
+            notification.message = f"{description}: {nFinished} of {len(jobs)} complete"
+            return
+        timer.cancel()
+        notification.dismiss()
+        nFailed = len([i for i in jobs if i['Status'] == 'failed'])
+        if nFailed == 0:
+            ui.notify(f"{description}: complete", type='positive')
+        else:
+            ui.notify(f"{description}: {nFailed} of {len(jobs)} failed", type='negative')
+        if on_complete is not None:
+            result = on_complete(jobs)
+            if asyncio.iscoroutine(result):
+                await result
+    timer = ui.timer(pollInterval, _poll)
+    return timer
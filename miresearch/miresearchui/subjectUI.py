@@ -1,11 +1,16 @@
 import os
+import asyncio
 from nicegui import ui, app
 from miresearch import mi_subject
+from miresearch import mi_utils
 from miresearch.miresearchui import miui_helpers
 import inspect
 
 os.environ["QT_QPA_PLATFORM"] = "offscreen"
 
+LOG_PAGE_LINES = 200
+LOG_FOLLOW_INTERVAL_SEC = 2.0
+
 @ui.page('/subject_page/{subjid}')
 def subject_page(subjid: str, dataRoot: str, classPath: str):
     page = SubjectPage(subjid, dataRoot, classPath)
@@ -20,6 +25,9 @@ class SubjectPage:
     def build_page(self):
         self._create_header()
         self._create_tabs()
+        # Series overview images (cached under META) built in background - ready when series selected
+        miui_helpers.JOB_RUNNER.submit(f"Overview images {self.thisSubj.subjID}", self.thisSubj.buildSeriesOverviewImages, 
+                                       serialKey=self.thisSubj.getTopDir())
         
     def _create_header(self):
         with ui.row():
@@ -73,13 +81,14 @@ class SubjectPage:
                 
                 # Button column aligned to the right
                 with ui.column().classes('ml-4'):
-                    def handle_click(method=iMethod['method'], inputs=input_fields):
-                        try:
-                            args = [inp.value for inp in inputs]
-                            method(self.thisSubj, *args)
-                            ui.notify(f'Method {iMethod["name"]} completed', type='positive')
-                        except Exception as e:
-                            ui.notify(f'Error: {iMethod["name"]}: {str(e)}', type='negative')
+                    def handle_click(method=iMethod['method'], name=iMethod['name'], inputs=input_fields):
+                        # Run in background job runner - status shown as job progresses. 
+                        # Jobs for this subject run one at a time (they share the subject object).
+                        args = [inp.value for inp in inputs]
+                        jobID = miui_helpers.JOB_RUNNER.submit(f"{name} {self.thisSubj.subjID}", mi_subject.runUIMethod, 
+                                                               method, self.thisSubj, *args, 
+                                                               serialKey=self.thisSubj.getTopDir())
+                        miui_helpers.trackJobInUI(jobID)
                     
                     ui.button(display_name, on_click=handle_click).classes('self-end')
 
@@ -121,18 +130,18 @@ class SubjectPage:
                 "_series": iSeries
             })
         
-        def on_select_series(e):
-            dcmFile = f"{self.thisSubj.dataRoot}{os.sep}{self.thisSubj.subjID}{os.sep}{e.args[1]['_series']['DicomFileName']}"
-            if os.path.exists(dcmFile):
-                dcmS = mi_subject.spydcm.dcmTK.DicomSeries.setFromFileList([dcmFile], HIDE_PROGRESSBAR=True)
-                fig = dcmS.buildOverviewImage(RETURN_FIG=True)
-                fig_container.clear()
+        async def on_select_series(e):
+            try: # Cached overview image (built off the event loop if needed)
+                # Own subject object - not shared with background jobs running on this subject
+                subj = self.SubjClass(self.thisSubj.subjID, dataRoot=self.thisSubj.dataRoot)
+                overviewFile = await asyncio.to_thread(subj.getSeriesOverviewImage, e.args[1]['sernum'])
+            except Exception as ex:
+                ui.notify(f"Unable to show series {e.args[1]['sernum']}: {ex}", type='negative')
+                return
+            fig_container.clear()
+            if overviewFile is not None:
                 with fig_container:
-                    with ui.matplotlib(figsize=(8, 8)).figure as uifig:
-                        ax = uifig.gca()
-                        ax_ = fig.gca()
-                        ax.imshow(ax_.images[0].get_array(), cmap='gray')
-                        ax.axis('off')
+                    ui.image(overviewFile).classes('w-96').props('fit=contain')
         ##
         with ui.column().classes('w-full'):
             ui.label("SERIES INFORMATION (select series for image overview)")
@@ -145,20 +154,49 @@ class SubjectPage:
 
 
     def _create_log_panel(self):
+        """Log panel - shows end of log file (read backwards in pages), older pages loaded on demand, 
+        optionally follows new lines. The whole log file is never read."""
         columnsL = [
             {'name': 'time', 'label': 'Time', 'field': 'time', 'align': 'left'},
             {'name': 'level', 'label': 'Level', 'field': 'level', 'sortable': True, 'align': 'center'},
             {'name': 'message', 'label': 'Message', 'field': 'message', 'align': 'left'},
         ]
-        with open(self.thisSubj.logfileName, 'r') as fid:
-            logLines = fid.readlines()
-        rowsL = []
-        for iLine in logLines:
-            parts = iLine.split("|")
-            if len(parts) > 3:
-                rowsL.append({"time": parts[0], "level": parts[1], "message": parts[3]})
-            elif len(parts) == 3: # this and else account for prevoius or incompatible log formats
-                rowsL.append({"time": parts[0], "level": parts[1], "message": parts[2]})
-            else:
-                rowsL.append({"time": "-", "level": "-", "message": iLine})
-        ui.table(columns=columnsL, rows=rowsL, row_key='time')
+        logfileName = self.thisSubj.logfileName
+        if not os.path.isfile(logfileName):
+            ui.label("No log file")
+            return
+        rows, self._logStartOffset, self._logEndOffset = mi_utils.readFileLinesBackward(logfileName, LOG_PAGE_LINES)
+        with ui.row().classes('items-center'):
+            older_button = ui.button('Load older', icon='expand_less', on_click=lambda: _loadOlder())
+            follow_switch = ui.switch('Follow')
+        log_table = ui.table(columns=columnsL, rows=[_logLineToRow(*i) for i in rows], row_key='id', 
+                             pagination={'rowsPerPage': 0})
+        older_button.set_visibility(self._logStartOffset > 0)
+
+        async def _loadOlder():
+            rows, self._logStartOffset, _ = await asyncio.to_thread(mi_utils.readFileLinesBackward, logfileName, 
+                                                                   LOG_PAGE_LINES, self._logStartOffset)
+            log_table.rows[:0] = [_logLineToRow(*i) for i in rows]
+            log_table.update()
+            older_button.set_visibility(self._logStartOffset > 0)
+
+        async def _follow():
+            if not follow_switch.value:
+                return
+            rows, endOffset = await asyncio.to_thread(mi_utils.readFileLinesFrom, logfileName, self._logEndOffset)
+            if endOffset < self._logEndOffset: # log file replaced - restart
+                log_table.rows.clear()
+            self._logEndOffset = endOffset
+            if len(rows) > 0:
+                log_table.rows.extend([_logLineToRow(*i) for i in rows])
+                log_table.update()
+        ui.timer(LOG_FOLLOW_INTERVAL_SEC, _follow)
+
+
+def _logLineToRow(offset, logLine):
+    parts = logLine.split("|")
+    if len(parts) > 3:
+        return {"id": offset, "time": parts[0], "level": parts[1], "message": parts[3]}
+    elif len(parts) == 3: # this and else account for prevoius or incompatible log formats
+        return {"id": offset, "time": parts[0], "level": parts[1], "message": parts[2]}
+    return {"id": offset, "time": "-", "level": "-", "message": logLine}
@@ -4,8 +4,18 @@ from context import miresearch # This is useful for testing outside of environme
 import os
 import unittest
 import shutil
+import csv
+import json
+import logging
+import time
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 
 from miresearch import mi_subject
+from miresearch import mi_catalog
+from miresearch import miresearch_watchdog
+from miresearch.miresearchui import miui_helpers
+from watchdog.observers import Observer
 from miresearch.mi_config import MIResearch_config
 
 
@@ -244,12 +254,368 @@ class TestSubjects2(unittest.TestCase):
         filtList = self.subjList.filterSubjectListByDOS('20111014')
         self.assertEqual(len(filtList), 1, "Error filtering subject list")
         
+    def test_discovery(self):
+        os.makedirs(os.path.join(self.tmpDir, 'NOT_A_SUBJECT'))
+        try:
+            subjList = mi_subject.SubjectList.setByDirectory(self.tmpDir)
+            self.assertEqual(subjList.subjIDs, ['MIBB000001', 'MIBB000002', 'MIBB000003', 'MIBB000004'])
+            self.assertEqual(mi_subject.getAllSubjectsN(self.tmpDir, 'MIBB'), [1, 2, 3, 4])
+            self.assertIsNone(subjList[0]._directoryStructureTree, msg="Directory tree built on discovery")
+            self.assertEqual([i.name for i in subjList[0].DIRECTORY_STRUCTURE_TREE], ['RAW', 'META'])
+            self.assertIs(subjList[0].DIRECTORY_STRUCTURE_TREE, subjList[1].DIRECTORY_STRUCTURE_TREE)
+            self.assertIsInstance(subjList[0].DIRECTORY_STRUCTURE_TREE[0].childrenList, tuple)
+            class ExtraSubject(mi_subject.AbstractSubject):
+                EXTRA_SUBFOLDERS = [["RAW", "NIFTI"], "DATA"]
+            extraSubj = ExtraSubject('MIBB000001', self.tmpDir)
+            self.assertTrue(extraSubj.DIRECTORY_STRUCTURE_TREE.isSecondLevelName('RAW', 'NIFTI'))
+            self.assertTrue(extraSubj.DIRECTORY_STRUCTURE_TREE.isTopLevelName('DATA'))
+            self.assertIs(extraSubj.DIRECTORY_STRUCTURE_TREE, ExtraSubject('MIBB000002', self.tmpDir).DIRECTORY_STRUCTURE_TREE)
+            self.assertFalse(subjList[0].DIRECTORY_STRUCTURE_TREE.isTopLevelName('DATA'))
+            with self.assertRaises(TypeError):
+                subjList[0].DIRECTORY_STRUCTURE_TREE.addNewStructure('DATA')
+            extraSubj.DIRECTORY_STRUCTURE_TREE = mi_subject.mi_utils.buildDirectoryStructureTree(['DATA'])
+            extraSubj.DIRECTORY_STRUCTURE_TREE.addNewStructure('DATA2')
+            self.assertTrue(extraSubj.DIRECTORY_STRUCTURE_TREE.isTopLevelName('DATA2'))
+        finally:
+            os.rmdir(os.path.join(self.tmpDir, 'NOT_A_SUBJECT'))
+
+    def test_handles(self):
+        handleList = mi_subject.SubjectList.setByDirectory(self.tmpDir, HANDLES=True)
+        subjList = mi_subject.SubjectList.setByDirectory(self.tmpDir)
+        self.assertTrue(all(isinstance(i, mi_subject.SubjectHandle) for i in handleList))
+        self.assertFalse(hasattr(handleList[0], '__dict__'))
+        self.assertEqual(handleList.subjIDs, subjList.subjIDs)
+        self.assertEqual(handleList, subjList)
+        self.assertEqual(handleList._getTagValues('StudyDate'), subjList._getTagValues('StudyDate'))
+        self.assertEqual(len(handleList.filterSubjectListByDOS('20111014')), 1)
+        self.assertEqual(handleList.findSubjMatching_SubjN(2).subjID, 'MIBB000002')
+        promoted = handleList.promote()
+        self.assertTrue(all(type(i) == mi_subject.AbstractSubject for i in promoted))
+        self.assertEqual(promoted[0].getTagValue('StudyDate'), handleList[0].getTagValue('StudyDate'))
+        with self.assertRaises(AttributeError): # Not delegated - must promote
+            handleList[0].countNumberOfDicoms()
+        with self.assertRaises(AttributeError): # Read-only
+            handleList[0].QUIET = True
+
+    def test_loggerPool(self):
+        pool = mi_subject._LOG_HANDLER_POOL
+        maxSize, bufferSize = pool.maxSize, pool.bufferSize
+        pool.clear()
+        try:
+            pool.maxSize = 2
+            subjList = mi_subject.SubjectList.setByDirectory(self.tmpDir)
+            for iSubj in subjList + mi_subject.SubjectList.setByDirectory(self.tmpDir):
+                iSubj.QUIET = True
+                iSubj.logger.info(f"POOL TEST {iSubj.subjID}")
+            self.assertEqual(len(pool._pool), 2)
+            for iSubj in subjList:
+                nAttached = len([i for i in iSubj.logger.handlers if isinstance(i, logging.FileHandler)])
+                self.assertEqual(nAttached, 1, msg="Duplicate log handlers")
+                with open(iSubj.logfileName) as fid:
+                    self.assertEqual(fid.read().count(f"POOL TEST {iSubj.subjID}"), 2)
+            # Buffered
+            pool.clear()
+            pool.bufferSize = 10
+            subjList[0].logger.info("BUFFERED RECORD")
+            with open(subjList[0].logfileName) as fid:
+                self.assertNotIn("BUFFERED RECORD", fid.read())
+            pool.flush()
+            with open(subjList[0].logfileName) as fid:
+                self.assertIn("BUFFERED RECORD", fid.read())
+        finally:
+            pool.clear()
+            pool.maxSize, pool.bufferSize = maxSize, bufferSize
+
+    def test_tableIndex(self):
+        subjList = mi_subject.SubjectList.setByDirectory(self.tmpDir, HANDLES=True)
+        tableIndex = miui_helpers.SubjectTableIndex(subjList, self.tmpDir, mi_subject.AbstractSubject)
+        self.assertEqual(len(tableIndex.refresh()), 4)
+        rows, nRows = tableIndex.query(page=2, pageSize=3)
+        self.assertEqual((len(rows), nRows), (1, 4))
+        rows, _ = tableIndex.query(sortModel=[{'colId': 'subjID', 'sort': 'desc'}], pageSize=2)
+        self.assertEqual([i['subjID'] for i in rows], ['MIBB000004', 'MIBB000003'])
+        rows, nRows = tableIndex.query(filterModel={'DOS': {'filterType': 'date', 'type': 'equals', 'dateFrom': '2011-10-14 00:00:00'}})
+        self.assertEqual(nRows, 1)
+        rows, nRows = tableIndex.query(filterModel={'subjID': {'filterType': 'text', 'type': 'contains', 'filter': '0002'}})
+        self.assertEqual([i['subjID'] for i in rows], ['MIBB000002'])
+        # None / NaN values last in either sort direction
+        for iSubjID, iAge in zip(['MIBB000001', 'MIBB000002', 'MIBB000003', 'MIBB000004'], [None, float('nan'), 30.0, 40.0]):
+            tableIndex._rows[iSubjID] = {**tableIndex._rows[iSubjID], 'age': iAge}
+        for iSort in ['asc', 'desc']:
+            rows, _ = tableIndex.query(sortModel=[{'colId': 'age', 'sort': iSort}])
+            self.assertEqual(sorted(i['subjID'] for i in rows[2:]), ['MIBB000001', 'MIBB000002'])
+            ages = [i['age'] for i in rows[:2]]
+            self.assertEqual(ages, sorted(ages, reverse=(iSort == 'desc')))
+        tableIndex._snapshot.clear() # Rows rebuilt on next refresh
+        # Row rebuilt only if meta changes
+        tableIndex.refresh()
+        row0 = tableIndex.query()[0][0]
+        tableIndex.refresh()
+        self.assertIs(tableIndex.query()[0][0], row0)
+        subjList[0].promote().setTagValue('StudyID', '999')
+        tableIndex.refresh()
+        self.assertEqual(tableIndex.query()[0][0]['StudyID'], '999')
+        # Derived values (level completed from subject files) rebuilt if subject files change
+        levelSubj = _LevelSubject(subjList[1].subjID, dataRoot=self.tmpDir)
+        levelIndex = miui_helpers.SubjectTableIndex(mi_subject.SubjectList([levelSubj]), self.tmpDir, _LevelSubject)
+        self.assertEqual(levelIndex.refresh()[0]['levelCompleted'], 1.0)
+        os.makedirs(os.path.join(levelSubj.getTopDir(), 'PROCESSED'))
+        try:
+            self.assertEqual(levelIndex.refresh()[0]['levelCompleted'], 2.0)
+        finally:
+            os.rmdir(os.path.join(levelSubj.getTopDir(), 'PROCESSED'))
+
+    def test_studyUIDIndex(self):
+        studyUIDIndex = mi_subject.StudyUIDIndex.setByDirectory(self.tmpDir, subjPrefix='MIBB')
+        self.assertEqual(len(studyUIDIndex), 4, "Error building StudyUID index")
+        subj = mi_subject.SubjectList.setByDirectory(self.tmpDir, subjectPrefix='MIBB')[0]
+        matchSubj = studyUIDIndex.findSubjMatchingStudyUID(subj.getTagValue('StudyInstanceUID'))
+        self.assertEqual(matchSubj.subjID, subj.subjID)
+        self.assertIsNone(studyUIDIndex.findSubjMatchingStudyUID('1.2.3.4'))
+
+    def test_setTagValues(self):
+        subjList = mi_subject.SubjectList.setByDirectory(self.tmpDir, subjectPrefix='MIBB')
+        report = subjList.setTagValues({'MIBB000001': {'QC': 'PASS', 'Score': 1},
+                                        'MIBB000002': {'QC': 'FAIL'},
+                                        'MIBB999999': {'QC': 'PASS'}}, nThreads=2)
+        self.assertEqual(list(report['Status']), ['updated', 'updated', 'not found'])
+        self.assertEqual(subjList[0].getTagValue('Score'), 1)
+        self.assertEqual(subjList[1].getTagValue('QC'), 'FAIL')
+        self.assertTrue(all([i._loggerName is None for i in subjList]), msg="Subject loggers created by bulk update")
+        df = mi_subject.pd.DataFrame({'SubjectID': ['MIBB000003', 'MIBB000004'], 'Score': [3, float('nan')]})
+        report = subjList.setTagValues(df)
+        self.assertEqual(list(report['Status']), ['updated', 'updated'])
+        self.assertEqual(subjList[2].getTagValue('Score'), 3)
+        self.assertEqual(subjList[3].getTagValue('Score', None), None)
+
+    def test_writeSummary(self):
+        subjList = mi_subject.SubjectList.setByDirectory(self.tmpDir, subjectPrefix='MIBB')
+        csvFile = subjList.writeSummaryCSV(os.path.join(self.tmpDir, 'summary.csv'))
+        with open(csvFile) as fid:
+            rows = list(csv.reader(fid))
+        self.assertEqual(rows[0][-2:], ['Age', 'TotalDicoms'])
+        self.assertEqual(len(rows), 5)
+        self.assertEqual([i[0] for i in rows[1:]], subjList.subjIDs, msg="Summary rows not in subject order")
+        csvFile = subjList.writeSummary(os.path.join(self.tmpDir, 'summary_cols.csv'), columns=['SubjectID', 'StudyDate'], nThreads=2)
+        with open(csvFile) as fid:
+            rows = list(csv.reader(fid))
+        self.assertEqual(rows[0], ['SubjectID', 'StudyDate'])
+        self.assertIn(['MIBB000001', subjList[0].getTagValue('StudyDate')], rows)
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow not installed")
+    def test_writeSummaryParquet(self):
+        subjList = mi_subject.SubjectList.setByDirectory(self.tmpDir, subjectPrefix='MIBB')
+        pqFile = subjList.writeSummary(os.path.join(self.tmpDir, 'summary.parquet'), columns=['SubjectID', 'Age'])
+        df = mi_subject.pd.read_parquet(pqFile)
+        self.assertEqual(list(df.columns), ['SubjectID', 'Age'])
+        self.assertEqual(list(df['SubjectID']), subjList.subjIDs)
+
 
     @classmethod
     def tearDownClass(cls, OVERRIDE=False):
         if (not DEBUG) or OVERRIDE:
             shutil.rmtree(cls.tmpDir)
                 
+class _FailLoadSubject(mi_subject.AbstractSubject):
+    def loadDicomsToSubject(self, *args, **kwargs):
+        os.makedirs(os.path.join(self.getTopDir(), 'RAW'), exist_ok=True) # Partial load
+        raise OSError("Load failed")
+
+
+class TestSubjectsParallel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpDir = os.path.join(this_dir, 'TestSubjectsParallel')
+        if os.path.isdir(cls.tmpDir):
+            cls.tearDownClass(True)
+        os.makedirs(cls.tmpDir)
+        cls.reportFile = os.path.join(cls.tmpDir, 'loadReport.csv')
+        cls.subjList = mi_subject.createNew_OrAddTo_Subject(TEST_DIR, cls.tmpDir, subjPrefix='MIPL', QUIET=True, 
+                                                            LOAD_MULTI=True, nWorkers=2, loadReportFile=cls.reportFile)
+
+    def test_newSubjs(self):
+        for k1 in range(1, 5):
+            self.assertTrue(os.path.isdir(os.path.join(self.tmpDir, f'MIPL00000{k1}')))
+        self.assertFalse(os.path.isdir(os.path.join(self.tmpDir, 'MIPL000005')))
+
+    def test_List(self):
+        self.assertEqual(len(self.subjList), 5, "Error making subject list")
+        self.subjList.reduceToSet()
+        self.assertEqual(len(self.subjList), 4, "Error making subject list after reduce")
+        self.assertEqual(len(self.subjList.filterSubjectListByDOS('20111014')), 1)
+
+    def test_report(self):
+        with open(self.reportFile) as fid:
+            report = list(csv.DictReader(fid))
+        self.assertEqual(len(report), 5)
+        self.assertEqual(sorted([i['Status'] for i in report]), ['added', 'created', 'created', 'created', 'created'])
+
+    def test_failedLoadReleased(self):
+        dataRoot = os.path.join(self.tmpDir, 'FAILED_LOAD')
+        os.makedirs(dataRoot)
+        subjList = mi_subject.createNew_OrAddTo_Subject(TEST_DIR, dataRoot, SubjClass=_FailLoadSubject, subjPrefix='MIPF', 
+                                                        QUIET=True, LOAD_MULTI=True, nWorkers=2)
+        self.assertEqual(len(subjList), 0)
+        self.assertEqual([i for i in os.listdir(dataRoot) if i.startswith('MIPF')], [])
+
+    def test_configFileUsedByWorkers(self):
+        dataRoot = os.path.join(self.tmpDir, 'CONFIG_LOAD')
+        os.makedirs(dataRoot)
+        confFile = os.path.join(self.tmpDir, 'pad4.conf')
+        with open(confFile, 'w') as fid:
+            fid.write("[app]\ndefault_pad_zeros=4\n")
+        configFiles = list(MIResearch_config.all_config_files)
+        try:
+            MIResearch_config.runconfigParser(confFile)
+            subjList = mi_subject.createNew_OrAddTo_Subject(TEST_DIR, dataRoot, subjPrefix='MIPC', 
+                                                            QUIET=True, LOAD_MULTI=True, nWorkers=2)
+        finally:
+            MIResearch_config.all_config_files = configFiles
+            MIResearch_config.config.clear()
+            MIResearch_config.runconfigParser()
+        self.assertEqual(sorted(set(subjList.subjIDs)), [f'MIPC000{k1}' for k1 in range(1, 5)])
+        self.assertEqual(sorted([i for i in os.listdir(dataRoot) if i.startswith('MIPC')]), [f'MIPC000{k1}' for k1 in range(1, 5)])
+        for k1 in range(1, 5):
+            self.assertTrue(os.path.isfile(os.path.join(dataRoot, f'MIPC000{k1}', 'META', f'MIPC000{k1}Tags.json')))
+
+    @classmethod
+    def tearDownClass(cls, OVERRIDE=False):
+        if (not DEBUG) or OVERRIDE:
+            shutil.rmtree(cls.tmpDir)
+
+class TestSubjNAllocation(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpDir = os.path.join(this_dir, 'TestSubjNAllocation')
+        if os.path.isdir(cls.tmpDir):
+            cls.tearDownClass(True)
+        os.makedirs(cls.tmpDir)
+
+    def test_reserveConcurrent(self):
+        os.makedirs(os.path.join(self.tmpDir, 'MIN000003'))
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            allN = list(executor.map(lambda _: mi_subject.reserveNextSubjN(self.tmpDir, 'MIN'), range(20)))
+        self.assertEqual(sorted(allN), list(range(4, 24)), "Error allocating unique subject numbers")
+        self.assertTrue(os.path.isdir(os.path.join(self.tmpDir, 'MIN000023')))
+        # Subject created by other means is seen
+        os.makedirs(os.path.join(self.tmpDir, 'MIN000030'))
+        self.assertEqual(mi_subject.reserveNextSubjN(self.tmpDir, 'MIN'), 31)
+        self.assertEqual(mi_subject.getNextSubjN(self.tmpDir, 'MIN'), 32)
+
+    @classmethod
+    def tearDownClass(cls, OVERRIDE=False):
+        if (not DEBUG) or OVERRIDE:
+            shutil.rmtree(cls.tmpDir)
+
+class TestWatchDog(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpDir = os.path.join(this_dir, 'TestWatchDog')
+        if os.path.isdir(cls.tmpDir):
+            cls.tearDownClass(True)
+        cls.watchDir = os.path.join(cls.tmpDir, 'WATCH')
+        cls.dataRoot = os.path.join(cls.tmpDir, 'DATA')
+        os.makedirs(cls.watchDir)
+        os.makedirs(cls.dataRoot)
+        cls.MIWatcher = miresearch_watchdog.MIResearch_WatchDog(cls.watchDir, cls.dataRoot, 'MIW', nWorkers=3)
+        cls.MIWatcher.event_handler.pollDelay = 0.1
+        cls.MIWatcher.event_handler.pollStable = 0.3
+
+    def test_ingestConcurrent(self):
+        handler = self.MIWatcher.event_handler
+        handler.start()
+        for iDir in [P1, P4, P4_extra]:
+            iWatchDir = shutil.copytree(iDir, os.path.join(self.watchDir, os.path.split(iDir)[1]))
+            handler.enqueue(iWatchDir)
+            handler.enqueue(iWatchDir) # duplicate event ignored
+        handler.workQueue.join()
+        handler.stop()
+        subjList = mi_subject.SubjectList.setByDirectory(self.dataRoot, subjectPrefix='MIW')
+        self.assertEqual(len(subjList), 2, "Same study arriving concurrently should load to one subject")
+        self.assertEqual(sum([i.countNumberOfDicoms() for i in subjList]), 5)
+        self.assertEqual(len(os.listdir(self.MIWatcher.completeDir)), 3)
+
+    def test_observerEvents(self):
+        watchDir = os.path.join(self.tmpDir, 'WATCH_OBS')
+        dataRoot = os.path.join(self.tmpDir, 'DATA_OBS')
+        os.makedirs(watchDir)
+        os.makedirs(dataRoot)
+        MIWatcher = miresearch_watchdog.MIResearch_WatchDog(watchDir, dataRoot, 'MIO', nWorkers=2)
+        handler = MIWatcher.event_handler
+        handler.pollDelay, handler.pollStable = 0.1, 0.5
+        observer = Observer()
+        observer.schedule(handler, path=watchDir, recursive=MIWatcher.recursive)
+        handler.observer = observer
+        handler.start()
+        observer.start()
+        try:
+            shutil.copytree(P1, os.path.join(watchDir, 'P1'))
+            tEnd = time.time() + 30
+            while (len(os.listdir(MIWatcher.completeDir)) == 0) and (time.time() < tEnd):
+                time.sleep(0.1)
+            handler.workQueue.join()
+            # Arrival watch removed once loaded - only the (non recursive) watch root remains
+            handler.releaseArrivalWatches()
+            self.assertEqual(handler._arrivalWatches, {})
+            self.assertEqual(len(observer.emitters), 1)
+        finally:
+            observer.stop()
+            observer.join()
+            handler.stop()
+        self.assertEqual(len(os.listdir(MIWatcher.completeDir)), 1, "Only top level directory should be loaded")
+        self.assertEqual(mi_subject.SubjectList.setByDirectory(dataRoot, subjectPrefix='MIO')[0].countNumberOfDicoms(), 2)
+
+    def test_restartRecovery(self):
+        watchDir = os.path.join(self.tmpDir, 'WATCH_RESTART')
+        dataRoot = os.path.join(self.tmpDir, 'DATA_RESTART')
+        os.makedirs(watchDir)
+        os.makedirs(dataRoot)
+        MIWatcher = miresearch_watchdog.MIResearch_WatchDog(watchDir, dataRoot, 'MIR', nWorkers=2)
+        handler = MIWatcher.event_handler
+        handler.pollDelay, handler.pollStable = 0.1, 0.3
+        # State as left by an interrupted run: 
+        #   a job lost, a directory part way through processing (no job) and an arrival while not running
+        lostJobID = handler.jobStore.addJob(os.path.join(watchDir, 'LOST'), state='loading', 
+                                            processPath=os.path.join(MIWatcher.processDir, 'gone'))
+        shutil.copytree(P2, os.path.join(MIWatcher.processDir, 'a'*32+'_P2'))
+        shutil.copytree(P1, os.path.join(watchDir, 'P1'))
+        handler.start()
+        handler.workQueue.join()
+        handler.stop()
+        self.assertEqual(len(mi_subject.SubjectList.setByDirectory(dataRoot, subjectPrefix='MIR')), 2)
+        jobStates = {os.path.split(i['SourcePath'])[1]: i['State'] for i in handler.jobStore.getJobs()}
+        self.assertEqual(jobStates, {'LOST': 'failed', 'P2': 'complete', 'P1': 'complete'})
+        self.assertEqual(handler.jobStore.getJob(lostJobID)['Error'], 'Not found on restart')
+
+    def test_stopLeavesQueued(self):
+        watchDir = os.path.join(self.tmpDir, 'WATCH_STOP')
+        dataRoot = os.path.join(self.tmpDir, 'DATA_STOP')
+        os.makedirs(watchDir)
+        os.makedirs(dataRoot)
+        MIWatcher = miresearch_watchdog.MIResearch_WatchDog(watchDir, dataRoot, 'MIS', nWorkers=1)
+        handler = MIWatcher.event_handler
+        handler.pollDelay, handler.pollStable, handler.pollTimeOut = 0.1, 60, 600
+        shutil.copytree(P1, os.path.join(watchDir, 'P1'))
+        shutil.copytree(P2, os.path.join(watchDir, 'P2'))
+        handler.start()
+        time.sleep(0.5)
+        t0 = time.time()
+        handler.stop()
+        self.assertLess(time.time() - t0, 5, "Stop should not wait for stability of queued arrivals")
+        self.assertEqual([i['State'] for i in handler.jobStore.getJobs()], ['queued', 'queued'])
+        self.assertEqual(sorted(os.listdir(watchDir)), sorted(['MIResearch-COMPLETE', 'MIResearch-PROCESSING', 'P1', 'P2']))
+        # Resumed on restart
+        handler.pollStable = 0.3
+        handler.start()
+        handler.workQueue.join()
+        handler.stop()
+        self.assertEqual([i['State'] for i in handler.jobStore.getJobs()], ['complete', 'complete'])
+
+    @classmethod
+    def tearDownClass(cls, OVERRIDE=False):
+        if (not DEBUG) or OVERRIDE:
+            shutil.rmtree(cls.tmpDir)
+
 class TestSubjects3(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -417,6 +783,449 @@ class TestSubjectAnonName5(unittest.TestCase):
             shutil.rmtree(cls.tmpDir)
 
 
+class _FailAnonSubject(mi_subject.AbstractSubject):
+    def anonymise(self, *args, **kwargs):
+        raise OSError("Anonymise failed")
+
+
+class TestSubjectAnonFail(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpDir = os.path.join(this_dir, 'TestSubjectAnonFail')
+        if os.path.isdir(cls.tmpDir):
+            cls.tearDownClass(True)
+        os.makedirs(cls.tmpDir)
+
+    def test_loadMetaKept(self):
+        newSubj = _FailAnonSubject(1, self.tmpDir, subjectPrefix='MIAF')
+        newSubj.QUIET = True
+        with self.assertRaises(OSError):
+            newSubj.loadDicomsToSubject(P2, anonName="HARD", HIDE_PROGRESSBAR=True)
+        self.assertTrue(os.path.isfile(newSubj.getMetaTagsFile()))
+        studyUID = newSubj.getMetaTagValue('StudyInstanceUID')
+        self.assertTrue(len(studyUID) > 0)
+        self.assertEqual(mi_subject.findSubjMatchingDicomStudyUID(P2, self.tmpDir, subjPrefix='MIAF'), newSubj)
+        with open(newSubj.logfileName) as fid:
+            self.assertIn("Anonymise after load failed", fid.read())
+
+    @classmethod
+    def tearDownClass(cls, OVERRIDE=False):
+        if (not DEBUG) or OVERRIDE:
+            shutil.rmtree(cls.tmpDir)
+
+
+class TestSubjectListAnon(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpDir = os.path.join(this_dir, 'TestSubjectListAnon')
+        if os.path.isdir(cls.tmpDir):
+            cls.tearDownClass(True)
+        os.makedirs(cls.tmpDir)
+        mi_subject.createNew_OrAddTo_Subject(P1, cls.tmpDir, subjPrefix='MIA', QUIET=True)
+        mi_subject.createNew_OrAddTo_Subject(P2, cls.tmpDir, subjPrefix='MIA', QUIET=True)
+
+    def test_anonymise(self):
+        subjList = mi_subject.SubjectList.setByDirectory(self.tmpDir, subjectPrefix='MIA')
+        subjList.append(mi_subject.AbstractSubject(99, self.tmpDir, subjectPrefix='MIA'))
+        progress = []
+        report = subjList.anonymise("HARD", nWorkers=2, progressFunc=lambda n, nTotal, row: progress.append((n, nTotal)), QUIET=True)
+        self.assertEqual(list(report['SubjectID']), ['MIA000001', 'MIA000002', 'MIA000099'])
+        self.assertEqual(list(report['Status']), ['anonymised', 'anonymised', 'not found'])
+        self.assertEqual(sorted(progress), [(1, 3), (2, 3), (3, 3)])
+        for iSubj in subjList[:2]:
+            self.assertEqual(iSubj.getName_FirstNames(), ("Name-Unknown", "FirstNames-Unknown"))
+            self.assertTrue(iSubj.isAnonymised())
+
+    @classmethod
+    def tearDownClass(cls, OVERRIDE=False):
+        if (not DEBUG) or OVERRIDE:
+            shutil.rmtree(cls.tmpDir)
+
+
+class TestAnonIncremental(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpDir = os.path.join(this_dir, 'TestAnonIncremental')
+        if os.path.isdir(cls.tmpDir):
+            cls.tearDownClass(True)
+        os.makedirs(cls.tmpDir)
+        cls.newSubj = mi_subject.createNew_OrAddTo_Subject(P4, cls.tmpDir, subjPrefix='MIAI', QUIET=True, anonName="HARD")[0]
+
+    def _getDicomMtimes(self):
+        return {k: v[0] for k, v in self.newSubj._getDicomFileStats().items()}
+
+    def test_incremental(self):
+        self.assertTrue(os.path.isfile(self.newSubj.getAnonManifestFile()))
+        mtimes0 = self._getDicomMtimes()
+        self.assertEqual(self.newSubj._getDicomsToAnonymise("", ""), [])
+        self.assertIsNone(self.newSubj._getDicomsToAnonymise("OTHER", "OTHER"), msg="Different anonName should need full pass")
+        # Add to subject - only new dicom anonymised
+        self.newSubj.loadDicomsToSubject(P4_extra, anonName="HARD", HIDE_PROGRESSBAR=True)
+        self.assertEqual(self.newSubj.countNumberOfDicoms(), 3)
+        mtimes1 = self._getDicomMtimes()
+        self.assertEqual(len(mtimes1), 3)
+        self.assertEqual({k: mtimes1[k] for k in mtimes0}, mtimes0, msg="Previously anonymised dicoms rewritten")
+        self.assertEqual(len(self.newSubj.getSeriesIndex()['Series']), 1, msg="New dicom not written to anonymised series directory")
+        for iFile in mtimes1:
+            ds = mi_subject.spydcm.dicom.dcmread(os.path.join(self.newSubj.getDicomsDir(), iFile), stop_before_pixels=True)
+            self.assertEqual(str(ds.PatientName), "")
+        # Force full pass
+        time.sleep(0.01)
+        self.newSubj.anonymise("HARD", QUIET=True, FORCE=True)
+        self.assertEqual(self.newSubj.countNumberOfDicoms(), 3)
+        self.assertTrue(all(self._getDicomMtimes()[k] != mtimes1[k] for k in mtimes1))
+        self.assertEqual(self.newSubj._getDicomsToAnonymise("", ""), [])
+        # Failure part way through leaves DICOM directory unchanged (and no working directory)
+        dicomDir = self.newSubj.getDicomsDir()
+        os.makedirs(dicomDir+".TEMP.WORKING") # Left by an earlier crashed run
+        iFile = os.path.join(dicomDir, sorted(mtimes1)[0])
+        os.utime(iFile, ns=(time.time_ns(), time.time_ns()))
+        stats2 = self.newSubj._getDicomFileStats()
+        streamDicoms = mi_subject.spydcm.dcmTools.streamDicoms
+        def _failingStream(inputDir, outputDir, **kwargs):
+            os.makedirs(outputDir)
+            with open(os.path.join(outputDir, 'partial.dcm'), 'w') as fid:
+                fid.write('partial')
+            raise OSError("Stream failed")
+        mi_subject.spydcm.dcmTools.streamDicoms = _failingStream
+        try:
+            with self.assertRaises(OSError):
+                self.newSubj.anonymise("HARD", QUIET=True)
+        finally:
+            mi_subject.spydcm.dcmTools.streamDicoms = streamDicoms
+        self.assertEqual(self.newSubj._getDicomFileStats(), stats2)
+        self.assertEqual([i for i in os.listdir(os.path.dirname(dicomDir)) if '.ANON.WORKING' in i], [])
+        self.newSubj.anonymise("HARD", QUIET=True)
+        self.assertEqual(self.newSubj.countNumberOfDicoms(), 3)
+        self.assertEqual(self.newSubj._getDicomsToAnonymise("", ""), [])
+
+    @classmethod
+    def tearDownClass(cls, OVERRIDE=False):
+        if (not DEBUG) or OVERRIDE:
+            shutil.rmtree(cls.tmpDir)
+
+
+class TestLogTail(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpDir = os.path.join(this_dir, 'TestLogTail')
+        if os.path.isdir(cls.tmpDir):
+            cls.tearDownClass(True)
+        os.makedirs(cls.tmpDir)
+        cls.logFile = os.path.join(cls.tmpDir, 'test.log')
+        with open(cls.logFile, 'w') as fid:
+            fid.write(''.join([f"line {i}\n" for i in range(1000)]) + "partial")
+
+    def test_tail(self):
+        rows, startOffset, endOffset = mi_subject.mi_utils.readFileLinesBackward(self.logFile, 5, blockSize=16)
+        self.assertEqual([i[1] for i in rows], [f"line {i}" for i in range(995, 1000)])
+        rowsOlder, startOffset2, _ = mi_subject.mi_utils.readFileLinesBackward(self.logFile, 3, endOffset=startOffset, blockSize=7)
+        self.assertEqual([i[1] for i in rowsOlder], ["line 992", "line 993", "line 994"])
+        self.assertEqual(rowsOlder[0][0], startOffset2)
+        with open(self.logFile, 'rb') as fid: # offsets are byte offsets of line starts
+            fid.seek(rows[2][0])
+            self.assertEqual(fid.readline(), b"line 997\n")
+        rowsNew, endOffset2 = mi_subject.mi_utils.readFileLinesFrom(self.logFile, endOffset)
+        self.assertEqual((rowsNew, endOffset2), ([], endOffset))
+        with open(self.logFile, 'a') as fid:
+            fid.write(" done\nnew line\n")
+        rowsNew, _ = mi_subject.mi_utils.readFileLinesFrom(self.logFile, endOffset)
+        self.assertEqual([i[1] for i in rowsNew], ["partial done", "new line"])
+        self.assertEqual(len(mi_subject.mi_utils.readFileLinesBackward(self.logFile, 5000)[0]), 1002)
+
+    @classmethod
+    def tearDownClass(cls, OVERRIDE=False):
+        if (not DEBUG) or OVERRIDE:
+            shutil.rmtree(cls.tmpDir)
+
+
+class TestUIJobRunner(unittest.TestCase):
+    def _waitForJob(self, runner, jobID):
+        for _ in range(100):
+            job = runner.getJob(jobID)
+            if job['Status'] in ('complete', 'failed'):
+                return job
+            time.sleep(0.05)
+        self.fail("Job did not finish")
+
+    def test_jobRunner(self):
+        runner = miui_helpers.UIJobRunner(nWorkers=2, maxJobs=3)
+        def _work(n, progressFunc=None):
+            for k1 in range(n):
+                progressFunc(k1+1, n)
+            return n * 2
+        jobID = runner.submit("Work", _work, 3, WITH_PROGRESS=True)
+        job = self._waitForJob(runner, jobID)
+        self.assertEqual((job['Status'], job['Result'], job['Progress']), ('complete', 6, (3, 3)))
+        jobID = runner.submit("Fail", int, "not a number")
+        job = self._waitForJob(runner, jobID)
+        self.assertEqual(job['Status'], 'failed')
+        self.assertIn('ValueError', job['Error'])
+        for _ in range(3):
+            runner.submit("Work", _work, 1, WITH_PROGRESS=True)
+        self.assertEqual(len(runner.getJobs()), 3)
+        self.assertIsNone(runner.getJob(jobID))
+
+    def test_serialJobs(self):
+        runner = miui_helpers.UIJobRunner(nWorkers=4)
+        intervals = []
+        def _work(label):
+            t0 = time.time()
+            time.sleep(0.2)
+            intervals.append((t0, time.time(), label))
+            return label
+        jobIDs = [runner.submit("Subject job", _work, i, serialKey='SUBJ1') for i in range(2)]
+        jobs = [self._waitForJob(runner, i) for i in jobIDs]
+        self.assertEqual([i['Status'] for i in jobs], ['complete', 'complete'])
+        intervals.sort()
+        self.assertEqual([i[2] for i in intervals], [0, 1]) # In order of submission
+        self.assertGreaterEqual(intervals[1][0], intervals[0][1]) # Second started after first finished
+
+    def test_calledViaUI(self):
+        self.assertFalse(mi_subject.isCalledViaUI())
+        def _inUICall():
+            with ThreadPoolExecutor(max_workers=1) as executor: # Other threads are not in a UI call
+                otherThread = executor.submit(mi_subject.isCalledViaUI).result()
+            return mi_subject.isCalledViaUI(), otherThread
+        self.assertEqual(mi_subject.runUIMethod(_inUICall), (True, False))
+        self.assertFalse(mi_subject.isCalledViaUI())
+
+
+class _ScanCountSubject(mi_subject.AbstractSubject):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.nScans = 0
+
+    def _scanDicoms(self):
+        self.nScans += 1
+        return super()._scanDicoms()
+
+    def runPostLoadPipeLine(self, *args, **kwargs):
+        self.postLoadScan = self.getDicomStudiesScan()
+
+
+class TestMetaCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpDir = os.path.join(this_dir, 'TestMetaCache')
+        if os.path.isdir(cls.tmpDir):
+            cls.tearDownClass(True)
+        os.makedirs(cls.tmpDir)
+        cls.newSubj = mi_subject.createNew_OrAddTo_Subject(P1, cls.tmpDir, subjPrefix='MIC', QUIET=True)[0]
+
+    def test_metaCache(self):
+        dd = self.newSubj.getMetaDict()
+        dd['StudyDate'] = 'MODIFIED'
+        dd['Series'].clear()
+        self.assertEqual(self.newSubj.getMetaTagValue('StudyDate'), "20140409", msg="Cached meta modified by caller")
+        self.assertGreater(len(self.newSubj.getMetaTagValue('Series')), 0, msg="Cached meta modified by caller")
+        self.newSubj.setTagValue('QC', 'PASS')
+        self.assertEqual(self.newSubj.getTagValue('QC'), 'PASS', msg="Cache not invalidated on update")
+        # Change file outside of subject object - must be picked up
+        otherSubj = mi_subject.AbstractSubject(self.newSubj.subjID, dataRoot=self.tmpDir)
+        otherSubj.setTagValue('QC', 'FAIL-EXTERNAL')
+        self.assertEqual(self.newSubj.getTagValue('QC'), 'FAIL-EXTERNAL', msg="Cache not validated against file")
+
+    def test_metaTransaction(self):
+        metaFile = self.newSubj.getMetaTagsFile()
+        with self.newSubj.metaTransaction():
+            self.newSubj.setTagValue('TA', 1)
+            with self.newSubj.metaTransaction():
+                self.newSubj.setTagValue('TB', 2)
+            self.assertEqual(self.newSubj.getTagValue('TB'), 2, msg="Staged update not read")
+            self.assertNotIn('TA', mi_subject.fIO.parseJsonToDictionary(metaFile), msg="Written before end of transaction")
+        dd = mi_subject.fIO.parseJsonToDictionary(metaFile)
+        self.assertEqual((dd['TA'], dd['TB']), (1, 2))
+        with self.assertRaises(KeyError):
+            with self.newSubj.metaTransaction():
+                self.newSubj.setTagValue('TC', 3)
+                raise KeyError('abort')
+        self.assertEqual(self.newSubj.getTagValue('TC', None), None, msg="Updates not discarded on exception")
+        self.assertEqual([i for i in os.listdir(self.newSubj.getMetaDir()) if i.endswith('.tmp')], [])
+
+    def test_dicomScanSession(self):
+        scanSubj = _ScanCountSubject(self.newSubj.subjID, dataRoot=self.tmpDir)
+        scanSubj.QUIET = True
+        nDicoms = scanSubj.countNumberOfDicoms()
+        scanSubj._finalLoadSteps(nDicoms, 0)
+        self.assertEqual(scanSubj.nScans, 1, msg="Post load steps did not share one header scan")
+        self.assertGreater(len(scanSubj.postLoadScan), 0)
+        self.assertIsNone(scanSubj._dicomScan, msg="Scan held after session")
+        # Nested sessions share scan, RESCAN forces a fresh scan
+        with scanSubj.dicomScanSession() as dcmStudies:
+            self.assertIs(scanSubj.getDicomStudiesScan(), dcmStudies)
+            self.assertEqual(scanSubj.nScans, 2)
+            with scanSubj.dicomScanSession(RESCAN=True) as dcmStudiesRescan:
+                self.assertIsNot(dcmStudiesRescan, dcmStudies)
+            self.assertEqual(scanSubj.nScans, 3)
+            self.assertIs(scanSubj.getDicomStudiesScan(), dcmStudiesRescan)
+        self.assertIsNone(scanSubj._dicomScan)
+
+    @classmethod
+    def tearDownClass(cls, OVERRIDE=False):
+        if (not DEBUG) or OVERRIDE:
+            shutil.rmtree(cls.tmpDir)
+
+
+class TestSeriesIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpDir = os.path.join(this_dir, 'TestSeriesIndex')
+        if os.path.isdir(cls.tmpDir):
+            cls.tearDownClass(True)
+        os.makedirs(cls.tmpDir)
+        cls.newSubj = mi_subject.createNew_OrAddTo_Subject(P4, cls.tmpDir, subjPrefix='MIX', QUIET=True)[0]
+
+    def test_overviewImage(self):
+        self.assertIsNone(self.newSubj.getSeriesOverviewImage(88, BUILD_IF_NEED=False))
+        overviewFile = self.newSubj.getSeriesOverviewImage(88)
+        self.assertTrue(os.path.isfile(overviewFile))
+        from matplotlib import image as mpl_image
+        self.assertEqual(mpl_image.imread(overviewFile).shape[:2], (36, 36))
+        self.assertEqual(self.newSubj.getSeriesOverviewImage(88, BUILD_IF_NEED=False), overviewFile)
+        self.assertEqual(self.newSubj.buildSeriesOverviewImages(), [overviewFile])
+        # Series changed - new image built and old removed
+        seDir = self.newSubj.getDicomSeriesDir(88)
+        os.utime(seDir, ns=(time.time_ns(), time.time_ns()+1000))
+        overviewFile2 = self.newSubj.getSeriesOverviewImage(88)
+        self.assertNotEqual(overviewFile2, overviewFile)
+        self.assertEqual(os.listdir(self.newSubj.getSeriesOverviewDir()), [os.path.basename(overviewFile2)])
+
+    def test_seriesIndex(self):
+        self.assertTrue(os.path.isfile(self.newSubj.getSeriesIndexFile()))
+        self.assertEqual(self.newSubj.getListOfSeNums(), [88])
+        seDir = self.newSubj.getDicomSeriesDir(88)
+        self.assertTrue(os.path.isdir(seDir))
+        self.assertEqual(self.newSubj.getDicomFoldersListStr(FULL=True), [seDir])
+        self.assertEqual(self.newSubj.getDicomFoldersListStr(FULL=True, excludeSeNums=[88]), [])
+        self.assertIn('SeriesLaugh', self.newSubj.getSeriesDescriptionsStr())
+        seIndex = self.newSubj.getSeriesIndex()['Series'][0]
+        self.assertEqual(self.newSubj.getDicomSeriesDir(None, seriesUID=seIndex['SeriesInstanceUID']), seDir)
+        self.assertEqual(seIndex['NumberOfFiles'], 2)
+        self.assertEqual(self.newSubj.countNumberOfDicoms(), 2)
+        # Adding data changes directory mtimes - index must be rebuilt
+        self.newSubj.loadDicomsToSubject(P4_extra, HIDE_PROGRESSBAR=True)
+        self.assertEqual(self.newSubj.getSeriesIndex()['Series'][0]['NumberOfFiles'], 3)
+        self.assertEqual(self.newSubj.countNumberOfDicoms(), 3)
+        self.assertEqual(mi_subject.mi_utils.countFilesInDir(self.newSubj.getDicomsDir()), 3)
+        self.assertRaises(ValueError, self.newSubj.getDicomSeriesDir, 999)
+
+    @classmethod
+    def tearDownClass(cls, OVERRIDE=False):
+        if (not DEBUG) or OVERRIDE:
+            shutil.rmtree(cls.tmpDir)
+
+
+class _LevelSubject(mi_subject.AbstractSubject):
+    def getLevelCompleted(self):
+        return 2.0 if os.path.isdir(os.path.join(self.getTopDir(), 'PROCESSED')) else 1.0
+
+
+class TestCatalog(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpDir = os.path.join(this_dir, 'TestCatalog')
+        if os.path.isdir(cls.tmpDir):
+            cls.tearDownClass(True)
+        os.makedirs(cls.tmpDir)
+        cls.subj1 = mi_subject.createNew_OrAddTo_Subject(P1, cls.tmpDir, subjPrefix='MIK', QUIET=True)[0]
+        cls.subj2 = mi_subject.createNew_OrAddTo_Subject(P2, cls.tmpDir, subjPrefix='MIK', QUIET=True)[0]
+        cls.subjList = mi_subject.SubjectList.setByDirectory(cls.tmpDir)
+        cls.subjList.updateCatalog()
+
+    def test_catalog(self):
+        catalog = mi_catalog.getCatalog(self.tmpDir)
+        self.assertIsNotNone(catalog)
+        studyUID = self.subj2.getTagValue('StudyInstanceUID')
+        self.assertEqual(catalog.getTagValues('StudyInstanceUID')[self.subj2.subjID][0], studyUID)
+        self.assertEqual(self.subjList.findSubjMatchingStudyUID(studyUID), self.subj2)
+        self.assertEqual(len(self.subjList.filterSubjectListByDOS('20111014')), 1)
+        # Catalog follows meta file updates - catalog writes do not change dataRoot modified time
+        dataRootMtime = os.stat(self.tmpDir).st_mtime_ns
+        self.subj1.setTagValue('PatientID', 'PID-CATALOG')
+        self.assertEqual(os.stat(self.tmpDir).st_mtime_ns, dataRootMtime)
+        self.assertEqual(catalog.getTagValues('PatientID')[self.subj1.subjID], ('PID-CATALOG', mi_catalog.getFileStamp(self.subj1.getMetaTagsFile())))
+        self.assertEqual(self.subjList.findSubjMatchingPatientID('PID-CATALOG'), [self.subj1])
+
+    def test_catalogStamp(self):
+        # Own dataRoot - subjects are modified here
+        dataRoot = os.path.join(this_dir, 'TestCatalogStamp')
+        if os.path.isdir(dataRoot):
+            shutil.rmtree(dataRoot)
+        os.makedirs(dataRoot)
+        try:
+            subj1 = mi_subject.createNew_OrAddTo_Subject(P1, dataRoot, subjPrefix='MIKS', QUIET=True)[0]
+            subj2 = mi_subject.createNew_OrAddTo_Subject(P2, dataRoot, subjPrefix='MIKS', QUIET=True)[0]
+            subjList = mi_subject.SubjectList.setByDirectory(dataRoot)
+            subjList.updateCatalog()
+            # Values keep type held in meta file
+            subj2.setTagValue('StudyID', 4321)
+            self.assertEqual(subjList._getTagValues('StudyID')[1], 4321)
+            self.assertEqual(subjList.findSubjMatchingStudyID(4321), subj2)
+            # Meta file edited by other means - catalog row not used
+            metaFile = subj1.getMetaTagsFile()
+            with open(metaFile) as fid:
+                meta = json.load(fid)
+            meta['StudyID'] = 'SID-EXTERNAL-EDIT'
+            with open(metaFile, 'w') as fid:
+                json.dump(meta, fid)
+            _, catalogStamp = mi_catalog.getCatalog(dataRoot).getTagValues('StudyID')[subj1.subjID]
+            self.assertNotEqual(catalogStamp, mi_catalog.getFileStamp(metaFile))
+            self.assertEqual(subjList._getTagValues('StudyID')[0], 'SID-EXTERNAL-EDIT')
+        finally:
+            if not DEBUG:
+                shutil.rmtree(dataRoot)
+
+    def test_summarySnapshot(self):
+        catalog = mi_catalog.getCatalog(self.tmpDir)
+        summary = catalog.getSummary()
+        self.assertEqual(sorted(summary.keys()), sorted(self.subjList.subjIDs))
+        row2 = summary[self.subj2.subjID]
+        self.assertEqual(row2['StudyDate'], '20111014')
+        self.assertEqual(row2['NumberOfDicoms'], self.subj2.countNumberOfDicoms())
+        self.assertEqual(row2['NumberOfSeries'], len(self.subj2.getMetaTagValue('Series')))
+        self.assertEqual(mi_subject.mi_utils.decodeString(row2['NAME'], self.subj2.subjID), self.subj2.getName())
+        self.assertEqual(row2['MetaStamp'], mi_catalog.getFileStamp(self.subj2.getMetaTagsFile()))
+        self.assertEqual(row2['DerivedStamp'], self.subj2.getDerivedValuesStamp())
+        # Meta file updates write meta values only - derived values still valid
+        self.subj2.setTagValue('StudyID', 'SID-SNAPSHOT')
+        row2 = catalog.getSummary()[self.subj2.subjID]
+        self.assertEqual(row2['StudyID'], 'SID-SNAPSHOT')
+        self.assertEqual(row2['DerivedStamp'], self.subj2.getDerivedValuesStamp())
+        rows = self.subjList.getSummarySnapshotRows()
+        self.assertEqual(rows[self.subj2.subjID]['DerivedStamp'], self.subj2.getDerivedValuesStamp())
+        self.assertEqual(catalog.getSummary()[self.subj2.subjID], rows[self.subj2.subjID])
+        # Level completed from subject files follows file changes
+        levelList = mi_subject.SubjectList([_LevelSubject(self.subj1.subjID, dataRoot=self.tmpDir)])
+        self.assertEqual(levelList.getSummarySnapshotRows(FORCE_DERIVED=True)[self.subj1.subjID]['LevelCompleted'], 1.0)
+        os.makedirs(os.path.join(self.subj1.getTopDir(), 'PROCESSED'))
+        self.assertEqual(levelList.getSummarySnapshotRows()[self.subj1.subjID]['LevelCompleted'], 2.0)
+        # Handles read snapshot without promotion, table rows match those built from subjects
+        handles = mi_subject.SubjectList.setByDirectory(self.tmpDir, HANDLES=True)
+        df = handles.getSummarySnapshot()
+        self.assertEqual(list(df['SubjectID']), self.subjList.subjIDs)
+        tableIndex = miui_helpers.SubjectTableIndex(handles, self.tmpDir, mi_subject.AbstractSubject)
+        rows = tableIndex.refresh()
+        for iRow, iSubj in zip(rows, self.subjList):
+            expected = miui_helpers.subjectToTableRow(iSubj, self.tmpDir, tableIndex.classPath)
+            self.assertEqual(iRow['name'], expected['name'])
+            self.assertEqual(iRow['StudyID'], expected['StudyID'])
+            self.assertAlmostEqual(iRow['age'], expected['age'])
+        # Stored rows served without checking subject files - changes picked up on revalidate
+        os.makedirs(os.path.join(self.subj2.getTopDir(), 'EXTRA'))
+        tableIndex = miui_helpers.SubjectTableIndex(handles, self.tmpDir, mi_subject.AbstractSubject)
+        self.assertEqual(len(tableIndex.refresh(VALIDATE=False)), len(self.subjList))
+        self.assertNotEqual(tableIndex._snapshot[self.subj2.subjID]['DerivedStamp'], self.subj2.getDerivedValuesStamp())
+        self.assertEqual(tableIndex.revalidate(), [self.subj2.subjID])
+        self.assertEqual(tableIndex._snapshot[self.subj2.subjID]['DerivedStamp'], self.subj2.getDerivedValuesStamp())
+        self.assertEqual(tableIndex.revalidate(), [])
+
+    @classmethod
+    def tearDownClass(cls, OVERRIDE=False):
+        if (not DEBUG) or OVERRIDE:
+            shutil.rmtree(cls.tmpDir)
+
+
 # class TestMisc(unittest.TestCase):
 #     def test_DefaultRootDir(self):
 #         if DEBUG:
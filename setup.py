@@ -26,6 +26,11 @@ REQUIRED = [
     "spydcmtk", "pandas", "numpy", "watchdog", "nicegui"
 ]
 
+# What packages are optional?
+EXTRAS = {
+    "parquet": ["pyarrow"],
+}
+
 
 
 here = os.path.abspath(os.path.dirname(__file__))
@@ -103,7 +108,7 @@ setup(
     },
     package_data={"miresearch": ["miresearch.conf",]},
     install_requires=REQUIRED,
-    # extras_require=EXTRAS,
+    extras_require=EXTRAS,
     include_package_data=True,
     license='MIT',
     classifiers=[